@@ -0,0 +1,110 @@
+import asyncio
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from .config import logger
+from .executor import AnalysisExecutor
+
+class MicroBatcher:
+    """Coalesce concurrent calls of a blocking function into batched calls.
+
+    Items submitted within ``max_wait`` seconds of each other, or until
+    ``max_batch_size`` items are queued, run as one call of ``batch_fn`` on the
+    executor's thread pool. While ``max_in_flight`` batches are running new
+    items keep queueing, so batches fill up under load.
+    """
+
+    def __init__(
+        self,
+        batch_fn: Callable[[List[Any]], List[Any]],
+        executor: AnalysisExecutor,
+        max_batch_size: int = 16,
+        max_wait: float = 0.01,
+        max_in_flight: int = 1
+    ):
+        self.batch_fn = batch_fn
+        self.executor = executor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.max_in_flight = max_in_flight
+
+        self._queue: List[Tuple[Any, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._in_flight = 0
+        self._tasks = set()
+
+        # Metrics
+        self._batches = 0
+        self._items = 0
+        self._max_queue_depth = 0
+        self._last_batch_size = 0
+
+    async def submit(self, item: Any) -> Any:
+        """Queue one item and wait for its result"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._queue.append((item, future))
+        self._max_queue_depth = max(self._max_queue_depth, len(self._queue))
+
+        if len(self._queue) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+
+        return await future
+
+    async def submit_many(self, items: List[Any]) -> List[Any]:
+        """Queue several items and wait for all their results"""
+        return list(await asyncio.gather(*(self.submit(item) for item in items)))
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        while self._queue and self._in_flight < self.max_in_flight:
+            batch = self._queue[:self.max_batch_size]
+            del self._queue[:self.max_batch_size]
+            # Drop items whose caller went away while queued
+            batch = [(item, future) for item, future in batch if not future.done()]
+            if not batch:
+                continue
+
+            self._in_flight += 1
+            task = asyncio.create_task(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[Any, asyncio.Future]]) -> None:
+        try:
+            results = await self.executor.run_model(self.batch_fn, [item for item, _ in batch])
+            if len(results) != len(batch):
+                raise RuntimeError(f"Batch returned {len(results)} results for {len(batch)} items")
+        except Exception as e:
+            logger.error(f"Batched call failed: {str(e)}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            self._batches += 1
+            self._items += len(batch)
+            self._last_batch_size = len(batch)
+            self._in_flight -= 1
+            # Items queued while this batch ran go out right away
+            if self._queue:
+                self._flush()
+
+    def stats(self) -> Dict[str, float]:
+        """Queue depth and batch fill metrics"""
+        return {
+            "queue_depth": len(self._queue),
+            "max_queue_depth": self._max_queue_depth,
+            "in_flight": self._in_flight,
+            "batches": self._batches,
+            "items": self._items,
+            "last_batch_size": self._last_batch_size,
+            "mean_batch_size": self._items / self._batches if self._batches else 0.0,
+            "mean_batch_fill": self._items / (self._batches * self.max_batch_size) if self._batches else 0.0
+        }
@@ -0,0 +1,413 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from .models import LegalAnalysis
+from .compact import CompactAnalysis
+from .search import search_index
+from .pdf_backends import PdfSource
+from .metrics import record_cache, stage_timer
+from .config import (
+    logger, analysis_cache, document_cache,
+    ANALYSIS_STORE_PATH, ANALYSIS_STORE_MAX_ENTRIES, PIPELINE_VERSION, INCREMENTAL_CONFIG, PDF_CONFIG
+)
+
+class AnalysisStore:
+    """Size-bounded SQLite store of serialized analyses keyed by upload hash.
+
+    The database file is shared by every uvicorn worker and survives restarts.
+    Rows written by another pipeline version are ignored, and the least recently
+    used rows are evicted once ``max_entries`` is exceeded.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: int = 10000,
+        version: str = "1",
+        max_paragraphs: int = 500000,
+        max_pages: int = 200000
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_paragraphs = max_paragraphs
+        self.max_pages = max_pages
+        self.version = version
+        self._initialized = False
+
+    @contextmanager
+    def _connect(self):
+        if not self._initialized:
+            self._initialize()
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _initialize(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS analyses (
+                        content_hash TEXT NOT NULL,
+                        file_type TEXT NOT NULL,
+                        version TEXT NOT NULL,
+                        doc_id TEXT NOT NULL,
+                        analysis TEXT NOT NULL,
+                        accessed_at REAL NOT NULL,
+                        PRIMARY KEY (content_hash, file_type, version)
+                    )
+                """)
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_analyses_doc_id ON analyses (doc_id)")
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_analyses_accessed_at ON analyses (accessed_at)")
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS passages (
+                        doc_id TEXT PRIMARY KEY,
+                        passages TEXT NOT NULL,
+                        accessed_at REAL NOT NULL
+                    )
+                """)
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_passages_accessed_at ON passages (accessed_at)")
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS paragraphs (
+                        paragraph_hash TEXT NOT NULL,
+                        version TEXT NOT NULL,
+                        features TEXT NOT NULL,
+                        accessed_at REAL NOT NULL,
+                        PRIMARY KEY (paragraph_hash, version)
+                    )
+                """)
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_paragraphs_accessed_at ON paragraphs (accessed_at)")
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS paragraph_documents (
+                        paragraph_hash TEXT NOT NULL,
+                        doc_id TEXT NOT NULL,
+                        PRIMARY KEY (paragraph_hash, doc_id)
+                    )
+                """)
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_paragraph_documents_doc_id ON paragraph_documents (doc_id)")
+                # Page fingerprints already cover the extraction settings, so pages are not versioned
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS pages (
+                        page_hash TEXT PRIMARY KEY,
+                        text TEXT NOT NULL,
+                        accessed_at REAL NOT NULL
+                    )
+                """)
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_pages_accessed_at ON pages (accessed_at)")
+        finally:
+            conn.close()
+        self._initialized = True
+
+    def get(self, content_hash: str, file_type: str) -> Optional[LegalAnalysis]:
+        """Fetch the analysis of an upload, or None if it was never stored"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT analysis FROM analyses WHERE content_hash = ? AND file_type = ? AND version = ?",
+                (content_hash, file_type, self.version)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE analyses SET accessed_at = ? WHERE content_hash = ? AND file_type = ? AND version = ?",
+                (time.time(), content_hash, file_type, self.version)
+            )
+        return LegalAnalysis.model_validate_json(row[0])
+
+    def get_by_doc_id(self, doc_id: str) -> Optional[LegalAnalysis]:
+        """Fetch a stored analysis by its document ID"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT analysis FROM analyses WHERE doc_id = ? AND version = ? ORDER BY accessed_at DESC LIMIT 1",
+                (doc_id, self.version)
+            ).fetchone()
+        return LegalAnalysis.model_validate_json(row[0]) if row else None
+
+    def put(self, content_hash: str, file_type: str, analysis: LegalAnalysis) -> None:
+        """Store an analysis, evicting the least recently used rows over the limit"""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO analyses VALUES (?, ?, ?, ?, ?, ?)",
+                (content_hash, file_type, self.version, analysis.doc_id,
+                 analysis.model_dump_json(), time.time())
+            )
+            conn.execute(
+                """
+                DELETE FROM analyses WHERE rowid IN (
+                    SELECT rowid FROM analyses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,)
+            )
+
+    def get_passages(self, doc_id: str) -> Optional[List[str]]:
+        """Fetch the retrieval passages of a document"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT passages FROM passages WHERE doc_id = ?", (doc_id,)).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE passages SET accessed_at = ? WHERE doc_id = ?", (time.time(), doc_id))
+        return json.loads(row[0])
+
+    def put_passages(self, doc_id: str, passages: List[str]) -> None:
+        """Store the retrieval passages of a document"""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO passages VALUES (?, ?, ?)",
+                (doc_id, json.dumps(passages), time.time())
+            )
+            conn.execute(
+                """
+                DELETE FROM passages WHERE rowid IN (
+                    SELECT rowid FROM passages ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,)
+            )
+
+    def get_paragraphs(self, paragraph_hashes: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Fetch the cached extraction results of whichever paragraphs are stored"""
+        found = {}
+        with self._connect() as conn:
+            # Stay under SQLite's limit on bound parameters
+            for i in range(0, len(paragraph_hashes), 500):
+                batch = paragraph_hashes[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = conn.execute(
+                    f"SELECT paragraph_hash, features FROM paragraphs "
+                    f"WHERE version = ? AND paragraph_hash IN ({placeholders})",
+                    (self.version, *batch)
+                ).fetchall()
+                found.update((paragraph_hash, json.loads(features)) for paragraph_hash, features in rows)
+            if found:
+                now = time.time()
+                conn.executemany(
+                    "UPDATE paragraphs SET accessed_at = ? WHERE paragraph_hash = ? AND version = ?",
+                    [(now, paragraph_hash, self.version) for paragraph_hash in found]
+                )
+        return found
+
+    def put_paragraphs(self, features: Dict[str, Dict[str, Any]], doc_id: str, paragraph_hashes: List[str]) -> None:
+        """Store new paragraph results and record which paragraphs make up a document"""
+        with self._connect() as conn:
+            now = time.time()
+            conn.executemany(
+                "INSERT OR REPLACE INTO paragraphs VALUES (?, ?, ?, ?)",
+                [(paragraph_hash, self.version, json.dumps(value), now) for paragraph_hash, value in features.items()]
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO paragraph_documents VALUES (?, ?)",
+                [(paragraph_hash, doc_id) for paragraph_hash in set(paragraph_hashes)]
+            )
+            evicted = [row[0] for row in conn.execute(
+                "SELECT paragraph_hash FROM paragraphs ORDER BY accessed_at DESC LIMIT -1 OFFSET ?",
+                (self.max_paragraphs,)
+            ).fetchall()]
+            if evicted:
+                conn.executemany("DELETE FROM paragraphs WHERE paragraph_hash = ?", [(h,) for h in evicted])
+                conn.executemany("DELETE FROM paragraph_documents WHERE paragraph_hash = ?", [(h,) for h in evicted])
+
+    def clear_paragraphs(self) -> None:
+        """Forget every cached paragraph result"""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM paragraphs")
+            conn.execute("DELETE FROM paragraph_documents")
+
+    def get_pages(self, page_hashes: List[str]) -> Dict[str, str]:
+        """Fetch the extracted text of whichever pages are stored"""
+        found = {}
+        with self._connect() as conn:
+            for i in range(0, len(page_hashes), 500):
+                batch = page_hashes[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                found.update(conn.execute(
+                    f"SELECT page_hash, text FROM pages WHERE page_hash IN ({placeholders})",
+                    batch
+                ).fetchall())
+            if found:
+                now = time.time()
+                conn.executemany(
+                    "UPDATE pages SET accessed_at = ? WHERE page_hash = ?",
+                    [(now, page_hash) for page_hash in found]
+                )
+        return found
+
+    def put_pages(self, texts: Dict[str, str]) -> None:
+        """Store extracted page text, evicting the least recently used pages"""
+        with self._connect() as conn:
+            now = time.time()
+            conn.executemany(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?)",
+                [(page_hash, text, now) for page_hash, text in texts.items()]
+            )
+            conn.execute(
+                """
+                DELETE FROM pages WHERE page_hash IN (
+                    SELECT page_hash FROM pages ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_pages,)
+            )
+
+    def clear_pages(self) -> None:
+        """Forget every cached page text"""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM pages")
+
+    def find_previous_version(self, paragraph_hashes: List[str], doc_id: str, min_shared: int) -> Optional[str]:
+        """The stored document sharing the most paragraphs, if it shares at least ``min_shared``"""
+        unique = list(set(paragraph_hashes))
+        shared: Dict[str, int] = {}
+        with self._connect() as conn:
+            for i in range(0, len(unique), 500):
+                batch = unique[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                for other, count in conn.execute(
+                    f"SELECT doc_id, COUNT(*) FROM paragraph_documents "
+                    f"WHERE paragraph_hash IN ({placeholders}) AND doc_id != ? GROUP BY doc_id",
+                    (*batch, doc_id)
+                ):
+                    shared[other] = shared.get(other, 0) + count
+        if not shared:
+            return None
+        best = max(shared, key=shared.get)
+        return best if shared[best] >= min_shared else None
+
+
+analysis_store = AnalysisStore(
+    ANALYSIS_STORE_PATH,
+    max_entries=ANALYSIS_STORE_MAX_ENTRIES,
+    version=PIPELINE_VERSION,
+    max_paragraphs=INCREMENTAL_CONFIG['store_max_paragraphs'],
+    max_pages=PDF_CONFIG['store_max_pages']
+)
+
+def hash_content(content: PdfSource) -> str:
+    """Hash raw uploaded bytes into a cache key"""
+    return hashlib.sha256(content).hexdigest()
+
+async def get_cached_analysis(content_hash: str, file_type: str) -> Optional[LegalAnalysis]:
+    """Look an upload up in the in-process cache, then in the shared store"""
+    key = (content_hash, file_type)
+    if key in document_cache:
+        record_cache("document_cache", True)
+        compact = document_cache[key]
+        analysis_cache[compact.doc_id] = compact
+        return compact.to_analysis()
+    record_cache("document_cache", False)
+    try:
+        analysis = await asyncio.to_thread(analysis_store.get, content_hash, file_type)
+    except Exception as e:
+        logger.error(f"Analysis store lookup failed: {str(e)}")
+        return None
+    record_cache("analysis_store", analysis is not None)
+    if analysis is not None:
+        document_cache[key] = analysis_cache[analysis.doc_id] = CompactAnalysis.from_analysis(analysis)
+    return analysis
+
+async def cache_analysis(content_hash: str, file_type: str, analysis: LegalAnalysis) -> None:
+    """Remember an analysis in every cache tier"""
+    # The in-process tiers share one compact copy; see compact.CompactAnalysis
+    compact = CompactAnalysis.from_analysis(analysis)
+    document_cache[(content_hash, file_type)] = compact
+    analysis_cache[analysis.doc_id] = compact
+    try:
+        await asyncio.to_thread(analysis_store.put, content_hash, file_type, analysis)
+    except Exception as e:
+        logger.error(f"Analysis store write failed: {str(e)}")
+    try:
+        await asyncio.to_thread(search_index.add, analysis)
+    except Exception as e:
+        logger.error(f"Search index write failed: {str(e)}")
+
+async def find_analysis(doc_id: str) -> Optional[LegalAnalysis]:
+    """Find an analysis by document ID, including ones made by other workers"""
+    if doc_id in analysis_cache:
+        record_cache("analysis_cache", True)
+        return analysis_cache[doc_id].to_analysis()
+    record_cache("analysis_cache", False)
+    try:
+        analysis = await asyncio.to_thread(analysis_store.get_by_doc_id, doc_id)
+    except Exception as e:
+        logger.error(f"Analysis store lookup failed: {str(e)}")
+        return None
+    record_cache("analysis_store", analysis is not None)
+    if analysis is not None:
+        analysis_cache[doc_id] = CompactAnalysis.from_analysis(analysis)
+    return analysis
+
+
+class _SharedAnalysis:
+    """An analysis in flight and the progress callbacks of everyone waiting on it"""
+
+    def __init__(self):
+        self.task: Optional[asyncio.Future] = None
+        self.stages: Dict[str, str] = {}
+        self.listeners: List[Callable[[str, str], Awaitable[None]]] = []
+
+    async def progress(self, stage: str, status: str) -> None:
+        self.stages[stage] = status
+        # A failing listener must not fail the analysis it listens to
+        await asyncio.gather(*(listener(stage, status) for listener in list(self.listeners)), return_exceptions=True)
+
+    async def join(self, listener: Callable[[str, str], Awaitable[None]]) -> None:
+        """Report the stages run so far to ``listener``, then every later one"""
+        reported: Dict[str, str] = {}
+        while reported != self.stages:
+            for stage, status in list(self.stages.items()):
+                if reported.get(stage) != status:
+                    reported[stage] = status
+                    await listener(stage, status)
+        self.listeners.append(listener)
+
+# Analyses currently running, so concurrent requests for one upload share them
+_in_flight: Dict[Tuple[str, str], _SharedAnalysis] = {}
+
+async def get_or_analyze(
+    content: PdfSource,
+    file_type: str,
+    analyze: Callable[..., Awaitable[LegalAnalysis]],
+    content_hash: Optional[str] = None,
+    progress: Optional[Callable[[str, str], Awaitable[None]]] = None
+) -> LegalAnalysis:
+    """Return the cached analysis of an upload, running ``analyze`` at most once.
+
+    ``analyze`` is called with a ``progress`` keyword; a caller that joins an
+    analysis already running still gets its progress through ``progress``.
+    """
+    content_hash = content_hash or hash_content(content)
+    with stage_timer("cache_lookup"):
+        analysis = await get_cached_analysis(content_hash, file_type)
+    if analysis is not None:
+        return analysis
+
+    key = (content_hash, file_type)
+    shared = _in_flight.get(key)
+    if shared is None:
+        shared = _in_flight[key] = _SharedAnalysis()
+
+        async def run() -> LegalAnalysis:
+            analysis = await analyze(content, file_type, progress=shared.progress)
+            await cache_analysis(content_hash, file_type, analysis)
+            return analysis
+
+        shared.task = asyncio.ensure_future(run())
+        shared.task.add_done_callback(lambda _: _in_flight.pop(key, None))
+
+    if progress is None:
+        return await asyncio.shield(shared.task)
+    await shared.join(progress)
+    try:
+        # One caller going away must not cancel the analysis for the others
+        return await asyncio.shield(shared.task)
+    finally:
+        shared.listeners.remove(progress)
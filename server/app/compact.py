@@ -0,0 +1,220 @@
+import copy
+import math
+from array import array
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple
+from .models import LegalAnalysis, LegalCitation, LegalClause, LegalEntities
+
+# Cached analyses repeat a lot of text: a sentence matching several clause rules
+# is kept once per clause type and again per obligation, and every deadline and
+# monetary value carries its own context slice. The compact form keeps each
+# distinct string once in a single text buffer and stores records as columns
+# of offsets and small integer labels, building Pydantic models only on read.
+
+SPAN, LABEL, NUMBER = "span", "label", "number"
+
+CLAUSE_FIELDS = (("clause_type", LABEL), ("text", SPAN), ("section", LABEL), ("importance", NUMBER))
+CITATION_FIELDS = (("citation_text", SPAN), ("source", LABEL), ("year", LABEL), ("page", LABEL))
+OBLIGATION_FIELDS = (("text", SPAN), ("type", LABEL))
+DEADLINE_FIELDS = (("text", SPAN), ("date", LABEL), ("context", SPAN))
+MONETARY_FIELDS = (("value", SPAN), ("context", SPAN))
+DEFINITION_FIELDS = (("term", SPAN), ("definition", SPAN))
+ENTITY_FIELDS = (("field", LABEL), ("name", SPAN))
+RISK_FIELDS = (("text", SPAN),)
+
+def _record(value: Any) -> Dict[str, Any]:
+    return dict(value) if isinstance(value, dict) else dict(vars(value))
+
+class _TextBuilder:
+    """Append strings to one buffer, storing each distinct string once"""
+
+    def __init__(self):
+        self.parts: List[str] = []
+        self.size = 0
+        self.offsets: Dict[str, int] = {}
+
+    def add(self, value: str) -> int:
+        start = self.offsets.get(value)
+        if start is None:
+            start = self.offsets[value] = self.size
+            self.parts.append(value)
+            self.size += len(value)
+        return start
+
+    def build(self) -> str:
+        return "".join(self.parts)
+
+class _Labels:
+    """Small vocabulary of repeated values such as clause types, dates and sources"""
+
+    def __init__(self):
+        self.values: List[Hashable] = []
+        self.index: Dict[Hashable, int] = {}
+
+    def add(self, value: Hashable) -> int:
+        code = self.index.get(value)
+        if code is None:
+            code = self.index[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+class SpanTable:
+    """Records of one kind stored column-wise.
+
+    A span column holds (start, end) pairs into the shared text, a label column
+    holds indexes into the shared label list and a number column holds floats,
+    with NaN standing for None.
+    """
+
+    __slots__ = ("fields", "columns", "length")
+
+    def __init__(self, fields: Sequence[Tuple[str, str]], columns: List[array], length: int):
+        self.fields = fields
+        self.columns = columns
+        self.length = length
+
+    @classmethod
+    def build(
+        cls,
+        fields: Sequence[Tuple[str, str]],
+        records: List[Dict[str, Any]],
+        text: _TextBuilder,
+        labels: _Labels
+    ) -> Optional["SpanTable"]:
+        """Encode records, or return None if any record does not fit the fields"""
+        names = {name for name, _ in fields}
+        columns = [array('d') if kind == NUMBER else array('L') for _, kind in fields]
+        for record in records:
+            if record.keys() != names:
+                return None
+            for (name, kind), column in zip(fields, columns):
+                value = record[name]
+                if kind == SPAN:
+                    if not isinstance(value, str):
+                        return None
+                    start = text.add(value)
+                    column.append(start)
+                    column.append(start + len(value))
+                elif kind == LABEL:
+                    column.append(labels.add(value))
+                else:
+                    column.append(math.nan if value is None else float(value))
+        return cls(fields, columns, len(records))
+
+    def __len__(self) -> int:
+        return self.length
+
+    def rows(self, text: str, labels: List[Hashable]) -> List[Dict[str, Any]]:
+        """Decode the records back into dicts"""
+        decoded = []
+        for (_, kind), column in zip(self.fields, self.columns):
+            if kind == SPAN:
+                decoded.append([text[column[i]:column[i + 1]] for i in range(0, len(column), 2)])
+            elif kind == LABEL:
+                decoded.append([labels[code] for code in column])
+            else:
+                decoded.append([None if math.isnan(value) else value for value in column])
+        names = [name for name, _ in self.fields]
+        return [dict(zip(names, values)) for values in zip(*decoded)]
+
+class CompactAnalysis:
+    """Memory-lean form of a ``LegalAnalysis`` kept in the in-process caches"""
+
+    __slots__ = (
+        "doc_id", "document_type", "jurisdiction", "governing_law", "summary", "metadata",
+        "processing_time", "word_count", "created_at", "text", "labels", "tables", "fallback"
+    )
+
+    _schemas = {
+        "key_clauses": CLAUSE_FIELDS,
+        "citations": CITATION_FIELDS,
+        "obligations": OBLIGATION_FIELDS,
+        "deadlines": DEADLINE_FIELDS,
+        "monetary_values": MONETARY_FIELDS,
+        "legal_definitions": DEFINITION_FIELDS,
+        "entities": ENTITY_FIELDS,
+        "risk_factors": RISK_FIELDS,
+    }
+
+    @classmethod
+    def from_analysis(cls, analysis: LegalAnalysis) -> "CompactAnalysis":
+        """Encode an analysis, sharing every repeated string"""
+        compact = cls.__new__(cls)
+        for name in ("doc_id", "document_type", "jurisdiction", "governing_law", "summary",
+                     "processing_time", "word_count", "created_at"):
+            setattr(compact, name, getattr(analysis, name))
+        # Mutable parts are copied in and out, so no caller shares them with the cache
+        compact.metadata = dict(analysis.metadata)
+
+        records = {
+            "key_clauses": [_record(clause) for clause in analysis.key_clauses],
+            "citations": [_record(citation) for citation in analysis.citations],
+            "obligations": analysis.obligations,
+            "deadlines": analysis.deadlines,
+            "monetary_values": analysis.monetary_values,
+            "legal_definitions": [
+                {"term": term, "definition": definition}
+                for term, definition in analysis.legal_definitions.items()
+            ],
+            "entities": [
+                {"field": field, "name": name}
+                for field, names in _record(analysis.entities).items()
+                for name in names
+            ],
+            "risk_factors": [{"text": text} for text in analysis.risk_factors],
+        }
+
+        text, labels = _TextBuilder(), _Labels()
+        compact.tables, compact.fallback = {}, {}
+        for name, fields in cls._schemas.items():
+            table = SpanTable.build(fields, records[name], text, labels)
+            if table is None:
+                # Records edited into an unexpected shape are kept as they are
+                compact.fallback[name] = copy.deepcopy(getattr(analysis, name))
+            else:
+                compact.tables[name] = table
+        compact.text = text.build()
+        compact.labels = labels.values
+        return compact
+
+    def _rows(self, name: str) -> Optional[List[Dict[str, Any]]]:
+        table = self.tables.get(name)
+        return None if table is None else table.rows(self.text, self.labels)
+
+    def _field(self, name: str, decode) -> Any:
+        if name in self.fallback:
+            return copy.deepcopy(self.fallback[name])
+        return decode(self._rows(name))
+
+    def to_analysis(self) -> LegalAnalysis:
+        """Materialize the response model; the data was validated when it was first built"""
+        def entities(rows: List[Dict[str, Any]]) -> LegalEntities:
+            fields = {name: [] for name in LegalEntities.model_fields}
+            for row in rows:
+                fields[row["field"]].append(row["name"])
+            return LegalEntities.model_construct(**fields)
+
+        return LegalAnalysis.model_construct(
+            doc_id=self.doc_id,
+            document_type=self.document_type,
+            entities=self._field("entities", entities),
+            key_clauses=self._field(
+                "key_clauses", lambda rows: [LegalClause.model_construct(**row) for row in rows]
+            ),
+            citations=self._field(
+                "citations", lambda rows: [LegalCitation.model_construct(**row) for row in rows]
+            ),
+            legal_definitions=self._field(
+                "legal_definitions", lambda rows: {row["term"]: row["definition"] for row in rows}
+            ),
+            obligations=self._field("obligations", list),
+            deadlines=self._field("deadlines", list),
+            jurisdiction=self.jurisdiction,
+            governing_law=self.governing_law,
+            risk_factors=self._field("risk_factors", lambda rows: [row["text"] for row in rows]),
+            monetary_values=self._field("monetary_values", list),
+            summary=self.summary,
+            metadata=dict(self.metadata),
+            processing_time=self.processing_time,
+            word_count=self.word_count,
+            created_at=self.created_at
+        )
@@ -17,15 +17,193 @@ logger = logging.getLogger(__name__)
 document_cache = TTLCache(maxsize=100, ttl=3600)  # 1-hour TTL
 analysis_cache = LRUCache(maxsize=1000)
 
+# Persistent analysis store shared by all workers
+ANALYSIS_STORE_PATH = os.getenv('ANALYSIS_STORE_PATH', '/tmp/lexalyze-cache/analyses.db')
+ANALYSIS_STORE_MAX_ENTRIES = int(os.getenv('ANALYSIS_STORE_MAX_ENTRIES', '10000'))
+# Bump whenever the pipeline output changes so stale stored analyses are ignored
+ANALYSIS_CACHE_VERSION = '6'
+
+# Background analysis jobs, queued in SQLite so every worker shares them
+JOBS_CONFIG = {
+    'path': os.getenv('JOBS_DB_PATH', '/tmp/lexalyze-cache/jobs.db'),
+    'upload_dir': os.getenv('JOBS_UPLOAD_DIR', '/tmp/lexalyze-cache/jobs'),
+    'workers': int(os.getenv('JOBS_WORKERS', '1')),
+    'max_queued': int(os.getenv('JOBS_MAX_QUEUED', '100')),
+    'poll_interval': float(os.getenv('JOBS_POLL_INTERVAL', '0.5')),
+    # Running jobs without a heartbeat for this long are assumed lost and requeued
+    'stale_after': float(os.getenv('JOBS_STALE_AFTER', '600')),
+    'retention': float(os.getenv('JOBS_RETENTION', '86400'))
+}
+
+# Uploads are hashed and mapped where Starlette spooled them
+UPLOAD_CONFIG = {
+    'max_bytes': int(os.getenv('UPLOAD_MAX_BYTES', str(50 * 1024 * 1024))),
+    'max_batch_bytes': int(os.getenv('UPLOAD_MAX_BATCH_BYTES', str(500 * 1024 * 1024))),
+    # Requests announcing a larger body are rejected before it is read
+    'max_request_bytes': int(os.getenv('UPLOAD_MAX_REQUEST_BYTES', str(512 * 1024 * 1024)))
+}
+
 # Constants
 SUPPORTED_FILE_TYPES = {'pdf', 'txt'}
 MODEL_CONFIGS = {
     'qa_model': 'deepset/roberta-base-squad2',
     'summarizer': 'facebook/bart-large-cnn',
-    'spacy_model': 'en_core_web_sm'
+    'spacy_model': 'en_core_web_sm',
+    # 'pytorch' runs fp32, 'quantized' applies dynamic int8 quantization on CPU,
+    # 'onnx' exports to ONNX Runtime (needs optimum[onnxruntime])
+    'inference_backend': os.getenv('INFERENCE_BACKEND', 'pytorch'),
+    # Use the distilled checkpoints below instead of the full models
+    'use_distilled': os.getenv('USE_DISTILLED_MODELS', 'false').lower() == 'true',
+    # Exported ONNX models are kept here so workers skip the export on restart
+    'onnx_cache_dir': os.getenv('ONNX_CACHE_DIR', '/tmp/lexalyze-cache/onnx')
+}
+DISTILLED_MODELS = {
+    'qa_model': 'deepset/tinyroberta-squad2',
+    'summarizer': 'sshleifer/distilbart-cnn-12-6'
+}
+# Checkpoints in use, with the distilled ones replacing their full models when enabled
+ACTIVE_MODELS = {
+    key: DISTILLED_MODELS[key] if MODEL_CONFIGS['use_distilled'] and key in DISTILLED_MODELS else MODEL_CONFIGS[key]
+    for key in ('qa_model', 'summarizer', 'spacy_model')
+}
+# spaCy pipeline profile: 'fast' keeps only what the extractors read (NER and
+# sentence boundaries from senter), 'full' runs the whole pipeline
+SPACY_CONFIG = {
+    'profile': os.getenv('SPACY_PROFILE', 'fast'),
+    # Longer texts are parsed in chunks of about this many characters
+    'chunk_chars': int(os.getenv('SPACY_CHUNK_CHARS', '100000'))
 }
+# Stored analyses and paragraph results depend on these settings as well as on
+# the code, so workers configured differently neither serve nor overwrite each
+# other's rows
+PIPELINE_VERSION = ":".join([
+    ANALYSIS_CACHE_VERSION,
+    f"spacy={SPACY_CONFIG['profile']}",
+    f"inference={MODEL_CONFIGS['inference_backend']}",
+    *(f"{key}={name}" for key, name in sorted(ACTIVE_MODELS.items()))
+])
+# 'background' loads every model right after startup, 'lazy' on first use
+MODEL_WARMUP = os.getenv('MODEL_WARMUP', 'background')
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
 
+# Gemini is called over REST through one pooled client per worker; point
+# GEMINI_BASE_URL at a local server to run without the real API
+GEMINI_CONFIG = {
+    'model': os.getenv('GEMINI_MODEL', 'gemini-1.5-flash'),
+    'base_url': os.getenv('GEMINI_BASE_URL', 'https://generativelanguage.googleapis.com/v1beta'),
+    'timeout': float(os.getenv('GEMINI_TIMEOUT', '30')),
+    'max_concurrency': int(os.getenv('GEMINI_MAX_CONCURRENCY', '4')),
+    'max_connections': int(os.getenv('GEMINI_MAX_CONNECTIONS', '8')),
+    'response_cache_size': int(os.getenv('GEMINI_RESPONSE_CACHE_SIZE', '512')),
+    # Enrich new analyses in the background and update the cached copy
+    'enrich_analyses': os.getenv('GEMINI_ENRICH_ANALYSES', 'false').lower() == 'true'
+}
+
+# PDF pages are decoded in ranges, in parallel processes for large documents
+PDF_CONFIG = {
+    'pages_per_task': int(os.getenv('PDF_PAGES_PER_TASK', '8')),
+    'parallel_page_threshold': int(os.getenv('PDF_PARALLEL_PAGE_THRESHOLD', '16')),
+    # Text backend: pypdf2, or the layout-aware pdfium (pypdfium2) and pdfminer (pdfminer.six)
+    'backend': os.getenv('PDF_BACKEND', 'pypdf2'),
+    # OCR engine for pages without a text layer: none or tesseract (pytesseract and pypdfium2)
+    'ocr': os.getenv('PDF_OCR', 'none'),
+    'ocr_language': os.getenv('PDF_OCR_LANGUAGE', 'eng'),
+    'ocr_dpi': int(os.getenv('PDF_OCR_DPI', '300')),
+    # Pages with less extracted text than this are treated as scanned images
+    'ocr_min_chars': int(os.getenv('PDF_OCR_MIN_CHARS', '20')),
+    # Extracted page text is cached by page fingerprint, in process and in the analysis store
+    'page_cache_size': int(os.getenv('PDF_PAGE_CACHE_SIZE', '5000')),
+    'store_max_pages': int(os.getenv('PDF_STORE_MAX_PAGES', '200000'))
+}
+
+# Batch analysis: documents are parsed and summarized in groups
+BATCH_CONFIG = {
+    'max_documents': int(os.getenv('BATCH_MAX_DOCUMENTS', '500')),
+    'group_size': int(os.getenv('BATCH_GROUP_SIZE', '16')),
+    'spacy_batch_size': int(os.getenv('BATCH_SPACY_BATCH_SIZE', '16')),
+    'spacy_n_process': int(os.getenv('BATCH_SPACY_N_PROCESS', '1'))
+}
+
+# Documents longer than min_chars are cut into sentence-aligned shards that are
+# parsed and run through the spaCy-based extractors in the process pool, so one
+# huge document uses every core. Each pool process loads its own spaCy model.
+SHARD_CONFIG = {
+    'enabled': os.getenv('SHARD_LARGE_DOCUMENTS', 'true').lower() == 'true',
+    'min_chars': int(os.getenv('SHARD_MIN_CHARS', '200000')),
+    'shard_chars': int(os.getenv('SHARD_CHARS', '50000')),
+    # Text parsed past each end of a shard, so entities near its edges keep their context
+    'overlap_chars': int(os.getenv('SHARD_OVERLAP_CHARS', '200'))
+}
+
+# Passage retrieval for /query
+RETRIEVAL_CONFIG = {
+    'passage_max_words': int(os.getenv('RETRIEVAL_PASSAGE_WORDS', '120')),
+    'top_k': int(os.getenv('RETRIEVAL_TOP_K', '4')),
+    'index_cache_size': int(os.getenv('RETRIEVAL_INDEX_CACHE_SIZE', '256')),
+    'k1': 1.5,
+    'b': 0.75
+}
+
+# Cross-document search over every analyzed document
+SEARCH_CONFIG = {
+    'path': os.getenv('SEARCH_INDEX_PATH', '/tmp/lexalyze-cache/search.db'),
+    'default_limit': int(os.getenv('SEARCH_DEFAULT_LIMIT', '20')),
+    'max_limit': int(os.getenv('SEARCH_MAX_LIMIT', '100')),
+    # Most frequent values reported per facet, and matching clauses per hit
+    'facet_values': int(os.getenv('SEARCH_FACET_VALUES', '20')),
+    'snippets_per_hit': int(os.getenv('SEARCH_SNIPPETS_PER_HIT', '3'))
+}
+
+# Concurrent /query calls are coalesced into batched QA model calls
+QA_BATCH_CONFIG = {
+    'max_batch_size': int(os.getenv('QA_MAX_BATCH_SIZE', '16')),
+    'max_wait_ms': float(os.getenv('QA_MAX_WAIT_MS', '10')),
+    'max_in_flight': int(os.getenv('QA_MAX_IN_FLIGHT', '1'))
+}
+
+# /compare alignment: MinHash LSH over word shingles pairs modified items
+COMPARE_CONFIG = {
+    'similarity_threshold': float(os.getenv('COMPARE_SIMILARITY_THRESHOLD', '0.4')),
+    'shingle_size': 2,
+    'num_perm': 32,
+    'bands': 16,
+    'max_bucket_size': 64
+}
+
+# Chunked summarization; chunks must fit the summarizer's 1024-token window
+SUMMARY_CONFIG = {
+    'max_chunk_tokens': int(os.getenv('SUMMARY_MAX_CHUNK_TOKENS', '900')),
+    'max_chunks': int(os.getenv('SUMMARY_MAX_CHUNKS', '32')),
+    'batch_size': int(os.getenv('SUMMARY_BATCH_SIZE', '4')),
+    'latency_budget': float(os.getenv('SUMMARY_LATENCY_BUDGET', '30')),
+    'chunk_max_length': 120,
+    'chunk_min_length': 30,
+    'max_length': 150,
+    'min_length': 50,
+    'cache_size': int(os.getenv('SUMMARY_CACHE_SIZE', '4096'))
+}
+
+# Incremental analysis: paragraphs are hashed and their extraction results
+# cached, so an amended document only re-analyzes the paragraphs that changed
+INCREMENTAL_CONFIG = {
+    'enabled': os.getenv('INCREMENTAL_ANALYSIS', 'true').lower() == 'true',
+    # Longer paragraphs (e.g. PDF pages without blank lines) are split further
+    'max_paragraph_chars': int(os.getenv('INCREMENTAL_MAX_PARAGRAPH_CHARS', '3000')),
+    'paragraph_cache_size': int(os.getenv('INCREMENTAL_PARAGRAPH_CACHE_SIZE', '20000')),
+    'store_max_paragraphs': int(os.getenv('INCREMENTAL_STORE_MAX_PARAGRAPHS', '500000')),
+    # Share of paragraphs an earlier analysis must have to count as the prior version
+    'min_shared_fraction': float(os.getenv('INCREMENTAL_MIN_SHARED_FRACTION', '0.5'))
+}
+
+# Worker pools used to keep the pipeline off the event loop
+EXECUTOR_CONFIG = {
+    'thread_workers': int(os.getenv('EXECUTOR_THREAD_WORKERS', '4')),
+    'process_workers': int(os.getenv('EXECUTOR_PROCESS_WORKERS', str(min(4, os.cpu_count() or 1)))),
+    'max_concurrent_analyses': int(os.getenv('MAX_CONCURRENT_ANALYSES', '2')),
+    'max_pending_analyses': int(os.getenv('MAX_PENDING_ANALYSES', '16')),
+    'process_start_method': os.getenv('EXECUTOR_START_METHOD', 'spawn')
+}
+
 # Patterns
 PATTERNS = {
     'citation': r'\d+\s+[A-Za-z\.]+\s+\d+|[A-Z]+\s+v\.\s+[A-Z]+|\[\d+\]\s+[A-Za-z\s]+\s+\d+',
@@ -0,0 +1,106 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import asynccontextmanager
+from functools import partial
+from typing import Any, Callable, Optional
+from fastapi import HTTPException
+from .config import logger, EXECUTOR_CONFIG
+
+class AnalysisExecutor:
+    """Run blocking pipeline work off the event loop with bounded concurrency.
+
+    Model calls (spaCy, transformers) release the GIL for most of their work and
+    go to a thread pool; pure-Python extractors go to a process pool. Setting
+    ``process_workers`` to 0 runs everything on the thread pool instead.
+    """
+
+    def __init__(
+        self,
+        thread_workers: int = 4,
+        process_workers: int = 0,
+        max_concurrent_analyses: int = 2,
+        max_pending_analyses: int = 16,
+        process_start_method: str = 'spawn'
+    ):
+        self.thread_workers = thread_workers
+        self.process_workers = process_workers
+        self.max_concurrent_analyses = max_concurrent_analyses
+        self.max_pending_analyses = max_pending_analyses
+        self.process_start_method = process_start_method
+
+        self._thread_pool: Optional[ThreadPoolExecutor] = None
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        self._semaphore = asyncio.Semaphore(max_concurrent_analyses)
+        self._pending = 0
+
+    @property
+    def thread_pool(self) -> ThreadPoolExecutor:
+        # Pools are created on first use so forked workers never inherit them
+        if self._thread_pool is None:
+            self._thread_pool = ThreadPoolExecutor(
+                max_workers=self.thread_workers,
+                thread_name_prefix="lexalyze-model"
+            )
+        return self._thread_pool
+
+    @property
+    def process_pool(self) -> Executor:
+        if self.process_workers <= 0:
+            return self.thread_pool
+        if self._process_pool is None:
+            self._process_pool = ProcessPoolExecutor(
+                max_workers=self.process_workers,
+                mp_context=multiprocessing.get_context(self.process_start_method)
+            )
+        return self._process_pool
+
+    @property
+    def pending(self) -> int:
+        """Number of analyses running or waiting for a slot"""
+        return self._pending
+
+    async def run_model(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run a model call on the thread pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.thread_pool, partial(fn, *args, **kwargs))
+
+    async def run_cpu(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run a CPU-bound function on the process pool; ``fn`` must be picklable"""
+        loop = asyncio.get_running_loop()
+        pool = self.process_pool
+        try:
+            return await loop.run_in_executor(pool, partial(fn, *args, **kwargs))
+        except BrokenProcessPool:
+            # A crashed worker poisons the whole pool; start a fresh one next time
+            logger.error("Process pool broke, it will be recreated")
+            if self._process_pool is pool:
+                self._process_pool = None
+            raise
+
+    @asynccontextmanager
+    async def slot(self):
+        """Reserve an analysis slot, rejecting new work once the queue is full"""
+        if self._pending >= self.max_concurrent_analyses + self.max_pending_analyses:
+            logger.warning(f"Analysis queue full ({self._pending} pending), rejecting request")
+            raise HTTPException(status_code=503, detail="Server is busy, please retry later")
+
+        self._pending += 1
+        try:
+            async with self._semaphore:
+                yield
+        finally:
+            self._pending -= 1
+
+    def shutdown(self) -> None:
+        """Stop the worker pools"""
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=False, cancel_futures=True)
+            self._process_pool = None
+        if self._thread_pool is not None:
+            self._thread_pool.shutdown(wait=False, cancel_futures=True)
+            self._thread_pool = None
+
+
+analysis_executor = AnalysisExecutor(**EXECUTOR_CONFIG)
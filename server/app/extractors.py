@@ -0,0 +1,265 @@
+import re
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from .models import LegalCitation
+from .config import PATTERNS
+from .matchers import TextScan, TextScanner
+
+# Text-level extractors only need the raw document text, so they live apart from
+# the model-backed processor and can be shipped to worker processes cheaply.
+
+# Case-insensitive extraction rules, written in lower case for the scanner and
+# applied in the order listed. A quoted term is matched as "(?=([^"]+))\1",
+# which matches what "([^"]+)" does but never backtracks into the term: from a
+# closing quote that would otherwise re-scan the text up to the next quote.
+DEFINITION_RULES = {
+    "definition.means": r'"(?=([^"]+))\1"\s+means\s+([^\.]+)',
+    "definition.shall_mean": r'"(?=([^"]+))\1"\s+shall\s+mean\s+([^\.]+)',
+    "definition.defined_as": r'term\s+"(?=([^"]+))\1"\s+is\s+defined\s+as\s+([^\.]+)',
+    "definition.refers_to": r'"(?=([^"]+))\1"\s+refers\s+to\s+([^\.]+)'
+}
+
+DEADLINE_RULES = {
+    "deadline.within": r"within\s+(\d+)\s+(day|month|year)s?",
+    "deadline.no_later_than": r"no\s+later\s+than\s+([^\.]+)",
+    "deadline.deadline": r"deadline\s+[^\.]+",
+    "deadline.due": r"due\s+(?:date|by)\s+([^\.]+)"
+}
+
+GOVERNING_LAW_RULES = {
+    "governing_law.laws_of": r"governed\s+by\s+the\s+laws\s+of\s+([^\.]+)",
+    "governing_law.jurisdiction_of": r"subject\s+to\s+the\s+jurisdiction\s+of\s+([^\.]+)",
+    "governing_law.indian_law": r"indian\s+law",
+    "governing_law.laws_of_india": r"laws\s+of\s+india"
+}
+
+JURISDICTION_RULES = {
+    "jurisdiction.courts_of": r"courts\s+of\s+([^\.]+)",
+    "jurisdiction.jurisdiction_of": r"jurisdiction\s+of\s+([^\.]+)",
+    "jurisdiction.exclusive": r"subject\s+to\s+the\s+exclusive\s+jurisdiction\s+of\s+([^\.]+)"
+}
+
+DOCUMENT_TYPES = {
+    "contract": ["agreement", "contract", "terms and conditions"],
+    "court_filing": ["motion", "petition", "complaint", "brief"],
+    "legislation": ["act", "statute", "bill", "regulation"],
+    "opinion": ["opinion", "decision", "order", "judgment"],
+}
+
+YEAR_PATTERN = re.compile(r'\d{4}')
+
+# A heading on a line of its own: "Section 5", "ARTICLE IV", "5.2 Payment Terms",
+# "12. Governing Law". The pdfium and pdfminer backends and plain text keep
+# these lines. Titles are in title case, which tells them from the first line of
+# a numbered clause.
+HEADING_TITLE = r"[A-Z][\w&'-]*(?:[ \t]+(?:[A-Z][\w&'-]*|and|or|of|the|to|for|in|on|&))*"
+SECTION_HEADING = re.compile(
+    r"^[ \t]*("
+    r"(?i:section|article|clause|part|schedule)[ \t]+(?:\d{1,3}(?:\.\d{1,3})*|[IVXLC]+|[ivxlc]+|[A-Z])\b"
+    rf"(?:[ \t]*[.:-]?[ \t]*{HEADING_TITLE})?\.?"
+    rf"|\d{{1,3}}(?:\.\d{{1,3}})*\.?[ \t]+{HEADING_TITLE}"
+    r")[ \t]*$",
+    re.MULTILINE
+)
+# Longer lines are never headings
+MAX_HEADING_CHARS = 120
+
+# Compiled once per process; every extractor reads its matches from one scan
+# of the text, which lowers it once for all the case-insensitive rules
+text_scanner = TextScanner(
+    folded={**DEFINITION_RULES, **DEADLINE_RULES, **GOVERNING_LAW_RULES, **JURISDICTION_RULES},
+    cased={name: PATTERNS[name] for name in ("citation", "monetary", "date")}
+)
+
+class LegalTextExtractor:
+    def __init__(self):
+        # Legal-specific patterns
+        self.citation_pattern = PATTERNS['citation']
+        self.monetary_pattern = PATTERNS['monetary']
+        self.date_pattern = PATTERNS['date']
+
+    def _determine_document_type(self, text: str) -> str:
+        """Determine the type of legal document"""
+        return self._document_type(text_scanner.scan(text))
+
+    def _document_type(self, scan: TextScan) -> str:
+        for doc_type, keywords in DOCUMENT_TYPES.items():
+            if any(keyword in scan.lowered for keyword in keywords):
+                return doc_type
+
+        return "other"
+
+    def extract_citations(self, text: str) -> List[LegalCitation]:
+        """Extract legal citations from text"""
+        return self._citations(text_scanner.scan(text))
+
+    def _citations(self, scan: TextScan) -> List[LegalCitation]:
+        citations = []
+        for match in scan.matches("citation"):
+            citation_text = match.group()
+            year_match = YEAR_PATTERN.search(citation_text)
+            year = int(year_match.group()) if year_match else None
+
+            citations.append(LegalCitation(
+                citation_text=citation_text,
+                year=year,
+                source=self._determine_citation_source(citation_text),
+                page=None
+            ))
+
+        return citations
+
+    def _extract_definitions(self, text: str) -> Dict[str, str]:
+        """Extract defined terms and their definitions"""
+        return self._definitions(text_scanner.scan(text))
+
+    def _definitions(self, scan: TextScan) -> Dict[str, str]:
+        definitions = {}
+        for rule in DEFINITION_RULES:
+            for match in scan.matches(rule):
+                definitions[scan.group(match, 1).strip()] = scan.group(match, 2).strip()
+
+        return definitions
+
+    def _determine_citation_source(self, citation: str) -> Optional[str]:
+        """Determine the source of a legal citation"""
+        if "AIR" in citation:
+            return "All India Reporter"
+        elif "SCC" in citation:
+            return "Supreme Court Cases"
+        elif "SC" in citation:
+            return "Supreme Court"
+        elif "HC" in citation:
+            return "High Court"
+        elif "ILR" in citation:
+            return "Indian Law Reports"
+        return None
+
+    def extract_deadlines(self, text: str) -> List[Dict[str, str]]:
+        """Extract deadlines and time-sensitive information"""
+        return self._deadlines(text_scanner.scan(text))
+
+    def _deadlines(self, scan: TextScan) -> List[Dict[str, str]]:
+        text = scan.text
+        deadlines = []
+        for rule in DEADLINE_RULES:
+            for match in scan.matches(rule):
+                start, end = match.span()
+                date_match = scan.search("date", start, end)
+                deadlines.append({
+                    "text": text[start:end],
+                    "date": date_match.group() if date_match else None,
+                    "context": text[max(0, start-50):min(len(text), end+50)]
+                })
+
+        return deadlines
+
+    def extract_monetary_values(self, text: str) -> List[Dict[str, str]]:
+        """Extract monetary values and related context"""
+        return self._monetary_values(text_scanner.scan(text))
+
+    def _monetary_values(self, scan: TextScan) -> List[Dict[str, str]]:
+        text = scan.text
+        return [
+            {
+                "value": match.group(),
+                "context": text[max(0, match.start()-50):min(len(text), match.end()+50)]
+            }
+            for match in scan.matches("monetary")
+        ]
+
+    def _first_capture(self, scan: TextScan, rules: Dict[str, str]) -> Optional[str]:
+        """The first group of the leftmost match of the first rule that matches,
+        or the whole match for rules without a group"""
+        for rule in rules:
+            match = scan.first(rule)
+            if match:
+                return scan.group(match, 1 if match.re.groups else 0)
+        return None
+
+    def _extract_governing_law(self, text: str) -> Optional[str]:
+        """Extract the governing law from the text"""
+        return self._first_capture(text_scanner.scan(text), GOVERNING_LAW_RULES)
+
+    def _extract_jurisdiction(self, text: str) -> Optional[str]:
+        """Extract the jurisdiction from the text"""
+        return self._first_capture(text_scanner.scan(text), JURISDICTION_RULES)
+
+
+_extractor: Optional[LegalTextExtractor] = None
+
+def _get_extractor() -> LegalTextExtractor:
+    """Return the extractor for the current process, creating it on first use"""
+    global _extractor
+    if _extractor is None:
+        _extractor = LegalTextExtractor()
+    return _extractor
+
+def extract_text_features(text: str) -> Dict[str, Any]:
+    """Run every text-level extractor over the document text"""
+    extractor = _get_extractor()
+    scan = text_scanner.scan(text)
+    return {
+        "document_type": extractor._document_type(scan),
+        "citations": extractor._citations(scan),
+        "legal_definitions": extractor._definitions(scan),
+        "deadlines": extractor._deadlines(scan),
+        "jurisdiction": extractor._first_capture(scan, JURISDICTION_RULES),
+        "governing_law": extractor._first_capture(scan, GOVERNING_LAW_RULES),
+        "monetary_values": extractor._monetary_values(scan),
+    }
+
+def extract_document_fields(text: str) -> Dict[str, Any]:
+    """Run the extractors that look at the document as a whole"""
+    extractor = _get_extractor()
+    scan = text_scanner.scan(text)
+    return {
+        "document_type": extractor._document_type(scan),
+        "jurisdiction": extractor._first_capture(scan, JURISDICTION_RULES),
+        "governing_law": extractor._first_capture(scan, GOVERNING_LAW_RULES),
+    }
+
+def extract_paragraph_features(paragraphs: List[str]) -> List[Dict[str, Any]]:
+    """Run the extractors whose results are local to a paragraph, one paragraph at a time"""
+    extractor = _get_extractor()
+    features = []
+    for text in paragraphs:
+        scan = text_scanner.scan(text)
+        features.append({
+            "citations": [citation.model_dump() for citation in extractor._citations(scan)],
+            "legal_definitions": extractor._definitions(scan),
+            "deadlines": extractor._deadlines(scan),
+            "monetary_values": extractor._monetary_values(scan),
+        })
+    return features
+
+def extract_page_features(text: str) -> Dict[str, Any]:
+    """Run the extractors reported for each page while a document streams in"""
+    extractor = _get_extractor()
+    scan = text_scanner.scan(text)
+    return {
+        "deadlines": extractor._deadlines(scan),
+        "monetary_values": extractor._monetary_values(scan),
+    }
+
+def section_heading(text: str) -> Optional[str]:
+    """The last section heading in the text, if it has one"""
+    heading = None
+    for match in SECTION_HEADING.finditer(text):
+        heading = match.group(1)
+    return " ".join(heading.split()) if heading else None
+
+def sentence_sections(sentences: Iterable[str], section: str = "Unknown") -> Iterator[str]:
+    """The heading each sentence falls under, reading the sentences in document order.
+
+    Sentences and lines cross: a heading can end a sentence, and the parser can
+    cut one after a heading's number ("12." and "Governing Law"). So each
+    sentence continues the line the previous one ended on, and only the lines a
+    sentence completes are read for headings.
+    """
+    line = ""
+    for text in sentences:
+        *complete, line = (line + " " + text).split("\n")
+        section = section_heading("\n".join(complete)) or section
+        line = line[:MAX_HEADING_CHARS]
+        yield section
@@ -1,21 +1,178 @@
+import asyncio
+import hashlib
 import json
-from typing import Dict, Any
+from typing import Dict, Any, Optional, Tuple
 from datetime import datetime
-import google.generativeai as genai
+
+import httpx
+from cachetools import LRUCache
 
 from .models import LegalAnalysis
-from .config import logger, GEMINI_API_KEY
+from .cache import cache_analysis
+from .config import logger, GEMINI_API_KEY, GEMINI_CONFIG
 
-def initialize_gemini_model():
-    """Initialize and return the Gemini model"""
-    try:
-        genai.configure(api_key=GEMINI_API_KEY)
-        return genai.GenerativeModel('gemini-1.5-flash')
-    except Exception as e:
-        logger.error(f"Failed to initialize Gemini model: {str(e)}")
-        return None
+class GeminiClient:
+    """Long-lived async client for the Gemini ``generateContent`` REST endpoint.
+
+    One pooled HTTP client is kept per worker so connections are reused across
+    calls, the number of concurrent requests is capped, and responses are cached
+    by prompt hash. Identical prompts in flight at the same time share one call.
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str],
+        model: str = 'gemini-1.5-flash',
+        base_url: str = 'https://generativelanguage.googleapis.com/v1beta',
+        timeout: float = 30,
+        max_concurrency: int = 4,
+        max_connections: int = 8,
+        response_cache_size: int = 512,
+        enrich_analyses: bool = False,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ):
+        self.api_key = api_key
+        self.model = model
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.enrich_analyses = enrich_analyses
+        # Replaces the network, e.g. with an httpx.MockTransport
+        self.transport = transport
+
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._responses = LRUCache(maxsize=response_cache_size)
+        self._in_flight: Dict[str, asyncio.Future] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.api_key)
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        # Created on first use so it binds to the running event loop
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={'x-goog-api-key': self.api_key or ''},
+                timeout=httpx.Timeout(self.timeout),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections
+                ),
+                transport=self.transport
+            )
+        return self._client
+
+    def _prompt_key(self, prompt: str) -> str:
+        return hashlib.sha256(f"{self.model}\0{prompt}".encode('utf-8')).hexdigest()
+
+    async def generate(self, prompt: str) -> str:
+        """Return the model's text response to a prompt, served from cache when possible"""
+        key = self._prompt_key(prompt)
+        if key in self._responses:
+            return self._responses[key]
+
+        future = self._in_flight.get(key)
+        if future is None:
+            future = self._in_flight[key] = asyncio.ensure_future(self._request(key, prompt))
+            future.add_done_callback(lambda _: self._in_flight.pop(key, None))
+
+        return await asyncio.shield(future)
+
+    async def _request(self, key: str, prompt: str) -> str:
+        """Call the API once for every caller waiting on the prompt, and cache the text"""
+        async with self._semaphore:
+            response = await self.http.post(
+                f"/models/{self.model}:generateContent",
+                json={
+                    "contents": [{"parts": [{"text": prompt}]}],
+                    "generationConfig": {"responseMimeType": "application/json"}
+                }
+            )
+        response.raise_for_status()
+        body = response.json()
+        text = self._responses[key] = "".join(
+            part.get("text", "")
+            for part in body["candidates"][0]["content"]["parts"]
+        )
+        return text
+
+    async def aclose(self) -> None:
+        """Close the pooled connections"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+gemini_client = GeminiClient(GEMINI_API_KEY, **GEMINI_CONFIG)
+
+def _analysis_prompt(analysis: LegalAnalysis) -> str:
+    """Build the prompt asking Gemini to enrich an analysis"""
+    return f"""
+    Analyze and enhance the following legal document insights:
+
+    Document Type: {analysis.document_type}
+    Summary: {analysis.summary}
+
+    Key Details:
+    - Entities: {', '.join(analysis.entities.parties + analysis.entities.organizations)}
+    - Jurisdiction: {analysis.jurisdiction or 'Not specified'}
+    - Governing Law: {analysis.governing_law or 'Not specified'}
+    
+    Key Clauses: {', '.join([clause.clause_type for clause in analysis.key_clauses])}
+    
+    Deadlines: {', '.join([d['text'] for d in analysis.deadlines])}
+    
+    Risk Factors: {', '.join(analysis.risk_factors)}
+
+    Tasks:
+    1. Provide a more nuanced and professional summary
+    2. Identify potential legal risks or opportunities
+    3. Suggest potential areas of further investigation
+    4. Clean up and standardize the extracted information
+    5. Add contextual insights based on the document type and content
+
+    Respond in the following JSON format:
+    {{
+        "enhanced_summary": "string",
+        "additional_risk_factors": ["string"],
+        "suggested_investigations": ["string"],
+        "key_insights": ["string"]
+    }}
+
+    Don't Add any language or markdown decorators, just pure json response is needed.
+    """
+
+def _qa_prompt(qa_response: Dict[str, Any]) -> str:
+    """Build the prompt asking Gemini to refine a QA answer"""
+    return f"""
+    Enhance the following question-answering response:
+
+    Original Answer: {qa_response['answer']}
+    Confidence Score: {qa_response['score']}
+
+    Tasks:
+    1. Refine and improve the answer's clarity, language, and professional tone
+    2. Add contextual insights or additional relevant information
+    3. Assess the completeness and accuracy of the original answer
+    4. Suggest potential follow-up questions or areas of further investigation
+    5. Provide a confidence assessment based on the original response
+
+    Respond in the following JSON format:
+    {{
+        "enhanced_answer": "string",
+        "additional_context": ["string"],
+        "confidence_assessment": "string",
+        "suggested_follow_up_questions": ["string"],
+        "improved_score": float
+    }}
 
-def enrich_legal_analysis(analysis: LegalAnalysis) -> LegalAnalysis:
+    Don't Add any language or markdown decorators, just pure json response is needed.
+    """
+
+async def enrich_legal_analysis(analysis: LegalAnalysis) -> LegalAnalysis:
     """
     Enrich legal analysis using Gemini AI
     
@@ -23,87 +180,47 @@ def enrich_legal_analysis(analysis: LegalAnalysis) -> LegalAnalysis:
         analysis (LegalAnalysis): The initial legal analysis to be enriched
     
     Returns:
-        LegalAnalysis: Enhanced legal analysis with additional insights
+        LegalAnalysis: Enhanced copy of the analysis, or the original if enrichment fails
     """
-    # Initialize Gemini model
-    gemini_model = initialize_gemini_model()
-    if not gemini_model:
-        logger.warning("Gemini model not initialized. Returning original analysis.")
+    if not gemini_client.enabled:
+        logger.warning("Gemini API key not configured. Returning original analysis.")
         return analysis
 
     try:
-        # Prepare a comprehensive prompt for Gemini
-        enrichment_prompt = f"""
-        Analyze and enhance the following legal document insights:
-
-        Document Type: {analysis.document_type}
-        Summary: {analysis.summary}
-
-        Key Details:
-        - Entities: {', '.join(analysis.entities.parties + analysis.entities.organizations)}
-        - Jurisdiction: {analysis.jurisdiction or 'Not specified'}
-        - Governing Law: {analysis.governing_law or 'Not specified'}
-        
-        Key Clauses: {', '.join([clause.clause_type for clause in analysis.key_clauses])}
-        
-        Deadlines: {', '.join([d['text'] for d in analysis.deadlines])}
-        
-        Risk Factors: {', '.join(analysis.risk_factors)}
-
-        Tasks:
-        1. Provide a more nuanced and professional summary
-        2. Identify potential legal risks or opportunities
-        3. Suggest potential areas of further investigation
-        4. Clean up and standardize the extracted information
-        5. Add contextual insights based on the document type and content
-
-        Respond in the following JSON format:
-        {{
-            "enhanced_summary": "string",
-            "additional_risk_factors": ["string"],
-            "suggested_investigations": ["string"],
-            "key_insights": ["string"]
-        }}
-
-        Don't Add any language or markdown decorators, just pure json response is needed.
-        """
-
         # Generate enrichment response
-        response = gemini_model.generate_content(enrichment_prompt)
-        
-        # Parse and integrate Gemini's insights
-        try:
-            gemini_insights = json.loads(response.text)
-            
-            # Update analysis with Gemini's enrichments
-            if 'enhanced_summary' in gemini_insights:
-                analysis.summary = gemini_insights.get('enhanced_summary', analysis.summary)
-            
-            if 'additional_risk_factors' in gemini_insights:
-                analysis.risk_factors.extend(gemini_insights.get('additional_risk_factors', []))
-            
-            # Add enrichment insights to metadata
-            analysis.metadata['gemini_enrichments'] = {
-                'suggested_investigations': gemini_insights.get('suggested_investigations', []),
-                'key_insights': gemini_insights.get('key_insights', [])
-            }
-            
-            # Add a flag to indicate Gemini enrichment
-            analysis.metadata['enriched_by_gemini'] = True
-            analysis.metadata['gemini_enrichment_timestamp'] = datetime.now().isoformat()
-        
-        except (json.JSONDecodeError, TypeError) as parse_error:
-            logger.warning(f"Could not parse Gemini response: {str(parse_error)}")
-            # Log the actual response for debugging
-            logger.warning(f"Gemini response: {response.text}")
-        
-        return analysis
-    
+        response_text = await gemini_client.generate(_analysis_prompt(analysis))
     except Exception as e:
         logger.error(f"Gemini enrichment failed: {str(e)}")
         # Return original analysis if enrichment fails
         return analysis
-def enrich_qa_response(qa_response: Dict[str, Any]) -> Dict[str, Any]:
+
+    # Parse and integrate Gemini's insights
+    try:
+        gemini_insights = json.loads(response_text)
+
+        # Cached analyses are shared, so enrich a copy
+        enriched = analysis.model_copy(deep=True)
+        enriched.summary = gemini_insights.get('enhanced_summary', enriched.summary)
+        enriched.risk_factors.extend(gemini_insights.get('additional_risk_factors', []))
+
+        # Add enrichment insights to metadata, which only holds strings
+        enriched.metadata['gemini_enrichments'] = json.dumps({
+            'suggested_investigations': gemini_insights.get('suggested_investigations', []),
+            'key_insights': gemini_insights.get('key_insights', [])
+        })
+
+        # Add a flag to indicate Gemini enrichment
+        enriched.metadata['enriched_by_gemini'] = 'true'
+        enriched.metadata['gemini_enrichment_timestamp'] = datetime.now().isoformat()
+        return enriched
+
+    except (json.JSONDecodeError, TypeError, AttributeError) as parse_error:
+        logger.warning(f"Could not parse Gemini response: {str(parse_error)}")
+        # Log the actual response for debugging
+        logger.warning(f"Gemini response: {response_text}")
+        return analysis
+
+async def enrich_qa_response(qa_response: Dict[str, Any]) -> Dict[str, Any]:
     """
     Enrich and improve a QA model response using Gemini AI
     
@@ -113,67 +230,59 @@ def enrich_qa_response(qa_response: Dict[str, Any]) -> Dict[str, Any]:
     Returns:
         Dict[str, Any]: Enhanced QA response with additional insights
     """
-    # Initialize Gemini model
-    gemini_model = initialize_gemini_model()
-    if not gemini_model:
-        logger.warning("Gemini model not initialized. Returning original QA response.")
+    if not gemini_client.enabled:
+        logger.warning("Gemini API key not configured. Returning original QA response.")
         return qa_response
 
     try:
-        # Prepare a comprehensive prompt for Gemini to enhance the QA response
-        enrichment_prompt = f"""
-        Enhance the following question-answering response:
-
-        Original Answer: {qa_response['answer']}
-        Confidence Score: {qa_response['score']}
-
-        Tasks:
-        1. Refine and improve the answer's clarity, language, and professional tone
-        2. Add contextual insights or additional relevant information
-        3. Assess the completeness and accuracy of the original answer
-        4. Suggest potential follow-up questions or areas of further investigation
-        5. Provide a confidence assessment based on the original response
-
-        Respond in the following JSON format:
-        {{
-            "enhanced_answer": "string",
-            "additional_context": ["string"],
-            "confidence_assessment": "string",
-            "suggested_follow_up_questions": ["string"],
-            "improved_score": float
-        }}
-
-        Don't Add any language or markdown decorators, just pure json response is needed.
-        """
-
         # Generate enrichment response
-        response = gemini_model.generate_content(enrichment_prompt)
-        
-        # Parse and integrate Gemini's insights
-        try:
-            gemini_insights = json.loads(response.text)
-            
-            # Update QA response with Gemini's enrichments
-            enriched_response = {
-                'answer': gemini_insights.get('enhanced_answer', qa_response['answer']),
-                'score': gemini_insights.get('improved_score', qa_response['score']),
-                'metadata': {
-                    'additional_context': gemini_insights.get('additional_context', []),
-                    'confidence_assessment': gemini_insights.get('confidence_assessment', ''),
-                    'suggested_follow_up_questions': gemini_insights.get('suggested_follow_up_questions', []),
-                    'original_score': qa_response['score']
-                }
-            }
-            
-            return enriched_response
-        
-        except (json.JSONDecodeError, TypeError) as parse_error:
-            logger.warning(f"Could not parse Gemini QA response enrichment: {str(parse_error)}")
-            # Log the actual response for debugging
-            logger.warning(f"Gemini response: {response.text}")
-            return qa_response
-    
+        response_text = await gemini_client.generate(_qa_prompt(qa_response))
     except Exception as e:
         logger.error(f"Gemini QA response enrichment failed: {str(e)}")
         # Return original QA response if enrichment fails
-        return qa_response
\ No newline at end of file
+        return qa_response
+
+    # Parse and integrate Gemini's insights
+    try:
+        gemini_insights = json.loads(response_text)
+
+        # Update QA response with Gemini's enrichments
+        return {
+            'answer': gemini_insights.get('enhanced_answer', qa_response['answer']),
+            'score': gemini_insights.get('improved_score', qa_response['score']),
+            'metadata': {
+                'additional_context': gemini_insights.get('additional_context', []),
+                'confidence_assessment': gemini_insights.get('confidence_assessment', ''),
+                'suggested_follow_up_questions': gemini_insights.get('suggested_follow_up_questions', []),
+                'original_score': qa_response['score']
+            }
+        }
+
+    except (json.JSONDecodeError, TypeError, AttributeError) as parse_error:
+        logger.warning(f"Could not parse Gemini QA response enrichment: {str(parse_error)}")
+        # Log the actual response for debugging
+        logger.warning(f"Gemini response: {response_text}")
+        return qa_response
+
+
+# Enrichment runs after the response is sent; keep the tasks referenced
+_enrichment_tasks: Dict[Tuple[str, str], asyncio.Task] = {}
+
+def schedule_enrichment(content_hash: str, file_type: str, analysis: LegalAnalysis) -> None:
+    """Enrich an analysis in the background and replace the cached copy when done"""
+    if not (gemini_client.enrich_analyses and gemini_client.enabled):
+        return
+    if analysis.metadata.get('enriched_by_gemini') == 'true':
+        return
+
+    key = (content_hash, file_type)
+    if key in _enrichment_tasks:
+        return
+
+    async def run() -> None:
+        enriched = await enrich_legal_analysis(analysis)
+        if enriched is not analysis:
+            await cache_analysis(content_hash, file_type, enriched)
+
+    task = _enrichment_tasks[key] = asyncio.create_task(run())
+    task.add_done_callback(lambda _: _enrichment_tasks.pop(key, None))
@@ -0,0 +1,137 @@
+import asyncio
+import hashlib
+import re
+from typing import Any, Dict, List, Optional
+from cachetools import LRUCache
+from .cache import analysis_store
+from .config import logger, INCREMENTAL_CONFIG
+from .extractors import section_heading
+from .spacy_pipeline import split_text
+
+# Amended documents mostly repeat their earlier version, so extraction results
+# are cached per paragraph under a hash of the paragraph's text. A re-upload
+# only parses and scans the paragraphs whose hash has not been seen before.
+
+PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+# Line breaks that end a sentence, the only safe cut in PDF text without blank lines
+SENTENCE_LINE_BREAK = re.compile(r"(?<=[.;:!?])[ \t]*\n")
+SENTENCE_BREAK = re.compile(r"(?<=[.;!?])\s+(?=[A-Z0-9(\"])")
+
+ENTITY_FIELDS = ("parties", "judges", "lawyers", "courts", "organizations")
+
+paragraph_cache = LRUCache(maxsize=INCREMENTAL_CONFIG['paragraph_cache_size'])
+
+def paragraph_hash(paragraph: str) -> str:
+    """Hash a paragraph, ignoring the spacing within its lines.
+
+    Line breaks are kept: headings and sections are read line by line, so
+    moving a break can change them.
+    """
+    normalized = "\n".join(" ".join(line.split()) for line in paragraph.splitlines())
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()
+
+def _group_pieces(pieces: List[str], separator: str, max_chars: int) -> List[str]:
+    """Regroup pieces with content-defined boundaries so an edit only moves nearby cuts"""
+    groups, current, size = [], [], 0
+    for piece in pieces:
+        if current and size + len(piece) > max_chars:
+            groups.append(separator.join(current))
+            current, size = [], 0
+        current.append(piece)
+        size += len(piece) + len(separator)
+        if hashlib.sha1(piece.encode('utf-8')).digest()[0] % 4 == 0:
+            groups.append(separator.join(current))
+            current, size = [], 0
+    if current:
+        groups.append(separator.join(current))
+    return groups
+
+def _split_long(block: str, max_chars: int) -> List[str]:
+    if len(block) <= max_chars:
+        return [block]
+    for pattern, separator in ((SENTENCE_LINE_BREAK, "\n"), (SENTENCE_BREAK, " ")):
+        pieces = [piece.strip() for piece in pattern.split(block) if piece.strip()]
+        if len(pieces) > 1:
+            return [
+                part
+                for group in _group_pieces(pieces, separator, max_chars)
+                for part in _split_long(group, max_chars)
+            ]
+    return [piece.strip() for piece in split_text(block, max_chars) if piece.strip()]
+
+def split_paragraphs(text: str, max_chars: int = INCREMENTAL_CONFIG['max_paragraph_chars']) -> List[str]:
+    """Split text into paragraphs, cutting overlong ones at sentence boundaries"""
+    paragraphs = []
+    for block in PARAGRAPH_BREAK.split(text):
+        block = block.strip()
+        if block:
+            paragraphs.extend(_split_long(block, max_chars))
+    return paragraphs
+
+async def load_paragraph_features(paragraph_hashes: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Cached results for whichever paragraphs were analyzed before, by hash"""
+    found = {h: paragraph_cache[h] for h in paragraph_hashes if h in paragraph_cache}
+    missing = [h for h in dict.fromkeys(paragraph_hashes) if h not in found]
+    if missing:
+        try:
+            stored = await asyncio.to_thread(analysis_store.get_paragraphs, missing)
+        except Exception as e:
+            logger.error(f"Paragraph store lookup failed: {str(e)}")
+            stored = {}
+        paragraph_cache.update(stored)
+        found.update(stored)
+    return found
+
+async def save_paragraph_features(
+    features: Dict[str, Dict[str, Any]],
+    doc_id: str,
+    paragraph_hashes: List[str]
+) -> None:
+    """Cache new paragraph results and record the paragraphs of a document"""
+    paragraph_cache.update(features)
+    try:
+        await asyncio.to_thread(analysis_store.put_paragraphs, features, doc_id, paragraph_hashes)
+    except Exception as e:
+        logger.error(f"Paragraph store write failed: {str(e)}")
+
+async def find_previous_version(paragraph_hashes: List[str], doc_id: str) -> Optional[str]:
+    """The earlier analysis that shares enough paragraphs to be this document's prior version"""
+    min_shared = max(1, int(len(set(paragraph_hashes)) * INCREMENTAL_CONFIG['min_shared_fraction']))
+    try:
+        return await asyncio.to_thread(analysis_store.find_previous_version, paragraph_hashes, doc_id, min_shared)
+    except Exception as e:
+        logger.error(f"Previous version lookup failed: {str(e)}")
+        return None
+
+def merge_paragraph_features(paragraphs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Combine per-paragraph results, in document order, into document-level results"""
+    entities = {field: {} for field in ENTITY_FIELDS}
+    merged = {
+        "sentences": [],
+        "key_clauses": [],
+        "obligations": [],
+        "risk_factors": [],
+        "citations": [],
+        "legal_definitions": {},
+        "deadlines": [],
+        "monetary_values": [],
+    }
+    section = None
+    for features in paragraphs:
+        for field in ENTITY_FIELDS:
+            entities[field].update(dict.fromkeys(features["entities"][field]))
+        for key in ("sentences", "obligations", "risk_factors", "citations", "monetary_values"):
+            merged[key].extend(features[key])
+        # Clauses before a paragraph's own first heading sit under the one of an
+        # earlier paragraph, which the paragraph alone could not see
+        merged["key_clauses"].extend(
+            {**clause, "section": section} if section and clause["section"] == "Unknown" else clause
+            for clause in features["key_clauses"]
+        )
+        section = section_heading(" ".join(features["sentences"])) or section
+        # Deadlines are normalized in place later; keep the cached ones intact
+        merged["deadlines"].extend(dict(deadline) for deadline in features["deadlines"])
+        merged["legal_definitions"].update(features["legal_definitions"])
+
+    merged["entities"] = {field: list(names) for field, names in entities.items()}
+    return merged
@@ -0,0 +1,66 @@
+import os
+from typing import Any, Optional
+from .config import logger, MODEL_CONFIGS, DISTILLED_MODELS, ACTIVE_MODELS
+
+# Transformers pipelines for the QA model and summarizer on one of several CPU
+# backends. Every backend returns a regular ``transformers.pipeline``, so the
+# callers (batched QA, map-reduce summarization) do not change.
+
+BACKENDS = ('pytorch', 'quantized', 'onnx')
+
+TASK_MODEL_CLASSES = {
+    'question-answering': ('AutoModelForQuestionAnswering', 'ORTModelForQuestionAnswering'),
+    'summarization': ('AutoModelForSeq2SeqLM', 'ORTModelForSeq2SeqLM'),
+}
+
+def resolve_model_name(key: str, use_distilled: Optional[bool] = None) -> str:
+    """Checkpoint configured for a model key, or its distilled replacement"""
+    if use_distilled is None:
+        return ACTIVE_MODELS[key]
+    if use_distilled and key in DISTILLED_MODELS:
+        return DISTILLED_MODELS[key]
+    return MODEL_CONFIGS[key]
+
+def _load_quantized(task: str, model_name: str) -> Any:
+    import torch
+    import transformers
+
+    model_class = getattr(transformers, TASK_MODEL_CLASSES[task][0])
+    model = model_class.from_pretrained(model_name)
+    model.eval()
+    # Linear layers hold nearly all the weights; int8 them, keep activations fp32
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+def _load_onnx(task: str, model_name: str, cache_dir: str) -> Any:
+    import optimum.onnxruntime
+
+    model_class = getattr(optimum.onnxruntime, TASK_MODEL_CLASSES[task][1])
+    export_dir = os.path.join(cache_dir, model_name.replace('/', '--'))
+    if os.path.isdir(export_dir):
+        return model_class.from_pretrained(export_dir)
+
+    logger.info(f"Exporting {model_name} to ONNX in {export_dir}")
+    model = model_class.from_pretrained(model_name, export=True)
+    model.save_pretrained(export_dir)
+    return model
+
+def build_pipeline(
+    task: str,
+    model_name: str,
+    backend: str = MODEL_CONFIGS['inference_backend'],
+    cache_dir: str = MODEL_CONFIGS['onnx_cache_dir']
+) -> Any:
+    """Build a transformers pipeline for ``task`` on the requested backend"""
+    from transformers import AutoTokenizer, pipeline
+
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend: {backend}")
+    if backend == 'pytorch':
+        return pipeline(task, model=model_name)
+
+    if backend == 'quantized':
+        model = _load_quantized(task, model_name)
+    else:
+        model = _load_onnx(task, model_name, cache_dir)
+    logger.info(f"Loaded {model_name} for {task} on the {backend} backend")
+    return pipeline(task, model=model, tokenizer=AutoTokenizer.from_pretrained(model_name))
@@ -0,0 +1,413 @@
+import asyncio
+import os
+import sqlite3
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from fastapi import HTTPException
+from .models import JobStatus, LegalAnalysis
+from .config import logger, JOBS_CONFIG
+from .cache import get_or_analyze
+from .gemini_enrichment import schedule_enrichment
+from .processor import PIPELINE_STAGES
+from .uploads import SpooledUpload, map_file
+
+class JobQueue:
+    """Priority queue of analysis jobs in SQLite, shared by every uvicorn worker.
+
+    Uploads are spooled to ``upload_dir`` and only their path is queued. Workers
+    claim the highest priority, oldest job in a write transaction, so each job
+    runs once no matter how many processes poll the queue. A claim is tagged
+    with a token of its own: a worker whose job went stale and was requeued can
+    no longer record progress or a result for it.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        upload_dir: str,
+        max_queued: int = 100,
+        stale_after: float = 600,
+        retention: float = 86400
+    ):
+        self.path = path
+        self.upload_dir = upload_dir
+        self.max_queued = max_queued
+        self.stale_after = stale_after
+        self.retention = retention
+        self._initialized = False
+
+    @contextmanager
+    def _connect(self, immediate: bool = False):
+        """A transaction; ``immediate`` takes the write lock up front, for a read
+        that decides a write and must not see the row change in between"""
+        if not self._initialized:
+            self._initialize()
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    def _initialize(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        os.makedirs(self.upload_dir, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS jobs (
+                        job_id TEXT PRIMARY KEY,
+                        status TEXT NOT NULL,
+                        priority INTEGER NOT NULL,
+                        filename TEXT,
+                        file_type TEXT NOT NULL,
+                        content_hash TEXT NOT NULL,
+                        upload_path TEXT,
+                        claim_id TEXT,
+                        doc_id TEXT,
+                        error TEXT,
+                        created_at REAL NOT NULL,
+                        started_at REAL,
+                        finished_at REAL,
+                        updated_at REAL NOT NULL
+                    )
+                """)
+                columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+                if "claim_id" not in columns:
+                    conn.execute("ALTER TABLE jobs ADD COLUMN claim_id TEXT")
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_queue ON jobs (status, priority DESC, created_at)")
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS job_stages (
+                        job_id TEXT NOT NULL,
+                        stage TEXT NOT NULL,
+                        status TEXT NOT NULL,
+                        PRIMARY KEY (job_id, stage)
+                    )
+                """)
+        finally:
+            conn.close()
+        self._initialized = True
+
+    def submit(self, upload: SpooledUpload, priority: int = 0) -> str:
+        """Spool an upload and queue it, rejecting it if the queue is full"""
+        if not self._initialized:
+            self._initialize()
+        job_id = uuid.uuid4().hex
+        upload_path = os.path.join(self.upload_dir, job_id)
+        with open(upload_path, "wb") as f:
+            upload.copy_to(f)
+
+        try:
+            with self._connect(immediate=True) as conn:
+                queued = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+                if queued >= self.max_queued:
+                    raise HTTPException(status_code=503, detail="Job queue is full, please retry later")
+                now = time.time()
+                conn.execute(
+                    "INSERT INTO jobs (job_id, status, priority, filename, file_type, content_hash, "
+                    "upload_path, created_at, updated_at) VALUES (?, 'queued', ?, ?, ?, ?, ?, ?, ?)",
+                    (job_id, priority, upload.filename, upload.file_type, upload.content_hash, upload_path, now, now)
+                )
+                conn.executemany(
+                    "INSERT INTO job_stages (job_id, stage, status) VALUES (?, ?, 'pending')",
+                    [(job_id, stage) for stage in PIPELINE_STAGES]
+                )
+        except BaseException:
+            os.remove(upload_path)
+            raise
+        return job_id
+
+    def submit_completed(
+        self,
+        filename: Optional[str],
+        file_type: str,
+        content_hash: str,
+        doc_id: str,
+        priority: int = 0
+    ) -> str:
+        """Record a job whose analysis was already cached"""
+        job_id = uuid.uuid4().hex
+        with self._connect() as conn:
+            now = time.time()
+            conn.execute(
+                "INSERT INTO jobs (job_id, status, priority, filename, file_type, content_hash, doc_id, "
+                "created_at, started_at, finished_at, updated_at) "
+                "VALUES (?, 'completed', ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, priority, filename, file_type, content_hash, doc_id, now, now, now, now)
+            )
+            conn.executemany(
+                "INSERT INTO job_stages (job_id, stage, status) VALUES (?, ?, 'cached')",
+                [(job_id, stage) for stage in PIPELINE_STAGES]
+            )
+        return job_id
+
+    def claim(self) -> Optional[Dict[str, Any]]:
+        """Take the next queued job, or None if the queue is empty"""
+        with self._connect(immediate=True) as conn:
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' ORDER BY priority DESC, created_at LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            claim_id = uuid.uuid4().hex
+            conn.execute(
+                "UPDATE jobs SET status = 'running', claim_id = ?, started_at = ?, updated_at = ? WHERE job_id = ?",
+                (claim_id, now, now, row["job_id"])
+            )
+            return {**dict(row), "status": "running", "claim_id": claim_id}
+
+    def _touch(self, conn: sqlite3.Connection, job_id: str, claim_id: str) -> bool:
+        """Mark a running job alive, if the claim still holds it"""
+        return conn.execute(
+            "UPDATE jobs SET updated_at = ? WHERE job_id = ? AND status = 'running' AND claim_id = ?",
+            (time.time(), job_id, claim_id)
+        ).rowcount > 0
+
+    def heartbeat(self, job_id: str, claim_id: str) -> bool:
+        """Keep a running job from going stale; False once the claim was lost"""
+        with self._connect() as conn:
+            return self._touch(conn, job_id, claim_id)
+
+    def set_stage(self, job_id: str, claim_id: str, stage: str, status: str) -> None:
+        """Record the progress of one pipeline stage"""
+        with self._connect() as conn:
+            if self._touch(conn, job_id, claim_id):
+                conn.execute(
+                    "UPDATE job_stages SET status = ? WHERE job_id = ? AND stage = ?",
+                    (status, job_id, stage)
+                )
+
+    def complete(self, job: Dict[str, Any], doc_id: str) -> bool:
+        return self._finish(job, "completed", doc_id=doc_id)
+
+    def fail(self, job: Dict[str, Any], error: str) -> bool:
+        return self._finish(job, "failed", error=error)
+
+    def _finish(
+        self,
+        job: Dict[str, Any],
+        status: str,
+        doc_id: Optional[str] = None,
+        error: Optional[str] = None
+    ) -> bool:
+        """Record a claimed job's result; False if the claim was lost meanwhile"""
+        with self._connect() as conn:
+            now = time.time()
+            finished = conn.execute(
+                "UPDATE jobs SET status = ?, doc_id = ?, error = ?, upload_path = NULL, claim_id = NULL, "
+                "finished_at = ?, updated_at = ? WHERE job_id = ? AND status = 'running' AND claim_id = ?",
+                (status, doc_id, error, now, now, job["job_id"], job["claim_id"])
+            ).rowcount > 0
+        # A job requeued from under its worker still needs its upload
+        if finished:
+            self._remove_upload(job["upload_path"])
+        return finished
+
+    def requeue(self, job: Dict[str, Any]) -> None:
+        """Put a claimed job back, e.g. when the server is too busy to run it"""
+        with self._connect(immediate=True) as conn:
+            requeued = conn.execute(
+                "UPDATE jobs SET status = 'queued', claim_id = NULL, started_at = NULL, updated_at = ? "
+                "WHERE job_id = ? AND status = 'running' AND claim_id = ?",
+                (time.time(), job["job_id"], job["claim_id"])
+            ).rowcount > 0
+            if requeued:
+                conn.execute("UPDATE job_stages SET status = 'pending' WHERE job_id = ?", (job["job_id"],))
+
+    def get(self, job_id: str) -> Optional[JobStatus]:
+        """Current status of a job with per-stage progress and queue position"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            stages = dict(conn.execute(
+                "SELECT stage, status FROM job_stages WHERE job_id = ?", (job_id,)
+            ).fetchall())
+            position = None
+            if row["status"] == "queued":
+                position = conn.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND "
+                    "(priority > ? OR (priority = ? AND created_at <= ?))",
+                    (row["priority"], row["priority"], row["created_at"])
+                ).fetchone()[0]
+
+        def timestamp(value: Optional[float]) -> Optional[str]:
+            return datetime.fromtimestamp(value).isoformat() if value is not None else None
+
+        return JobStatus(
+            job_id=row["job_id"],
+            status=row["status"],
+            priority=row["priority"],
+            filename=row["filename"],
+            stages={stage: stages.get(stage, "pending") for stage in PIPELINE_STAGES},
+            position=position,
+            doc_id=row["doc_id"],
+            error=row["error"],
+            created_at=timestamp(row["created_at"]),
+            started_at=timestamp(row["started_at"]),
+            finished_at=timestamp(row["finished_at"])
+        )
+
+    def get_row(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Raw job record, including the upload hash its result is cached under"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            return dict(row) if row else None
+
+    def recover(self) -> None:
+        """Requeue jobs lost with a dead worker and drop expired finished jobs"""
+        now = time.time()
+        with self._connect(immediate=True) as conn:
+            stale = [row[0] for row in conn.execute(
+                "SELECT job_id FROM jobs WHERE status = 'running' AND updated_at < ?",
+                (now - self.stale_after,)
+            ).fetchall()]
+            if stale:
+                logger.warning(f"Requeueing {len(stale)} stale jobs")
+                conn.executemany(
+                    "UPDATE jobs SET status = 'queued', claim_id = NULL, started_at = NULL, updated_at = ? "
+                    "WHERE job_id = ?",
+                    [(now, job_id) for job_id in stale]
+                )
+                conn.executemany(
+                    "UPDATE job_stages SET status = 'pending' WHERE job_id = ?",
+                    [(job_id,) for job_id in stale]
+                )
+
+            expired = [row[0] for row in conn.execute(
+                "SELECT job_id FROM jobs WHERE status IN ('completed', 'failed') AND finished_at < ?",
+                (now - self.retention,)
+            ).fetchall()]
+            conn.executemany("DELETE FROM job_stages WHERE job_id = ?", [(job_id,) for job_id in expired])
+            conn.executemany("DELETE FROM jobs WHERE job_id = ?", [(job_id,) for job_id in expired])
+
+    def _remove_upload(self, upload_path: Optional[str]) -> None:
+        if upload_path:
+            try:
+                os.remove(upload_path)
+            except FileNotFoundError:
+                pass
+
+
+class JobWorkerPool:
+    """Async workers in each uvicorn process that poll the shared job queue"""
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        analyze: Callable[..., Awaitable[LegalAnalysis]],
+        workers: int = 1,
+        poll_interval: float = 0.5
+    ):
+        self.queue = queue
+        self.analyze = analyze
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        """Start polling the queue"""
+        if self._tasks:
+            return
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        """Stop polling; jobs still running are put back in the queue"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _work(self) -> None:
+        last_recovery = 0.0
+        while True:
+            try:
+                if time.monotonic() - last_recovery > self.queue.stale_after / 2:
+                    await asyncio.to_thread(self.queue.recover)
+                    last_recovery = time.monotonic()
+
+                job = await asyncio.to_thread(self.queue.claim)
+                if job is None:
+                    await asyncio.sleep(self.poll_interval)
+                    continue
+                await self._run(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Job worker error: {str(e)}")
+                await asyncio.sleep(self.poll_interval)
+
+    async def _heartbeat(self, job: Dict[str, Any]) -> None:
+        """Touch a running job well within ``stale_after``, as a stage can run longer"""
+        while True:
+            await asyncio.sleep(self.queue.stale_after / 4)
+            try:
+                if not await asyncio.to_thread(self.queue.heartbeat, job["job_id"], job["claim_id"]):
+                    logger.warning(f"Job {job['job_id']} was requeued while running")
+                    return
+            except Exception as e:
+                logger.error(f"Could not record heartbeat of job {job['job_id']}: {str(e)}")
+
+    async def _run(self, job: Dict[str, Any]) -> None:
+        heartbeat = asyncio.create_task(self._heartbeat(job))
+        try:
+            await self._execute(job)
+        finally:
+            heartbeat.cancel()
+
+    async def _execute(self, job: Dict[str, Any]) -> None:
+        job_id, claim_id = job["job_id"], job["claim_id"]
+
+        async def progress(stage: str, status: str) -> None:
+            try:
+                await asyncio.to_thread(self.queue.set_stage, job_id, claim_id, stage, status)
+            except Exception as e:
+                logger.error(f"Could not record progress of job {job_id}: {str(e)}")
+
+        try:
+            content = await asyncio.to_thread(map_file, job["upload_path"])
+            analysis = await get_or_analyze(
+                content, job["file_type"], self.analyze, job["content_hash"], progress=progress
+            )
+        except asyncio.CancelledError:
+            # Shutting down; let another worker pick the job up
+            await asyncio.to_thread(self.queue.requeue, job)
+            raise
+        except HTTPException as e:
+            if e.status_code == 503:
+                # The analysis slots are taken by live requests; try again later
+                await asyncio.to_thread(self.queue.requeue, job)
+                await asyncio.sleep(self.poll_interval)
+                return
+            await asyncio.to_thread(self.queue.fail, job, str(e.detail))
+            return
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {str(e)}")
+            await asyncio.to_thread(self.queue.fail, job, "Error processing document")
+            return
+
+        if not await asyncio.to_thread(self.queue.complete, job, analysis.doc_id):
+            logger.warning(f"Job {job_id} finished after another worker took it over")
+            return
+        schedule_enrichment(job["content_hash"], job["file_type"], analysis)
+
+
+job_queue = JobQueue(
+    JOBS_CONFIG['path'],
+    JOBS_CONFIG['upload_dir'],
+    max_queued=JOBS_CONFIG['max_queued'],
+    stale_after=JOBS_CONFIG['stale_after'],
+    retention=JOBS_CONFIG['retention']
+)
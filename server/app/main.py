@@ -1,10 +1,75 @@
-from fastapi import FastAPI
-from .routes import router
+import asyncio
+import time
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from .routes import router, job_workers
+from .executor import analysis_executor
+from .model_registry import model_registry
+from .gemini_enrichment import gemini_client
+from .search import search_index
+from .metrics import request_duration
+from .config import MODEL_WARMUP, UPLOAD_CONFIG
 from . import create_app
 
 app = create_app()
 app.include_router(router, prefix="/api")
 
+_background_tasks = set()
+
+@app.middleware("http")
+async def reject_oversized_requests(request: Request, call_next):
+    """Refuse a request whose declared body exceeds the upload limit before any of it is read"""
+    length = request.headers.get("content-length")
+    if length is not None and length.isdigit() and int(length) > UPLOAD_CONFIG['max_request_bytes']:
+        return JSONResponse(
+            status_code=413,
+            content={"detail": f"Request body exceeds the limit of {UPLOAD_CONFIG['max_request_bytes']} bytes"}
+        )
+    return await call_next(request)
+
+# Registered last so it wraps the middleware above and times rejected requests too
+@app.middleware("http")
+async def record_request_duration(request: Request, call_next):
+    """Time every request by route template; streamed responses are timed to their first byte"""
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        request_duration.observe(
+            time.perf_counter() - start,
+            method=request.method,
+            route=getattr(route, "path", "unmatched"),
+            status=status
+        )
+
+async def warm_up_models():
+    """Start loading the models without delaying startup"""
+    if MODEL_WARMUP == 'background':
+        task = asyncio.create_task(model_registry.warm_up())
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+
+async def warm_up_search():
+    """Load the search postings in the background so the first search is fast"""
+    task = asyncio.create_task(asyncio.to_thread(search_index.refresh))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+async def start_job_workers():
+    """Start polling the shared job queue"""
+    job_workers.start()
+
+app.add_event_handler("startup", warm_up_models)
+app.add_event_handler("startup", warm_up_search)
+app.add_event_handler("startup", start_job_workers)
+app.add_event_handler("shutdown", job_workers.stop)
+app.add_event_handler("shutdown", analysis_executor.shutdown)
+app.add_event_handler("shutdown", gemini_client.aclose)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -0,0 +1,135 @@
+import re
+from typing import Dict, List, Optional, Tuple
+
+# Clause classification rules, in the order clauses are reported
+CLAUSE_PATTERNS = {
+    "indemnification": r"indemnif[iy]|hold\s+harmless",
+    "termination": r"terminat(?:e|ion)|cancel(?:lation)?",
+    "confidentiality": r"confidential|non-disclosure",
+    "warranty": r"warrant(?:y|ies)|guarantee",
+    "governing_law": r"govern(?:ing)?\s+law|jurisdiction",
+    "force_majeure": r"force\s+majeure|acts?\s+of\s+god",
+    "assignment": r"assign(?:ment)?|transfer\s+of\s+rights",
+    "severability": r"sever(?:ability)?|invalid|unenforceable"
+}
+
+# Obligation rules; the trailing clause text is a lookahead so a match only
+# consumes the keyword and never hides a later keyword in the same sentence
+OBLIGATION_PATTERNS = {
+    "shall": r"shall(?=\s+[^\.])",
+    "must": r"must(?=\s+[^\.])",
+    "agree": r"agrees?(?=\s+to\s+[^\.])",
+    "required": r"required(?=\s+to\s+[^\.])",
+    "obligation": r"obligations?(?=\s+[^\.])",
+    "duty": r"duties?(?=\s+[^\.])",
+    "responsible": r"responsible(?=\s+for\s+[^\.])"
+}
+
+class MultiPatternMatcher:
+    """Find which of many rules match a text with a single compiled regex.
+
+    Every rule becomes a named group of one alternation. The scan restarts one
+    character after each match, so overlapping matches of different rules are
+    still found. Two rules must never match at the same start position (the
+    alternation would only report the first); keep rules keyword-anchored.
+    """
+
+    def __init__(self, rules: Dict[str, str], flags: int = re.IGNORECASE):
+        self.names = list(rules)
+        self._groups = {f"r{i}": name for i, name in enumerate(self.names)}
+        self._regex = re.compile(
+            "|".join(f"(?P<r{i}>{rules[name]})" for i, name in enumerate(self.names)),
+            flags
+        )
+
+    def matches(self, text: str) -> List[str]:
+        """Return the names of all rules matching ``text``, in rule order"""
+        found = set()
+        search = self._regex.search
+        match = search(text)
+        while match is not None:
+            found.add(self._groups[match.lastgroup])
+            if len(found) == len(self.names):
+                break
+            match = search(text, match.start() + 1)
+        return [name for name in self.names if name in found]
+
+
+sentence_matcher = MultiPatternMatcher({**CLAUSE_PATTERNS, **OBLIGATION_PATTERNS})
+
+
+# Characters whose case-insensitive match differs from their lower case: the
+# dotted and dotless i and the long s. A text without them can be lowered once
+# and searched with case-sensitive patterns instead.
+_CASE_UNSAFE = re.compile("[\u0130\u0131\u017f]")
+
+class TextScanner:
+    """Compile a fixed set of extraction rules once and run them over texts.
+
+    Case-insensitive rules are written in lower case and searched in the text
+    lowered once, so each search can jump to the rule's leading literal rather
+    than trying the rule at every position. ``re`` tries every alternative at
+    every position, so joining the rules into one alternation would scan more
+    slowly than these anchored searches, not faster.
+    """
+
+    def __init__(self, folded: Dict[str, str], cased: Dict[str, str]):
+        for name, pattern in folded.items():
+            if pattern != pattern.lower():
+                raise ValueError(f"Case-insensitive rule {name} must be written in lower case")
+        self._lowered = {name: re.compile(pattern) for name, pattern in folded.items()}
+        self._ignorecase = {name: re.compile(pattern, re.IGNORECASE) for name, pattern in folded.items()}
+        self._cased = {name: re.compile(pattern) for name, pattern in cased.items()}
+
+    def scan(self, text: str) -> "TextScan":
+        return TextScan(self, text)
+
+class TextScan:
+    """One text prepared for rule lookups; each rule runs over it at most once.
+
+    Matches may come from the lowered text, so read groups with ``group``,
+    which slices the original text.
+    """
+
+    __slots__ = ("text", "lowered", "_scanner", "_folded", "_matches")
+
+    def __init__(self, scanner: TextScanner, text: str):
+        self.text = text
+        self.lowered = text.lower()
+        self._scanner = scanner
+        self._folded = _CASE_UNSAFE.search(text) is None
+        self._matches: Dict[str, List[re.Match]] = {}
+
+    def _target(self, name: str) -> Tuple[re.Pattern, str]:
+        scanner = self._scanner
+        if name in scanner._cased:
+            return scanner._cased[name], self.text
+        if self._folded:
+            return scanner._lowered[name], self.lowered
+        return scanner._ignorecase[name], self.text
+
+    def matches(self, name: str) -> List[re.Match]:
+        """All non-overlapping matches of a rule, as ``finditer`` returns them"""
+        found = self._matches.get(name)
+        if found is None:
+            pattern, target = self._target(name)
+            found = self._matches[name] = list(pattern.finditer(target))
+        return found
+
+    def first(self, name: str) -> Optional[re.Match]:
+        """The leftmost match of a rule"""
+        found = self._matches.get(name)
+        if found is not None:
+            return found[0] if found else None
+        pattern, target = self._target(name)
+        return pattern.search(target)
+
+    def search(self, name: str, start: int, end: int) -> Optional[re.Match]:
+        """The leftmost match of a rule within ``text[start:end]``; the rule must
+        not use anchors or lookbehinds, which would see past the bounds"""
+        pattern, target = self._target(name)
+        return pattern.search(target, start, end)
+
+    def group(self, match: re.Match, group: int = 0) -> Optional[str]:
+        start, end = match.span(group)
+        return None if start < 0 else self.text[start:end]
@@ -0,0 +1,140 @@
+import asyncio
+import pickle
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+from .config import logger, MODEL_CONFIGS
+
+# spaCy and transformers are imported inside the loaders so that importing the
+# app stays cheap and workers can start serving before any model is needed.
+
+def _load_spacy_model() -> Any:
+    from .spacy_pipeline import load_spacy_pipeline
+    return load_spacy_pipeline(MODEL_CONFIGS['spacy_model'])
+
+def _load_qa_model() -> Any:
+    from .inference import build_pipeline, resolve_model_name
+    return build_pipeline("question-answering", resolve_model_name('qa_model'))
+
+def _load_summarizer() -> Any:
+    from .inference import build_pipeline, resolve_model_name
+    return build_pipeline("summarization", resolve_model_name('summarizer'))
+
+class ModelRegistry:
+    """Load models on first use and report their readiness.
+
+    Each model has its own lock, so a request that needs the summarizer does not
+    wait for the QA model to load. A failed load is remembered and reported
+    through ``status`` and retried on the next ``get``.
+    """
+
+    def __init__(self, loaders: Dict[str, Callable[[], Any]]):
+        self._loaders = loaders
+        self._models: Dict[str, Any] = {}
+        self._errors: Dict[str, str] = {}
+        self._loading: set = set()
+        # Models overridden without a loader that builds them again
+        self._overridden: set = set()
+        self._picklable: Dict[str, bool] = {}
+        self._locks = {name: threading.Lock() for name in loaders}
+
+    @property
+    def names(self) -> Iterable[str]:
+        return self._loaders.keys()
+
+    def get(self, name: str) -> Any:
+        """Return a model, loading it if needed"""
+        model = self._models.get(name)
+        if model is not None:
+            return model
+
+        with self._locks[name]:
+            model = self._models.get(name)
+            if model is not None:
+                return model
+
+            self._loading.add(name)
+            start = time.perf_counter()
+            try:
+                model = self._loaders[name]()
+            except Exception as e:
+                self._errors[name] = str(e)
+                logger.error(f"Failed to load {name}: {str(e)}")
+                raise
+            finally:
+                self._loading.discard(name)
+
+            self._models[name] = model
+            self._errors.pop(name, None)
+            logger.info(f"Loaded {name} in {time.perf_counter() - start:.2f}s")
+            return model
+
+    def loader(self, name: str) -> Optional[Callable[[], Any]]:
+        """The function that builds the registered model again in a worker process.
+
+        None when no loader can be sent there: the model was overridden without
+        one, or the loader does not pickle.
+        """
+        if name in self._overridden:
+            return None
+        if name not in self._picklable:
+            try:
+                pickle.dumps(self._loaders[name])
+                self._picklable[name] = True
+            except Exception:
+                self._picklable[name] = False
+        return self._loaders[name] if self._picklable[name] else None
+
+    def override(self, name: str, model: Any, loader: Optional[Callable[[], Any]] = None) -> None:
+        """Use an already constructed model, e.g. a stub in benchmarks.
+
+        ``loader``, if given, builds the same model in a worker process.
+        """
+        self._models[name] = model
+        self._errors.pop(name, None)
+        if loader is None:
+            self._overridden.add(name)
+        else:
+            self._loaders[name] = loader
+            self._overridden.discard(name)
+            self._picklable.pop(name, None)
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._models
+
+    @property
+    def all_loaded(self) -> bool:
+        return all(self.is_loaded(name) for name in self._loaders)
+
+    def status(self) -> Dict[str, str]:
+        """Readiness of every model: not_loaded, loading, ready or failed"""
+        status = {}
+        for name in self._loaders:
+            if name in self._models:
+                status[name] = "ready"
+            elif name in self._loading:
+                status[name] = "loading"
+            elif name in self._errors:
+                status[name] = "failed"
+            else:
+                status[name] = "not_loaded"
+        return status
+
+    def load_all(self, names: Optional[Iterable[str]] = None) -> None:
+        """Load models synchronously, logging instead of raising on failure"""
+        for name in names or self._loaders:
+            try:
+                self.get(name)
+            except Exception:
+                pass
+
+    async def warm_up(self, names: Optional[Iterable[str]] = None) -> None:
+        """Load models in the background without blocking the event loop"""
+        await asyncio.to_thread(self.load_all, names)
+
+
+model_registry = ModelRegistry({
+    'spacy_model': _load_spacy_model,
+    'qa_model': _load_qa_model,
+    'summarizer': _load_summarizer
+})
@@ -56,4 +56,34 @@ class LegalQuery(BaseModel):
 class HealthCheck(BaseModel):
     status: str
     version: str
-    models_loaded: bool
\ No newline at end of file
+    models_loaded: bool
+    models: Dict[str, str] = {}
+
+class SearchHit(BaseModel):
+    doc_id: str
+    document_type: Optional[str]
+    jurisdiction: Optional[str]
+    governing_law: Optional[str]
+    word_count: int
+    created_at: str
+    score: Optional[float] = None
+    matches: List[str] = []
+
+class SearchResponse(BaseModel):
+    total: int
+    results: List[SearchHit]
+    facets: Dict[str, Dict[str, int]] = {}
+    took_ms: float
+
+class JobStatus(BaseModel):
+    job_id: str
+    status: str
+    priority: int
+    filename: Optional[str] = None
+    stages: Dict[str, str] = {}
+    position: Optional[int] = None
+    doc_id: Optional[str] = None
+    error: Optional[str] = None
+    created_at: str
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
@@ -0,0 +1,33 @@
+import asyncio
+from typing import Dict, List
+from cachetools import LRUCache
+from .cache import analysis_store
+from .config import logger, PDF_CONFIG
+
+# Filings repeat whole pages: exhibits attached to several filings, cover
+# sheets, standard terms. Extracted text is cached per page fingerprint (see
+# pdf_backends.page_fingerprints), so such a page is decoded, or OCRed, once.
+
+page_cache = LRUCache(maxsize=PDF_CONFIG['page_cache_size'])
+
+async def load_page_texts(page_hashes: List[str]) -> Dict[str, str]:
+    """Cached text for whichever pages were extracted before, by fingerprint"""
+    found = {h: page_cache[h] for h in page_hashes if h in page_cache}
+    missing = [h for h in dict.fromkeys(page_hashes) if h not in found]
+    if missing:
+        try:
+            stored = await asyncio.to_thread(analysis_store.get_pages, missing)
+        except Exception as e:
+            logger.error(f"Page store lookup failed: {str(e)}")
+            stored = {}
+        page_cache.update(stored)
+        found.update(stored)
+    return found
+
+async def save_page_texts(texts: Dict[str, str]) -> None:
+    """Cache newly extracted page text"""
+    page_cache.update(texts)
+    try:
+        await asyncio.to_thread(analysis_store.put_pages, texts)
+    except Exception as e:
+        logger.error(f"Page store write failed: {str(e)}")
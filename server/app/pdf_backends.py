@@ -0,0 +1,256 @@
+import hashlib
+import io
+import mmap
+from typing import Any, BinaryIO, Callable, Dict, List, Optional, Union
+
+import PyPDF2
+from PyPDF2.generic import ArrayObject, DictionaryObject, IndirectObject, StreamObject
+
+from .config import logger, PDF_CONFIG
+
+# Page text comes from one of several PDF libraries behind the PdfBackend
+# interface. PyPDF2 is always installed; the layout-aware backends and OCR are
+# optional installs, imported only when selected. Pages are also fingerprinted
+# here so their text can be cached across documents, see page_cache.
+
+# Raw PDF bytes, or a read-only map of an upload spooled to disk
+PdfSource = Union[bytes, mmap.mmap]
+
+class _BufferStream(io.RawIOBase):
+    """Read-only file over a buffer, with a position of its own"""
+
+    def __init__(self, buffer: PdfSource):
+        self._view = memoryview(buffer)
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._position, io.SEEK_END: len(self._view)}[whence]
+        self._position = max(0, base + offset)
+        return self._position
+
+    def readinto(self, buffer: Any) -> int:
+        data = self._view[self._position:self._position + len(buffer)]
+        buffer[:len(data)] = data
+        self._position += len(data)
+        return len(data)
+
+def open_stream(content: PdfSource) -> BinaryIO:
+    """A file object over the content that copies nothing up front.
+
+    Readers parse lazily, so each gets its own stream rather than sharing the
+    position of one memory map.
+    """
+    if isinstance(content, bytes):
+        return io.BytesIO(content)
+    return io.BufferedReader(_BufferStream(content))
+
+class PdfBackend:
+    """Text of the pages of one PDF"""
+
+    def __init__(self, content: PdfSource):
+        self.content = content
+        self._renderer: Optional["PdfiumBackend"] = None
+
+    def page_count(self) -> int:
+        raise NotImplementedError
+
+    def page_text(self, index: int) -> str:
+        raise NotImplementedError
+
+    def render(self, index: int, dpi: int) -> Any:
+        """Rasterize a page into a PIL image, e.g. for OCR"""
+        if self._renderer is None:
+            self._renderer = PdfiumBackend(self.content)
+        return self._renderer.render(index, dpi)
+
+class PyPDF2Backend(PdfBackend):
+    """Content-stream text from PyPDF2; no layout analysis"""
+
+    def __init__(self, content: PdfSource):
+        super().__init__(content)
+        self._reader = PyPDF2.PdfReader(open_stream(content))
+
+    def page_count(self) -> int:
+        return len(self._reader.pages)
+
+    def page_text(self, index: int) -> str:
+        return self._reader.pages[index].extract_text()
+
+class PdfiumBackend(PdfBackend):
+    """PDFium through pypdfium2: fast, and keeps the lines as laid out on the page"""
+
+    def __init__(self, content: PdfSource):
+        super().__init__(content)
+        import pypdfium2
+
+        self._document = pypdfium2.PdfDocument(content if isinstance(content, bytes) else open_stream(content))
+
+    def page_count(self) -> int:
+        return len(self._document)
+
+    def page_text(self, index: int) -> str:
+        page = self._document[index]
+        textpage = page.get_textpage()
+        try:
+            return textpage.get_text_range()
+        finally:
+            textpage.close()
+            page.close()
+
+    def render(self, index: int, dpi: int) -> Any:
+        page = self._document[index]
+        try:
+            return page.render(scale=dpi / 72).to_pil()
+        finally:
+            page.close()
+
+class PdfminerBackend(PdfBackend):
+    """pdfminer.six layout analysis: text boxes in reading order, slower than PDFium"""
+
+    def __init__(self, content: PdfSource):
+        super().__init__(content)
+        from pdfminer.converter import PDFPageAggregator
+        from pdfminer.layout import LAParams
+        from pdfminer.pdfdocument import PDFDocument
+        from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+        from pdfminer.pdfpage import PDFPage
+        from pdfminer.pdfparser import PDFParser
+
+        document = PDFDocument(PDFParser(open_stream(content)))
+        self._pages = list(PDFPage.create_pages(document))
+        resources = PDFResourceManager(caching=True)
+        self._device = PDFPageAggregator(resources, laparams=LAParams())
+        self._interpreter = PDFPageInterpreter(resources, self._device)
+
+    def page_count(self) -> int:
+        return len(self._pages)
+
+    def page_text(self, index: int) -> str:
+        from pdfminer.layout import LTTextContainer
+
+        self._interpreter.process_page(self._pages[index])
+        return "".join(
+            element.get_text() for element in self._device.get_result()
+            if isinstance(element, LTTextContainer)
+        )
+
+PDF_BACKENDS: Dict[str, Callable[[PdfSource], PdfBackend]] = {
+    'pypdf2': PyPDF2Backend,
+    'pdfium': PdfiumBackend,
+    'pdfminer': PdfminerBackend,
+}
+
+class TesseractOcr:
+    """Local Tesseract through pytesseract"""
+
+    def __init__(self, language: str):
+        import pytesseract
+
+        self._pytesseract = pytesseract
+        self.language = language
+
+    def recognize(self, image: Any) -> str:
+        return self._pytesseract.image_to_string(image, lang=self.language)
+
+OCR_ENGINES: Dict[str, Callable[[str], Any]] = {
+    'tesseract': TesseractOcr,
+}
+
+def open_pdf(content: PdfSource, backend: str = PDF_CONFIG['backend']) -> PdfBackend:
+    """Open a PDF with the configured text backend"""
+    if backend not in PDF_BACKENDS:
+        raise ValueError(f"Unknown PDF backend: {backend}")
+    return PDF_BACKENDS[backend](content)
+
+_ocr_engine: Optional[Any] = None
+
+def _get_ocr_engine() -> Optional[Any]:
+    """Return the OCR engine for the current process, or None if OCR is off"""
+    global _ocr_engine
+    engine = PDF_CONFIG['ocr']
+    if engine == 'none':
+        return None
+    if _ocr_engine is None:
+        if engine not in OCR_ENGINES:
+            raise ValueError(f"Unknown OCR engine: {engine}")
+        _ocr_engine = OCR_ENGINES[engine](PDF_CONFIG['ocr_language'])
+    return _ocr_engine
+
+def read_pdf_pages(content: PdfSource, indexes: List[int]) -> List[str]:
+    """Extract the text of some pages, running OCR on pages without a text layer"""
+    pdf = open_pdf(content)
+    ocr = _get_ocr_engine()
+    pages = []
+    for index in indexes:
+        text = pdf.page_text(index)
+        if ocr is not None and len(text.strip()) < PDF_CONFIG['ocr_min_chars']:
+            logger.info(f"Running OCR on page {index + 1}")
+            text = ocr.recognize(pdf.render(index, PDF_CONFIG['ocr_dpi']))
+        pages.append(text)
+    return pages
+
+def count_pdf_pages(content: PdfSource) -> int:
+    """Count the pages of a PDF without extracting any text"""
+    return len(PyPDF2.PdfReader(open_stream(content)).pages)
+
+def _feed(digest: Any, value: Any, memo: Dict[int, bytes]) -> None:
+    """Hash a PDF object by value, following references but not object numbers"""
+    if isinstance(value, IndirectObject):
+        key = value.idnum
+        if key not in memo:
+            # A placeholder stops reference cycles
+            memo[key] = b"cycle"
+            inner = hashlib.sha1()
+            _feed(inner, value.get_object(), memo)
+            memo[key] = inner.digest()
+        digest.update(memo[key])
+    elif isinstance(value, DictionaryObject):
+        digest.update(b"<<")
+        for name in sorted(value):
+            if name != "/Parent":
+                digest.update(name.encode())
+                _feed(digest, value.raw_get(name), memo)
+        digest.update(b">>")
+        if isinstance(value, StreamObject):
+            # The raw, still encoded bytes; the dictionary above carries their
+            # /Filter and /DecodeParms. get_data() would decode every image and
+            # font and keep the result on the reader, and PyPDF2 has no public
+            # accessor for the encoded bytes.
+            digest.update(value._data or b"")
+    elif isinstance(value, ArrayObject):
+        digest.update(b"[")
+        for item in value:
+            _feed(digest, item, memo)
+        digest.update(b"]")
+    else:
+        digest.update(repr(value).encode())
+
+def page_fingerprints(content: PdfSource) -> List[str]:
+    """Hash each page by everything its text depends on.
+
+    That is the content streams and the resources they draw with (fonts and
+    their encodings, images, nested forms), plus the page geometry, and the
+    backend and OCR settings that turn them into text. Identical pages in
+    different files hash alike, as object numbers are not part of the hash.
+    """
+    reader = PyPDF2.PdfReader(open_stream(content))
+    settings = f"{PDF_CONFIG['backend']}:{PDF_CONFIG['ocr']}:{PDF_CONFIG['ocr_language']}:{PDF_CONFIG['ocr_min_chars']}"
+    memo: Dict[int, bytes] = {}
+    fingerprints = []
+    for page in reader.pages:
+        digest = hashlib.sha1(settings.encode())
+        for name in ("/Contents", "/Resources", "/MediaBox", "/CropBox", "/Rotate"):
+            digest.update(name.encode())
+            if name in page:
+                _feed(digest, page.raw_get(name), memo)
+        fingerprints.append(digest.hexdigest())
+    return fingerprints
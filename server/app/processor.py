@@ -1,40 +1,107 @@
-import spacy
-from transformers import pipeline
-import PyPDF2
-import io
-import re
-import nltk
+import asyncio
 import hashlib
 from datetime import datetime
 from collections import defaultdict
-from typing import Dict, List, Optional, Tuple
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple, Union
 from fastapi import HTTPException
-from .gemini_enrichment import enrich_legal_analysis
 from .models import (
-    LegalEntities, LegalCitation, LegalClause, LegalAnalysis
+    LegalEntities, LegalClause, LegalAnalysis
 )
-from .config import logger, MODEL_CONFIGS, PATTERNS
-
-# Download required NLTK data
-nltk.download('punkt')
-nltk.download('averaged_perceptron_tagger')
-nltk.download('maxent_ne_chunker')
-nltk.download('words')
-
-class LegalDocumentProcessor:
-    def __init__(self):
-        self.nlp = spacy.load(MODEL_CONFIGS['spacy_model'])
-        self.qa_model = pipeline("question-answering", model=MODEL_CONFIGS['qa_model'])
-        self.summarizer = pipeline("summarization", model=MODEL_CONFIGS['summarizer'])
-        
-        # Legal-specific patterns
-        self.citation_pattern = PATTERNS['citation']
-        self.monetary_pattern = PATTERNS['monetary']
-        self.date_pattern = PATTERNS['date']
+from .config import (
+    logger, PDF_CONFIG, BATCH_CONFIG, QA_BATCH_CONFIG, SUMMARY_CONFIG, INCREMENTAL_CONFIG, SHARD_CONFIG
+)
+from .metrics import stage_timer
+from .batching import MicroBatcher
+from .executor import AnalysisExecutor, analysis_executor
+from .model_registry import ModelRegistry, model_registry
+from .extractors import (
+    LegalTextExtractor, extract_text_features, extract_page_features,
+    extract_document_fields, extract_paragraph_features, sentence_sections
+)
+from .pdf_backends import PdfSource, page_fingerprints, read_pdf_pages
+from .page_cache import load_page_texts, save_page_texts
+from .retrieval import build_passages, index_document
+from .summarization import summarize_sentences, summarize_many, summarize_many_chunks, chunk_paragraphs
+from .incremental import (
+    split_paragraphs, paragraph_hash, load_paragraph_features, save_paragraph_features,
+    find_previous_version, merge_paragraph_features
+)
+from .spacy_pipeline import parse_texts
+from .sharding import (
+    plan_shards, group_paragraphs, analyze_shard, analyze_paragraph_shard, merge_entities
+)
+from .matchers import CLAUSE_PATTERNS, OBLIGATION_PATTERNS, sentence_matcher
+
+# (sentence text, matched clause types, matched obligation rules)
+ClassifiedSentences = List[Tuple[str, List[str], List[str]]]
+
+# Called with (stage, status) as each pipeline stage starts and finishes
+ProgressCallback = Callable[[str, str], Awaitable[None]]
+
+PIPELINE_STAGES = ["extract_text", "parse", "text_features", "index", "summarize", "doc_features"]
+
+def _document_id(text: str) -> str:
+    """Hash the text into a document id, encoding it a slice at a time rather than whole"""
+    digest = hashlib.md5()
+    for start in range(0, len(text), 1 << 20):
+        digest.update(text[start:start + (1 << 20)].encode())
+    return digest.hexdigest()
+
+async def _tracked(
+    stage: str,
+    awaitable: Awaitable[Any],
+    progress: Optional[ProgressCallback] = None
+) -> Any:
+    """Await one pipeline stage, timing it and reporting its start and end"""
+    with stage_timer(stage):
+        if progress is None:
+            return await awaitable
+        await progress(stage, "running")
+        try:
+            result = await awaitable
+        except Exception:
+            await progress(stage, "failed")
+            raise
+        await progress(stage, "done")
+        return result
+
+async def _ready(value: Any) -> Any:
+    """An awaitable for a result already computed along with an earlier stage"""
+    return value
+
+class LegalDocumentProcessor(LegalTextExtractor):
+    def __init__(
+        self,
+        executor: Optional[AnalysisExecutor] = None,
+        models: Optional[ModelRegistry] = None
+    ):
+        super().__init__()
+        self.executor = executor or analysis_executor
+        self.models = models or model_registry
+        self.qa_batcher = MicroBatcher(
+            self._answer_pairs,
+            self.executor,
+            max_batch_size=QA_BATCH_CONFIG['max_batch_size'],
+            max_wait=QA_BATCH_CONFIG['max_wait_ms'] / 1000,
+            max_in_flight=QA_BATCH_CONFIG['max_in_flight']
+        )
         
         # Common legal terms and definitions
         self.legal_terms = self._load_legal_terms()
 
+    # Models are loaded by the registry on first use
+    @property
+    def nlp(self):
+        return self.models.get('spacy_model')
+
+    @property
+    def qa_model(self):
+        return self.models.get('qa_model')
+
+    @property
+    def summarizer(self):
+        return self.models.get('summarizer')
+
     @staticmethod
     def _load_legal_terms() -> Dict[str, str]:
         """Load common legal terms and their definitions"""
@@ -50,51 +117,29 @@ class LegalDocumentProcessor:
             "locus standi": "The right or capacity to bring an action or to appear in a court"
         }
 
-    async def extract_text_from_pdf(self, content: bytes) -> str:
-        """Extract text from PDF content"""
-        try:
-            pdf_reader = PyPDF2.PdfReader(io.BytesIO(content))
-            text = ""
-            for page in pdf_reader.pages:
-                text += page.extract_text()
-            return text.strip()
-        except Exception as e:
-            logger.error(f"PDF extraction error: {str(e)}")
-            raise HTTPException(status_code=500, detail="Error processing PDF file")
-    def _determine_document_type(self, text: str) -> str:
-        """Determine the type of legal document"""
-        text_lower = text.lower()
-        
-        document_types = {
-            "contract": ["agreement", "contract", "terms and conditions"],
-            "court_filing": ["motion", "petition", "complaint", "brief"],
-            "legislation": ["act", "statute", "bill", "regulation"],
-            "opinion": ["opinion", "decision", "order", "judgment"],
-        }
-        
-        for doc_type, keywords in document_types.items():
-            if any(keyword in text_lower for keyword in keywords):
-                return doc_type
-                
-        return "other"
+    def _entity_role(self, doc, ent) -> Optional[str]:
+        """The LegalEntities field an entity is listed under, if any"""
+        if ent.label_ == "PERSON":
+            context = doc[max(0, ent.start - 5):min(len(doc), ent.end + 5)].text.lower()
+            if any(term in context for term in ["judge", "justice", "honor"]):
+                return "judges"
+            elif any(term in context for term in ["attorney", "counsel", "esq"]):
+                return "lawyers"
+            return "parties"
+        elif ent.label_ == "ORG":
+            if any(term in ent.text.lower() for term in ["court", "tribunal"]):
+                return "courts"
+            return "organizations"
+        return None
+
     def extract_legal_entities(self, doc) -> LegalEntities:
         """Extract legal entities from the document"""
         entities = defaultdict(set)
         
         for ent in doc.ents:
-            if ent.label_ == "PERSON":
-                context = doc[max(0, ent.start - 5):min(len(doc), ent.end + 5)].text.lower()
-                if any(term in context for term in ["judge", "justice", "honor"]):
-                    entities["judges"].add(ent.text)
-                elif any(term in context for term in ["attorney", "counsel", "esq"]):
-                    entities["lawyers"].add(ent.text)
-                else:
-                    entities["parties"].add(ent.text)
-            elif ent.label_ == "ORG":
-                if any(term in ent.text.lower() for term in ["court", "tribunal"]):
-                    entities["courts"].add(ent.text)
-                else:
-                    entities["organizations"].add(ent.text)
+            role = self._entity_role(doc, ent)
+            if role is not None:
+                entities[role].add(ent.text)
 
         return LegalEntities(
             parties=list(entities["parties"]),
@@ -104,234 +149,184 @@ class LegalDocumentProcessor:
             organizations=list(entities["organizations"])
         )
 
-    def extract_citations(self, text: str) -> List[LegalCitation]:
-        """Extract legal citations from text"""
-        citations = []
-        matches = re.finditer(self.citation_pattern, text)
-        
-        for match in matches:
-            citation_text = match.group()
-            year_match = re.search(r'\d{4}', citation_text)
-            year = int(year_match.group()) if year_match else None
-            
-            citations.append(LegalCitation(
-                citation_text=citation_text,
-                year=year,
-                source=self._determine_citation_source(citation_text),
-                page=None
-            ))
-        
-        return citations
-    def _extract_definitions(self, doc) -> Dict[str, str]:
-        """Extract defined terms and their definitions"""
-        definitions = {}
-        
-        # Pattern for common definition structures
-        definition_patterns = [
-            r'(?i)"([^"]+)"\s+means\s+([^\.]+)',
-            r'(?i)"([^"]+)"\s+shall\s+mean\s+([^\.]+)',
-            r'(?i)term\s+"([^"]+)"\s+is\s+defined\s+as\s+([^\.]+)',
-            r'(?i)"([^"]+)"\s+refers\s+to\s+([^\.]+)'
-        ]
-        
-        text = doc.text
-        for pattern in definition_patterns:
-            matches = re.finditer(pattern, text)
-            for match in matches:
-                term, definition = match.groups()
-                definitions[term.strip()] = definition.strip()
-
-        return definitions
-    def _determine_citation_source(self, citation: str) -> Optional[str]:
-        """Determine the source of a legal citation"""
-        if "AIR" in citation:
-            return "All India Reporter"
-        elif "SCC" in citation:
-            return "Supreme Court Cases"
-        elif "SC" in citation:
-            return "Supreme Court"
-        elif "HC" in citation:
-            return "High Court"
-        elif "ILR" in citation:
-            return "Indian Law Reports"
-        return None
+    def _classify_sentence(self, text: str) -> Tuple[str, List[str], List[str]]:
+        """Match one sentence against the clause and obligation rules"""
+        matched = sentence_matcher.matches(text)
+        return (
+            text,
+            [name for name in matched if name in CLAUSE_PATTERNS],
+            [name for name in matched if name in OBLIGATION_PATTERNS]
+        )
+
+    def _classify_sentences(self, doc) -> ClassifiedSentences:
+        """Match every sentence once against the clause and obligation rules"""
+        return [self._classify_sentence(sent.text) for sent in doc.sents]
 
-    def extract_clauses(self, doc) -> List[LegalClause]:
-        """Extract and classify legal clauses"""
+    def extract_clauses(self, doc, sentences: Optional[ClassifiedSentences] = None) -> List[LegalClause]:
+        """Extract and classify legal clauses, each under the last heading before it"""
         clauses = []
+        classified = self._classify_sentences(doc) if sentences is None else sentences
+        sections = sentence_sections(text for text, _, _ in classified)
         
-        clause_patterns = {
-            "indemnification": r"(?i)indemnif[iy]|hold\s+harmless",
-            "termination": r"(?i)terminat(e|ion)|cancel(lation)?",
-            "confidentiality": r"(?i)confidential|non-disclosure",
-            "warranty": r"(?i)warrant(y|ies)|guarantee",
-            "governing_law": r"(?i)govern(ing)?\s+law|jurisdiction",
-            "force_majeure": r"(?i)force\s+majeure|acts?\s+of\s+god",
-            "assignment": r"(?i)assign(ment)?|transfer\s+of\s+rights",
-            "severability": r"(?i)sever(ability)?|invalid|unenforceable"
-        }
-        
-        for sent in doc.sents:
-            for clause_type, pattern in clause_patterns.items():
-                if re.search(pattern, sent.text):
-                    clauses.append(LegalClause(
-                        clause_type=clause_type,
-                        text=sent.text,
-                        importance=self._calculate_clause_importance(sent.text),
-                        section="Unknown"
-                    ))
+        for (text, clause_types, _), section in zip(classified, sections):
+            if not clause_types:
+                continue
+            importance = self._calculate_clause_importance(text)
+            for clause_type in clause_types:
+                clauses.append(LegalClause(
+                    clause_type=clause_type,
+                    text=text,
+                    importance=importance,
+                    section=section
+                ))
         
         return clauses
 
+    _importance_terms = {
+        "shall": 0.3,
+        "must": 0.3,
+        "will": 0.2,
+        "agree": 0.2,
+        "terminate": 0.4,
+        "indemnify": 0.4,
+        "warrant": 0.3,
+        "material": 0.4,
+        "breach": 0.4,
+        "liable": 0.3
+    }
+
     def _calculate_clause_importance(self, text: str) -> float:
         """Calculate importance score for a clause"""
-        importance_terms = {
-            "shall": 0.3,
-            "must": 0.3,
-            "will": 0.2,
-            "agree": 0.2,
-            "terminate": 0.4,
-            "indemnify": 0.4,
-            "warrant": 0.3,
-            "material": 0.4,
-            "breach": 0.4,
-            "liable": 0.3
-        }
-        
-        score = sum(importance_terms.get(word.lower(), 0)
-                   for word in text.split())
+        importance_terms = self._importance_terms
+        score = sum(importance_terms.get(word, 0)
+                   for word in text.lower().split())
         return min(1.0, score)
 
-    def extract_deadlines(self, text: str) -> List[Dict[str, str]]:
-        """Extract deadlines and time-sensitive information"""
-        deadlines = []
-        
-        deadline_patterns = [
-            r"(?i)within\s+(\d+)\s+(day|month|year)s?",
-            r"(?i)no\s+later\s+than\s+([^\.]+)",
-            r"(?i)deadline\s+[^\.]+",
-            r"(?i)due\s+(?:date|by)\s+([^\.]+)"
-        ]
-        
-        for pattern in deadline_patterns:
-            matches = re.finditer(pattern, text)
-            for match in matches:
-                deadline_text = match.group()
-                date_match = re.search(self.date_pattern, deadline_text)
-                deadlines.append({
-                    "text": deadline_text,
-                    "date": date_match.group() if date_match else None,
-                    "context": text[max(0, match.start()-50):min(len(text), match.end()+50)]
-                })
-        
-        return deadlines
-
-    def extract_monetary_values(self, text: str) -> List[Dict[str, str]]:
-        """Extract monetary values and related context"""
-        monetary_values = []
-        
-        matches = re.finditer(self.monetary_pattern, text)
-        for match in matches:
-            monetary_values.append({
-                "value": match.group(),
-                "context": text[max(0, match.start()-50):min(len(text), match.end()+50)]
-            })
-        
-        return monetary_values
-
-    def extract_obligations(self, doc) -> List[Dict[str, str]]:
+    def extract_obligations(self, doc, sentences: Optional[ClassifiedSentences] = None) -> List[Dict[str, str]]:
         """Extract legal obligations"""
         obligations = []
         
-        obligation_patterns = [
-            r"(?i)shall\s+[^\.]+",
-            r"(?i)must\s+[^\.]+",
-            r"(?i)agrees?\s+to\s+[^\.]+",
-            r"(?i)required\s+to\s+[^\.]+",
-            r"(?i)obligations?\s+[^\.]+",
-            r"(?i)duties?\s+[^\.]+",
-            r"(?i)responsible\s+for\s+[^\.]+",
-        ]
-        
-        for sent in doc.sents:
-            for pattern in obligation_patterns:
-                if re.search(pattern, sent.text):
-                    obligations.append({
-                        "text": sent.text,
-                        "type": "mandatory" if any(word in sent.text.lower() 
-                                                 for word in ["shall", "must"]) 
-                               else "contractual"
-                    })
+        for text, _, obligation_rules in self._classify_sentences(doc) if sentences is None else sentences:
+            if not obligation_rules:
+                continue
+            text_lower = text.lower()
+            obligation_type = "mandatory" if any(word in text_lower 
+                                                 for word in ["shall", "must"]) else "contractual"
+            # One entry per matching rule, as with the per-pattern scan
+            for _ in obligation_rules:
+                obligations.append({"text": text, "type": obligation_type})
         
         return obligations
-    def _extract_governing_law(self, text: str) -> Optional[str]:
-        """Extract the governing law from the text"""
-        governing_law_patterns = [
-            r"(?i)governed\s+by\s+the\s+laws\s+of\s+([^\.]+)",
-            r"(?i)subject\s+to\s+the\s+jurisdiction\s+of\s+([^\.]+)",
-            r"(?i)Indian\s+law",
-            r"(?i)laws\s+of\s+India"
-        ]
-        
-        for pattern in governing_law_patterns:
-            match = re.search(pattern, text)
-            if match:
-                return match.group(1)
-        return None
 
-    def _extract_jurisdiction(self, text: str) -> Optional[str]:    
-        """Extract the jurisdiction from the text"""
-        jurisdiction_patterns = [
-            r"(?i)courts\s+of\s+([^\.]+)",
-            r"(?i)jurisdiction\s+of\s+([^\.]+)",
-            r"(?i)subject\s+to\s+the\s+exclusive\s+jurisdiction\s+of\s+([^\.]+)"
-        ]
-        
-        for pattern in jurisdiction_patterns:
-            match = re.search(pattern, text)
-            if match:
-                return match.group(1)
+    def _entity_risk(self, ent) -> Optional[str]:
+        """The risk factor an entity points to, if any"""
+        if ent.label_ == "PERSON" and any(term in ent.text.lower() for term in ["judge", "justice", "honor"]):
+            return f"Potential bias from {ent.text}"
+        elif ent.label_ == "ORG" and any(term in ent.text.lower() for term in ["court", "tribunal"]):
+            return f"Jurisdiction of {ent.text}"
+        elif ent.label_ == "GPE" and ent.text.lower() in ["india", "delhi", "mumbai", "chennai", "kolkata"]:
+            return f"Compliance with {ent.text} laws and regulations"
+        elif ent.label_ == "MONEY":
+            return f"Financial obligation of {ent.text}"
         return None
+
     def _extract_risk_factors(self, doc) -> List[str]:
         """Extract potential risk factors from the document"""
         risk_factors = []
         
         for ent in doc.ents:
-            if ent.label_ == "PERSON" and any(term in ent.text.lower() for term in ["judge", "justice", "honor"]):
-                risk_factors.append(f"Potential bias from {ent.text}")
-            elif ent.label_ == "ORG" and any(term in ent.text.lower() for term in ["court", "tribunal"]):
-                risk_factors.append(f"Jurisdiction of {ent.text}")
-            elif ent.label_ == "GPE" and ent.text.lower() in ["india", "delhi", "mumbai", "chennai", "kolkata"]:
-                risk_factors.append(f"Compliance with {ent.text} laws and regulations")
-            elif ent.label_ == "MONEY":
-                risk_factors.append(f"Financial obligation of {ent.text}")
+            risk = self._entity_risk(ent)
+            if risk is not None:
+                risk_factors.append(risk)
         
         return risk_factors
-    async def analyze_document(self, content: bytes, file_type: str) -> LegalAnalysis:
-        """Perform comprehensive legal document analysis"""
-        start_time = datetime.now()
-        
-        # Extract text based on file type
-        if file_type == 'pdf':
-            text = await self.extract_text_from_pdf(content)
-        else:
-            text = content.decode().strip()
-                
-        # Generate document ID
-        doc_id = hashlib.md5(text.encode()).hexdigest()
-            
-        # Process with spaCy
-        doc = self.nlp(text)
-            
-        # Generate summary
-        summary = self.summarizer(text[:1024], 
-                                max_length=150, 
-                                min_length=50, 
-                                do_sample=False)[0]['summary_text']
-            
-        # Extract deadlines
-        deadlines = self.extract_deadlines(text)
-        
+
+    async def iter_pages(self, content: PdfSource, file_type: str) -> AsyncIterator[str]:
+        """Yield the text of each page, in order, as soon as it is decoded"""
+        if file_type != 'pdf':
+            yield str(content, 'utf-8')
+            return
+
+        page_hashes = await self.executor.run_model(page_fingerprints, content)
+        texts = await load_page_texts(page_hashes)
+
+        # Decode each uncached page once, however often it repeats in the file
+        first_index: Dict[str, int] = {}
+        for index, page_hash in enumerate(page_hashes):
+            if page_hash not in texts:
+                first_index.setdefault(page_hash, index)
+        missing = list(first_index.items())
+        size = PDF_CONFIG['pages_per_task']
+        chunks = [missing[i:i + size] for i in range(0, len(missing), size)]
+        chunk_of = {page_hash: k for k, chunk in enumerate(chunks) for page_hash, _ in chunk}
+
+        def decode(
+            chunk: List[Tuple[str, int]],
+            run: Callable[..., Awaitable[List[str]]],
+            source: PdfSource = content
+        ) -> Awaitable[List[str]]:
+            return run(read_pdf_pages, source, [index for _, index in chunk])
+
+        # Many uncached pages: decode every chunk in parallel and yield them in order.
+        # Worker processes get the PDF pickled, which a memory map cannot be.
+        tasks = None
+        if len(missing) >= PDF_CONFIG['parallel_page_threshold']:
+            source = content if isinstance(content, bytes) else bytes(content)
+            tasks = [asyncio.ensure_future(decode(chunk, self.executor.run_cpu, source)) for chunk in chunks]
+        try:
+            for page_hash in page_hashes:
+                if page_hash not in texts:
+                    k = chunk_of[page_hash]
+                    pages = await (tasks[k] if tasks else decode(chunks[k], self.executor.run_model))
+                    decoded = {chunk_hash: page for (chunk_hash, _), page in zip(chunks[k], pages)}
+                    texts.update(decoded)
+                    await save_page_texts(decoded)
+                yield texts[page_hash]
+        finally:
+            for task in tasks or []:
+                task.cancel()
+
+    async def extract_text_from_pdf(self, content: PdfSource) -> str:
+        """Extract text from PDF content"""
+        try:
+            pages = [page async for page in self.iter_pages(content, 'pdf')]
+            return "".join(pages).strip()
+        except Exception as e:
+            logger.error(f"PDF extraction error: {str(e)}")
+            raise HTTPException(status_code=500, detail="Error processing PDF file")
+
+    def _answer_pairs(self, pairs: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        """Run the QA model over (question, context) pairs in one batched call"""
+        results = self.qa_model(
+            question=[question for question, _ in pairs],
+            context=[context for _, context in pairs],
+            batch_size=len(pairs)
+        )
+        return results if isinstance(results, list) else [results]
+
+    async def answer_question(self, question: str, contexts: List[str]) -> List[Dict[str, Any]]:
+        """Answer a question against each context, batched with concurrent queries"""
+        return await self.qa_batcher.submit_many([(question, context) for context in contexts])
+
+    def _summarize(self, doc) -> str:
+        """Generate an abstractive summary of the whole document"""
+        return self._summarize_sentences([sent.text for sent in doc.sents])
+
+    def _summarize_sentences(self, sentences: List[str]) -> str:
+        return summarize_sentences(self.summarizer, sentences)
+
+    def _extract_doc_features(self, doc) -> Dict[str, Any]:
+        """Run the extractors that need the parsed spaCy document"""
+        sentences = self._classify_sentences(doc)
+        return {
+            "entities": self.extract_legal_entities(doc),
+            "key_clauses": self.extract_clauses(doc, sentences),
+            "obligations": self.extract_obligations(doc, sentences),
+            "risk_factors": self._extract_risk_factors(doc),
+        }
+
+    def _normalize_deadlines(self, deadlines: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        """Normalize deadline dates, dropping deadlines without a usable date"""
         # Convert deadline dates to the correct format
         for deadline in deadlines:
             if deadline['date']:
@@ -340,41 +335,453 @@ class LegalDocumentProcessor:
                     deadline['date'] = deadline_dt.strftime('%Y-%m-%d')
                 except (ValueError, TypeError):
                     deadline['date'] = None
+
+        return [
+            {"text": d["text"], "date": d["date"], "context": d["context"]}
+            for d in deadlines if d["date"] is not None
+        ]
+
+    async def analyze_document(
+        self,
+        content: PdfSource,
+        file_type: str,
+        progress: Optional[ProgressCallback] = None
+    ) -> LegalAnalysis:
+        """Perform comprehensive legal document analysis"""
+        async with self.executor.slot():
+            return await self._analyze(content, file_type, progress)
+
+    async def analyze_document_stream(self, content: PdfSource, file_type: str) -> AsyncIterator[Dict[str, Any]]:
+        """Analyze a document page by page, yielding partial results before the final analysis"""
+        async with self.executor.slot():
+            start_time = datetime.now()
+            pages = []
+
+            async for page_text in self.iter_pages(content, file_type):
+                doc, page_features = await asyncio.gather(
+                    _tracked("parse", self.executor.run_model(self._parse, page_text)),
+                    _tracked("page_features", self.executor.run_cpu(extract_page_features, page_text))
+                )
+                pages.append(page_text)
+                yield {
+                    "event": "page",
+                    "page": len(pages),
+                    "entities": self.extract_legal_entities(doc),
+                    "deadlines": self._normalize_deadlines(page_features["deadlines"]),
+                    "monetary_values": page_features["monetary_values"]
+                }
+
+            # The final analysis takes the same path as /analyze, as both are cached under one key
+            analysis = await self._analyze_text("".join(pages).strip(), file_type, start_time)
+            yield {"event": "analysis", "analysis": analysis}
+
+    async def analyze_documents(
+        self,
+        documents: List[Tuple[PdfSource, str]]
+    ) -> AsyncIterator[Tuple[int, Union[LegalAnalysis, Exception]]]:
+        """Analyze many documents with batched spaCy and summarizer calls.
+
+        Each group of documents holds one analysis slot and is worked through
+        serially inside it, so a batch never runs more analyses at once than
+        a single upload would.
+
+        Yields ``(index, analysis)`` as each document completes, or
+        ``(index, exception)`` for documents that could not be analyzed.
+        """
+        group_size = BATCH_CONFIG['group_size']
+        for offset in range(0, len(documents), group_size):
+            async with self.executor.slot():
+                async for index, result in self._analyze_group(documents[offset:offset + group_size]):
+                    yield offset + index, result
+
+    def _parse(self, text: str) -> Any:
+        """Parse one text, in chunks if it is very long"""
+        return parse_texts(self.nlp, [text])[0]
+
+    def _parse_many(self, texts: List[str]) -> List[Any]:
+        """Parse several texts with one spaCy pipe call"""
+        return parse_texts(
+            self.nlp,
+            texts,
+            batch_size=BATCH_CONFIG['spacy_batch_size'],
+            n_process=BATCH_CONFIG['spacy_n_process']
+        )
+
+    async def _analyze_group(
+        self,
+        documents: List[Tuple[PdfSource, str]]
+    ) -> AsyncIterator[Tuple[int, Union[LegalAnalysis, Exception]]]:
+        start_time = datetime.now()
+
+        texts = {}
+        for index, (content, file_type) in enumerate(documents):
+            try:
+                texts[index] = await self._extract_text(content, file_type)
+            except Exception as e:
+                yield index, e
+        ready = list(texts)
+        if not ready:
+            return
+
+        if INCREMENTAL_CONFIG['enabled']:
+            # The paragraphs none of the documents had cached are parsed and summarized together
+            try:
+                analyses = await self._analyze_paragraph_group(
+                    [texts[index] for index in ready], [documents[index][1] for index in ready], start_time
+                )
+            except Exception as e:
+                analyses = [e] * len(ready)
+            for index, analysis in zip(ready, analyses):
+                yield index, analysis
+            return
+
+        # Documents large enough to shard go through the shard path one by one
+        for index in ready:
+            if self._should_shard(len(texts[index])):
+                try:
+                    yield index, await self._analyze_shards(texts[index], documents[index][1], start_time)
+                except Exception as e:
+                    yield index, e
+
+        batched = [index for index in ready if not self._should_shard(len(texts[index]))]
+        if batched:
+            batched_texts = [texts[index] for index in batched]
+            docs, text_features = await asyncio.gather(
+                _tracked("parse", self.executor.run_model(self._parse_many, batched_texts)),
+                _tracked("text_features", asyncio.gather(
+                    *(self.executor.run_cpu(extract_text_features, text) for text in batched_texts)
+                ))
+            )
+            summaries = await _tracked("summarize", self.executor.run_model(
+                summarize_many, self.summarizer, [[sent.text for sent in doc.sents] for doc in docs]
+            ))
+            for index, doc, features, summary in zip(batched, docs, text_features, summaries):
+                try:
+                    yield index, await self._build_analysis(
+                        texts[index], doc, features, documents[index][1], start_time, summary
+                    )
+                except Exception as e:
+                    yield index, e
+
+    async def _extract_text(self, content: PdfSource, file_type: str) -> str:
+        """Extract text based on file type"""
+        if file_type == 'pdf':
+            return await self.extract_text_from_pdf(content)
+        return str(content, 'utf-8').strip()
+
+    async def _analyze(
+        self,
+        content: PdfSource,
+        file_type: str,
+        progress: Optional[ProgressCallback] = None
+    ) -> LegalAnalysis:
+        start_time = datetime.now()
+        text = await _tracked("extract_text", self._extract_text(content, file_type), progress)
+        return await self._analyze_text(text, file_type, start_time, progress)
+
+    async def _analyze_text(
+        self,
+        text: str,
+        file_type: str,
+        start_time: datetime,
+        progress: Optional[ProgressCallback] = None
+    ) -> LegalAnalysis:
+        """Analyze extracted text on the path the configuration and its size call for.
+
+        Single, streamed and batched uploads all take these paths (batches run
+        several documents through one call of each), so a cached analysis does
+        not depend on which endpoint produced it.
+        """
+        if INCREMENTAL_CONFIG['enabled']:
+            return (await self._analyze_paragraph_group([text], [file_type], start_time, progress))[0]
+
+        if self._should_shard(len(text)):
+            return await self._analyze_shards(text, file_type, start_time, progress)
+
+        # spaCy runs on a thread while the regex extractors run in a worker process
+        doc, text_features = await asyncio.gather(
+            _tracked("parse", self.executor.run_model(self._parse, text), progress),
+            _tracked("text_features", self.executor.run_cpu(extract_text_features, text), progress)
+        )
+        return await self._build_analysis(text, doc, text_features, file_type, start_time, progress=progress)
+
+    async def _build_analysis(
+        self,
+        text: str,
+        doc,
+        text_features: Dict[str, Any],
+        file_type: str,
+        start_time: datetime,
+        summary: Optional[str] = None,
+        progress: Optional[ProgressCallback] = None
+    ) -> LegalAnalysis:
+        return await self._finish_analysis(
+            text,
+            [sent.text for sent in doc.sents],
+            doc.lang_,
+            self.executor.run_model(self._extract_doc_features, doc),
+            text_features,
+            file_type,
+            start_time,
+            summary,
+            progress
+        )
+
+    async def _finish_analysis(
+        self,
+        text: str,
+        sentences: List[str],
+        language: str,
+        doc_features: Awaitable[Dict[str, Any]],
+        text_features: Dict[str, Any],
+        file_type: str,
+        start_time: datetime,
+        summary: Optional[str] = None,
+        progress: Optional[ProgressCallback] = None
+    ) -> LegalAnalysis:
+        # Generate document ID
+        doc_id = _document_id(text)
+
+        # Keep the document as passages so /query can answer from the full text
+        await _tracked("index", index_document(doc_id, build_passages(sentences)), progress)
+
+        # The summary is built from the parsed sentences unless it was batched
+        if summary is None:
+            summary, doc_features = await asyncio.gather(
+                _tracked("summarize", self.executor.run_model(self._summarize_sentences, sentences), progress),
+                _tracked("doc_features", doc_features, progress)
+            )
+        else:
+            doc_features = await _tracked("doc_features", doc_features, progress)
         
+        return self._assemble_analysis(
+            doc_id, text, text_features, doc_features, summary, file_type, language, start_time
+        )
+
+    def _should_shard(self, chars: int) -> bool:
+        """Whether this much text is worth spreading over the process pool.
+
+        Shards are parsed by worker processes, so only a spaCy model they can
+        build again is sharded; any other is used here, unsharded.
+        """
+        return (
+            SHARD_CONFIG['enabled']
+            and chars >= SHARD_CONFIG['min_chars']
+            and self.executor.process_workers > 1
+            and self.models.loader('spacy_model') is not None
+        )
+
+    async def _analyze_shards(
+        self,
+        text: str,
+        file_type: str,
+        start_time: datetime,
+        progress: Optional[ProgressCallback] = None
+    ) -> LegalAnalysis:
+        """Analyze a very large document as sentence-aligned shards parsed in parallel"""
+        loader = self.models.loader('spacy_model')
+        bounds = plan_shards(text, SHARD_CONFIG['shard_chars'], SHARD_CONFIG['overlap_chars'])
+        shards, text_features = await asyncio.gather(
+            _tracked("parse", asyncio.gather(*(
+                self.executor.run_cpu(analyze_shard, loader, text[start:end], start, core_start, core_end)
+                for start, core_start, core_end, end in bounds
+            )), progress),
+            _tracked("text_features", self.executor.run_cpu(extract_text_features, text), progress)
+        )
+        return await self._finish_analysis(
+            text,
+            [sentence for shard in shards for _, sentence, _, _ in shard["sentences"]],
+            shards[0]["language"],
+            self.executor.run_model(self._merge_shard_features, shards),
+            text_features,
+            file_type,
+            start_time,
+            progress=progress
+        )
+
+    def _merge_shard_features(self, shards: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Combine the per-shard extractor results into those of the whole document"""
+        sentences = [sentence for shard in shards for _, *sentence in shard["sentences"]]
+        entities = merge_entities(shards)
+
+        # Names keep their first-seen order; a dict doubles as an ordered set
+        roles = defaultdict(dict)
+        for _, _, name, role, _ in entities:
+            if role is not None:
+                roles[role][name] = None
+
+        return {
+            "entities": LegalEntities(**{field: list(roles[field]) for field in LegalEntities.model_fields}),
+            "key_clauses": self.extract_clauses(None, sentences),
+            "obligations": self.extract_obligations(None, sentences),
+            "risk_factors": [risk for *_, risk in entities if risk is not None],
+        }
+
+    def _assemble_analysis(
+        self,
+        doc_id: str,
+        text: str,
+        text_features: Dict[str, Any],
+        doc_features: Dict[str, Any],
+        summary: str,
+        file_type: str,
+        language: str,
+        start_time: datetime,
+        metadata: Optional[Dict[str, str]] = None
+    ) -> LegalAnalysis:
         word_count = len(text.split())
 
         analysis = LegalAnalysis(
             doc_id=doc_id,
-            document_type=self._determine_document_type(text),
-            entities=self.extract_legal_entities(doc),
-            key_clauses=self.extract_clauses(doc),
-            citations=self.extract_citations(text),
-            legal_definitions=self._extract_definitions(doc),
-            obligations=self.extract_obligations(doc),
-            deadlines=[
-                {"text": d["text"], "date": d["date"], "context": d["context"]}
-                for d in deadlines if d["date"] is not None
-            ],
-            jurisdiction=self._extract_jurisdiction(text),
-            governing_law=self._extract_governing_law(text),
-            risk_factors=self._extract_risk_factors(doc),
-            monetary_values=self.extract_monetary_values(text),
+            document_type=text_features["document_type"],
+            entities=doc_features["entities"],
+            key_clauses=doc_features["key_clauses"],
+            citations=text_features["citations"],
+            legal_definitions=text_features["legal_definitions"],
+            obligations=doc_features["obligations"],
+            deadlines=self._normalize_deadlines(text_features["deadlines"]),
+            jurisdiction=text_features["jurisdiction"],
+            governing_law=text_features["governing_law"],
+            risk_factors=doc_features["risk_factors"],
+            monetary_values=text_features["monetary_values"],
             summary=summary,
             metadata={
                 "file_type": file_type,
-                "language": doc.lang_,
+                "language": language,
                 "word_count": str(word_count),
-                "created_at": datetime.now().isoformat()
+                "created_at": datetime.now().isoformat(),
+                **(metadata or {})
             },
             word_count=word_count,
             created_at=datetime.now().isoformat(),
             processing_time=(datetime.now() - start_time).total_seconds()
         )
-        
-        # try:
-        #     analysis = enrich_legal_analysis(analysis)
-        # except Exception as e:
-        #     logger.error(f"Gemini enrichment failed: {str(e)}")
-        #     pass
 
-        return analysis
\ No newline at end of file
+        # Gemini enrichment runs afterwards as a background stage, see
+        # gemini_enrichment.schedule_enrichment
+        return analysis
+
+    def _paragraph_doc_features(self, docs: List[Any]) -> List[Dict[str, Any]]:
+        """Run the spaCy-based extractors on each paragraph, in a cacheable form"""
+        results = []
+        for doc in docs:
+            features = self._extract_doc_features(doc)
+            results.append({
+                "sentences": [sent.text for sent in doc.sents],
+                "entities": features["entities"].model_dump(),
+                "key_clauses": [clause.model_dump() for clause in features["key_clauses"]],
+                "obligations": features["obligations"],
+                "risk_factors": features["risk_factors"],
+            })
+        return results
+
+    def _summarize_paragraphs(self, documents: List[List[List[str]]]) -> List[str]:
+        """Summarize documents from paragraph-aligned chunks, so unchanged chunks hit the
+        summary cache, batching summarizer calls across documents"""
+        max_tokens = SUMMARY_CONFIG['max_chunk_tokens']
+        return summarize_many_chunks(
+            self.summarizer, [chunk_paragraphs(self.summarizer, paragraphs, max_tokens) for paragraphs in documents]
+        )
+
+    async def _analyze_paragraph_group(
+        self,
+        texts: List[str],
+        file_types: List[str],
+        start_time: datetime,
+        progress: Optional[ProgressCallback] = None
+    ) -> List[LegalAnalysis]:
+        """Analyze documents from per-paragraph results, computing only the paragraphs not seen before.
+
+        The changed paragraphs of all the documents are parsed in one spaCy
+        pipe call, and their summaries are batched across documents.
+        """
+        doc_ids = [_document_id(text) for text in texts]
+        paragraphs = [split_paragraphs(text) for text in texts]
+        hashes = [[paragraph_hash(paragraph) for paragraph in document] for document in paragraphs]
+
+        cached = await load_paragraph_features([h for document in hashes for h in document])
+        changed = {
+            h: paragraph
+            for document, document_hashes in zip(paragraphs, hashes)
+            for h, paragraph in zip(document_hashes, document)
+            if h not in cached
+        }
+        changed_hashes, changed_texts = list(changed), list(changed.values())
+
+        # Only changed paragraphs are parsed and scanned; the whole-document
+        # fields are cheap single searches and always run on the full text
+        sharded = self._should_shard(sum(len(paragraph) for paragraph in changed_texts))
+        if sharded:
+            # spaCy and its extractors run together, a group of paragraphs per worker
+            loader = self.models.loader('spacy_model')
+            parsed = asyncio.gather(*(
+                self.executor.run_cpu(analyze_paragraph_shard, loader, group)
+                for group in group_paragraphs(changed_texts, SHARD_CONFIG['shard_chars'])
+            ))
+        else:
+            parsed = self.executor.run_model(self._parse_many, changed_texts)
+
+        parsed, paragraph_features, document_fields, previous_doc_ids = await asyncio.gather(
+            _tracked("parse", parsed, progress),
+            _tracked("text_features", self.executor.run_cpu(extract_paragraph_features, changed_texts), progress),
+            asyncio.gather(*(self.executor.run_cpu(extract_document_fields, text) for text in texts)),
+            asyncio.gather(*(
+                find_previous_version(document_hashes, doc_id) for document_hashes, doc_id in zip(hashes, doc_ids)
+            ))
+        )
+        if sharded:
+            doc_features = await _tracked(
+                "doc_features", _ready([features for group in parsed for features in group]), progress
+            )
+        else:
+            doc_features = await _tracked(
+                "doc_features", self.executor.run_model(self._paragraph_doc_features, parsed), progress
+            )
+
+        computed = {
+            h: {**text_part, **doc_part}
+            for h, text_part, doc_part in zip(changed_hashes, paragraph_features, doc_features)
+        }
+        ordered = [[cached[h] if h in cached else computed[h] for h in document] for document in hashes]
+        merged = [merge_paragraph_features(document) for document in ordered]
+        reanalyzed = [{h: computed[h] for h in document if h in computed} for document in hashes]
+
+        _, summaries, _ = await asyncio.gather(
+            _tracked("index", asyncio.gather(*(
+                index_document(doc_id, build_passages(features["sentences"]))
+                for doc_id, features in zip(doc_ids, merged)
+            )), progress),
+            _tracked(
+                "summarize",
+                self.executor.run_model(
+                    self._summarize_paragraphs, [[f["sentences"] for f in document] for document in ordered]
+                ),
+                progress
+            ),
+            asyncio.gather(*(
+                save_paragraph_features(features, doc_id, document_hashes)
+                for features, doc_id, document_hashes in zip(reanalyzed, doc_ids, hashes)
+            ))
+        )
+
+        analyses = []
+        for i, text in enumerate(texts):
+            metadata = {
+                "paragraphs": str(len(paragraphs[i])),
+                "paragraphs_reanalyzed": str(len(reanalyzed[i]))
+            }
+            if previous_doc_ids[i] is not None:
+                metadata["previous_doc_id"] = previous_doc_ids[i]
+
+            analyses.append(self._assemble_analysis(
+                doc_ids[i],
+                text,
+                {**merged[i], **document_fields[i]},
+                {**merged[i], "entities": LegalEntities(**merged[i]["entities"])},
+                summaries[i],
+                file_types[i],
+                self.nlp.lang,
+                start_time,
+                metadata
+            ))
+        return analyses
@@ -0,0 +1,111 @@
+import asyncio
+import re
+from typing import List, Optional, Tuple
+import numpy as np
+from cachetools import LRUCache
+from scipy import sparse
+from .cache import analysis_store
+from .config import logger, RETRIEVAL_CONFIG
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens used for indexing and querying"""
+    return TOKEN_PATTERN.findall(text.lower())
+
+def build_passages(sentences: List[str], max_words: int = RETRIEVAL_CONFIG['passage_max_words']) -> List[str]:
+    """Pack consecutive sentences into passages of roughly ``max_words`` words"""
+    passages = []
+    current, current_words = [], 0
+    for sentence in sentences:
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        words = len(sentence.split())
+        if current and current_words + words > max_words:
+            passages.append(" ".join(current))
+            current, current_words = [], 0
+        current.append(sentence)
+        current_words += words
+    if current:
+        passages.append(" ".join(current))
+    return passages
+
+class PassageIndex:
+    """Okapi BM25 index over the passages of one document.
+
+    Term weights are precomputed into a sparse passage x term matrix, so scoring
+    a question is a single sparse matrix-vector product.
+    """
+
+    def __init__(self, passages: List[str], k1: float = RETRIEVAL_CONFIG['k1'], b: float = RETRIEVAL_CONFIG['b']):
+        self.passages = passages
+        self.vocabulary = {}
+
+        rows, cols, counts = [], [], []
+        lengths = np.zeros(len(passages), dtype=np.float32)
+        for row, passage in enumerate(passages):
+            tokens = tokenize(passage)
+            lengths[row] = len(tokens)
+            term_counts = {}
+            for token in tokens:
+                col = self.vocabulary.setdefault(token, len(self.vocabulary))
+                term_counts[col] = term_counts.get(col, 0) + 1
+            rows.extend([row] * len(term_counts))
+            cols.extend(term_counts.keys())
+            counts.extend(term_counts.values())
+
+        shape = (len(passages), len(self.vocabulary))
+        tf = sparse.csr_matrix(
+            (np.asarray(counts, dtype=np.float32), (rows, cols)), shape=shape
+        )
+
+        # idf per term and length normalisation per passage
+        df = np.bincount(tf.indices, minlength=shape[1]).astype(np.float32)
+        idf = np.log1p((shape[0] - df + 0.5) / (df + 0.5))
+        avg_length = lengths.mean() if len(passages) else 0.0
+        norm = k1 * (1 - b + b * lengths / avg_length) if avg_length else np.full(shape[0], k1)
+
+        data = tf.data
+        passage_norm = np.repeat(norm, np.diff(tf.indptr))
+        tf.data = data * (k1 + 1) / (data + passage_norm) * idf[tf.indices]
+        self.weights = tf
+
+    def search(self, query: str, k: int = RETRIEVAL_CONFIG['top_k']) -> List[Tuple[int, float]]:
+        """Return the ``k`` best passages as (passage index, score), best first"""
+        cols = [self.vocabulary[token] for token in set(tokenize(query)) if token in self.vocabulary]
+        if not cols or not self.passages:
+            return []
+
+        query = np.zeros(self.weights.shape[1], dtype=np.float32)
+        query[cols] = 1.0
+        scores = self.weights @ query
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(i), float(scores[i])) for i in top if scores[i] > 0]
+
+
+passage_index_cache = LRUCache(maxsize=RETRIEVAL_CONFIG['index_cache_size'])
+
+async def index_document(doc_id: str, passages: List[str]) -> None:
+    """Index a document's passages and persist them for other workers"""
+    passage_index_cache[doc_id] = await asyncio.to_thread(PassageIndex, passages)
+    try:
+        await asyncio.to_thread(analysis_store.put_passages, doc_id, passages)
+    except Exception as e:
+        logger.error(f"Passage store write failed: {str(e)}")
+
+async def get_passage_index(doc_id: str) -> Optional[PassageIndex]:
+    """Find the passage index of a document, rebuilding it from the store if needed"""
+    if doc_id in passage_index_cache:
+        return passage_index_cache[doc_id]
+    try:
+        passages = await asyncio.to_thread(analysis_store.get_passages, doc_id)
+    except Exception as e:
+        logger.error(f"Passage store lookup failed: {str(e)}")
+        return None
+    if passages is None:
+        return None
+    index = passage_index_cache[doc_id] = await asyncio.to_thread(PassageIndex, passages)
+    return index
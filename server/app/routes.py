@@ -1,10 +1,24 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, BackgroundTasks
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, UploadFile, File, Form, Header, HTTPException, Query
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from fastapi.encoders import jsonable_encoder
+import asyncio
 import hashlib
-from typing import Dict
-from .models import LegalAnalysis, LegalQuery, HealthCheck
+import json
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from .models import LegalAnalysis, LegalQuery, HealthCheck, JobStatus, SearchResponse
 from .processor import LegalDocumentProcessor
-from .config import SUPPORTED_FILE_TYPES, logger, analysis_cache
+from .model_registry import model_registry
+from .retrieval import get_passage_index
+from .config import SUPPORTED_FILE_TYPES, BATCH_CONFIG, JOBS_CONFIG, SEARCH_CONFIG, UPLOAD_CONFIG, logger
+from .cache import get_cached_analysis, cache_analysis, find_analysis, get_or_analyze
+from .gemini_enrichment import schedule_enrichment
+from .jobs import JobWorkerPool, job_queue
+from .uploads import SpooledUpload, receive_upload
+from .search import search_index
+from .executor import analysis_executor
+from .metrics import Gauge, metrics, start_profile, stage_timer
 from .utils import (
     _compare_clauses, _compare_entities, _compare_obligations,
     _compare_deadlines, _compare_monetary_values
@@ -12,6 +26,25 @@ from .utils import (
 
 router = APIRouter()
 legal_processor = LegalDocumentProcessor()
+job_workers = JobWorkerPool(
+    job_queue,
+    legal_processor.analyze_document,
+    workers=JOBS_CONFIG['workers'],
+    poll_interval=JOBS_CONFIG['poll_interval']
+)
+
+metrics.register(Gauge(
+    "lexalyze_analyses_pending", "Analyses running or waiting for a slot", lambda: analysis_executor.pending
+))
+metrics.register(Gauge(
+    "lexalyze_qa_queue_depth", "Questions waiting for the next QA batch",
+    lambda: legal_processor.qa_batcher.stats()["queue_depth"]
+))
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Stage timings, request latencies and cache counters in Prometheus text format"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 @router.get("/health", response_model=HealthCheck)
 async def health_check():
@@ -19,49 +52,272 @@ async def health_check():
     return HealthCheck(
         status="healthy",
         version="2.0.0",
-        models_loaded=True
+        models_loaded=model_registry.all_loaded,
+        models=model_registry.status()
+    )
+
+async def _analyze_upload(upload: SpooledUpload) -> LegalAnalysis:
+    """Analyze an upload through the cache and queue its Gemini enrichment"""
+    # Re-uploads are served from cache before any text extraction; the hash was
+    # taken when the upload was received
+    analysis = await get_or_analyze(
+        upload.content(), upload.file_type, legal_processor.analyze_document, upload.content_hash
     )
+    schedule_enrichment(upload.content_hash, upload.file_type, analysis)
+    return analysis
 
 @router.post("/analyze", response_model=LegalAnalysis)
 async def analyze_document(
     file: UploadFile = File(...),
-    background_tasks: BackgroundTasks = None
+    x_profile: Optional[str] = Header(None)
 ):
-    """Analyze a legal document"""
+    """Analyze a legal document; send ``X-Profile: 1`` for a stage breakdown in metadata"""
     try:
+        start = time.perf_counter()
+        profile = start_profile() if x_profile and x_profile.lower() in ("1", "true", "yes") else None
+
         file_type = file.filename.split(".")[-1].lower()
         if file_type not in SUPPORTED_FILE_TYPES:
             raise HTTPException(status_code=400, detail="Unsupported file type")
 
-        content = await file.read()
-        analysis = await legal_processor.analyze_document(content, file_type)
-
-        # Cache the analysis
-        analysis_cache[analysis.doc_id] = analysis
+        with stage_timer("read_upload"):
+            upload = await receive_upload(file, file_type)
+        analysis = await _analyze_upload(upload)
 
+        if profile is not None:
+            # Cached analyses are shared, so the profile goes on a copy
+            metadata = dict(analysis.metadata)
+            metadata["profile"] = json.dumps({
+                "stages_ms": {stage: round(seconds * 1000, 2) for stage, seconds in profile.items()},
+                "total_ms": round((time.perf_counter() - start) * 1000, 2)
+            })
+            analysis = analysis.model_copy(update={"metadata": metadata})
         return analysis
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error analyzing document: {str(e)}")
         raise HTTPException(status_code=500, detail="Error processing document")
 
-@router.post("/compare", response_model=Dict)
-async def compare_documents(
-    doc1: UploadFile = File(...),
-    doc2: UploadFile = File(...)
+def _ndjson(event: Dict) -> str:
+    """Serialize one streaming event as a line of NDJSON"""
+    return json.dumps(jsonable_encoder(event)) + "\n"
+
+@router.post("/analyze/stream")
+async def analyze_document_stream(
+    file: UploadFile = File(...)
 ):
-    """Compare two legal documents"""
+    """Analyze a legal document, streaming per-page results as NDJSON"""
+    file_type = file.filename.split(".")[-1].lower()
+    if file_type not in SUPPORTED_FILE_TYPES:
+        raise HTTPException(status_code=400, detail="Unsupported file type")
+
+    upload = await receive_upload(file, file_type)
+    content, content_hash = upload.content(), upload.content_hash
+    cached = await get_cached_analysis(content_hash, file_type)
+
+    async def events():
+        try:
+            if cached is not None:
+                yield _ndjson({"event": "analysis", "analysis": cached})
+                return
+
+            async for event in legal_processor.analyze_document_stream(content, file_type):
+                if event["event"] == "analysis":
+                    await cache_analysis(content_hash, file_type, event["analysis"])
+                    schedule_enrichment(content_hash, file_type, event["analysis"])
+                yield _ndjson(event)
+        except HTTPException as e:
+            yield _ndjson({"event": "error", "status_code": e.status_code, "detail": e.detail})
+        except Exception as e:
+            logger.error(f"Error streaming document analysis: {str(e)}")
+            yield _ndjson({"event": "error", "status_code": 500, "detail": "Error processing document"})
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+@router.post("/analyze/batch")
+async def analyze_documents_batch(
+    files: List[UploadFile] = File(...)
+):
+    """Analyze many legal documents, streaming each analysis as NDJSON when it completes"""
+    if len(files) > BATCH_CONFIG['max_documents']:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {BATCH_CONFIG['max_documents']} documents per batch"
+        )
+
+    total_bytes = sum(upload.size or 0 for upload in files)
+    if total_bytes > UPLOAD_CONFIG['max_batch_bytes']:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch exceeds the limit of {UPLOAD_CONFIG['max_batch_bytes']} bytes"
+        )
+
+    # Uploads are closed once this handler returns, so read them before
+    # streaming. Small uploads stay in memory as bytes; a spooled one is mapped
+    # and its spool closed right away, so it holds one file descriptor, not two,
+    # until its group is done.
+    uploads: List[Tuple[str, str, Optional[SpooledUpload]]] = []
     try:
-        file_type1 = doc1.filename.split(".")[-1].lower()
-        file_type2 = doc2.filename.split(".")[-1].lower()
+        for upload in files:
+            file_type = upload.filename.split(".")[-1].lower()
+            spooled = (
+                await receive_upload(upload, file_type)
+                if file_type in SUPPORTED_FILE_TYPES else None
+            )
+            await upload.close()
+            uploads.append((upload.filename, file_type, spooled))
+    except OSError as e:
+        for _, _, spooled in uploads:
+            if spooled is not None:
+                spooled.close()
+        logger.error(f"Could not open batch uploads: {str(e)}")
+        raise HTTPException(
+            status_code=503,
+            detail="Server cannot hold this many uploads open, please send a smaller batch"
+        )
+
+    async def events():
+        try:
+            async for event in _batch_events(uploads):
+                yield event
+        finally:
+            for _, _, spooled in uploads:
+                if spooled is not None:
+                    spooled.close()
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+async def _batch_events(uploads: List[Tuple[str, str, Optional[SpooledUpload]]]):
+    """Analyze a batch group by group, unmapping each group's uploads once it is done"""
+    group_size = BATCH_CONFIG['group_size']
+    for offset in range(0, len(uploads), group_size):
+        try:
+            pending, hashes = [], {}
+            for index in range(offset, min(offset + group_size, len(uploads))):
+                filename, file_type, spooled = uploads[index]
+                if spooled is None:
+                    yield _ndjson({"event": "error", "index": index, "filename": filename,
+                                   "status_code": 400, "detail": "Unsupported file type"})
+                    continue
+
+                content_hash = spooled.content_hash
+                cached = await get_cached_analysis(content_hash, file_type)
+                if cached is not None:
+                    yield _ndjson({"event": "analysis", "index": index, "filename": filename,
+                                   "analysis": cached})
+                    continue
 
-        if file_type1 != file_type2:
-            raise HTTPException(status_code=400, detail="Documents must be of the same file type")
+                hashes[len(pending)] = (index, content_hash, file_type)
+                pending.append((spooled.content(), file_type))
 
-        content1 = await doc1.read()
-        content2 = await doc2.read()
+            try:
+                async for position, result in legal_processor.analyze_documents(pending):
+                    index, content_hash, file_type = hashes[position]
+                    filename = uploads[index][0]
+                    if isinstance(result, Exception):
+                        logger.error(f"Error analyzing {filename}: {str(result)}")
+                        yield _ndjson({"event": "error", "index": index, "filename": filename,
+                                       "status_code": 500, "detail": "Error processing document"})
+                        continue
 
-        analysis1 = await legal_processor.analyze_document(content1, file_type1)
-        analysis2 = await legal_processor.analyze_document(content2, file_type2)
+                    await cache_analysis(content_hash, file_type, result)
+                    schedule_enrichment(content_hash, file_type, result)
+                    yield _ndjson({"event": "analysis", "index": index, "filename": filename,
+                                   "analysis": result})
+            except HTTPException as e:
+                yield _ndjson({"event": "error", "status_code": e.status_code, "detail": e.detail})
+                return
+        finally:
+            for _, _, spooled in uploads[offset:offset + group_size]:
+                if spooled is not None:
+                    spooled.close()
+
+@router.post("/jobs", response_model=JobStatus, status_code=202)
+async def submit_job(
+    file: UploadFile = File(...),
+    priority: int = Form(0, ge=-10, le=10)
+):
+    """Queue a document for analysis and return its job id right away"""
+    try:
+        file_type = file.filename.split(".")[-1].lower()
+        if file_type not in SUPPORTED_FILE_TYPES:
+            raise HTTPException(status_code=400, detail="Unsupported file type")
+
+        upload = await receive_upload(file, file_type)
+
+        # Cached documents complete immediately without entering the queue
+        cached = await get_cached_analysis(upload.content_hash, file_type)
+        if cached is not None:
+            job_id = await asyncio.to_thread(
+                job_queue.submit_completed, file.filename, file_type, upload.content_hash, cached.doc_id, priority
+            )
+        else:
+            job_id = await asyncio.to_thread(job_queue.submit, upload, priority)
+        return await asyncio.to_thread(job_queue.get, job_id)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error submitting job: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error submitting job")
+
+@router.get("/jobs/{job_id}", response_model=JobStatus)
+async def get_job(job_id: str):
+    """Report the status and per-stage progress of a job"""
+    job = await asyncio.to_thread(job_queue.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
+
+@router.get("/jobs/{job_id}/result", response_model=LegalAnalysis)
+async def get_job_result(job_id: str):
+    """Fetch the analysis produced by a completed job"""
+    job = await asyncio.to_thread(job_queue.get_row, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    if job["status"] == "failed":
+        raise HTTPException(status_code=422, detail=job["error"] or "Job failed")
+    if job["status"] != "completed":
+        raise HTTPException(status_code=409, detail=f"Job {job_id} is {job['status']}")
+
+    analysis = await get_cached_analysis(job["content_hash"], job["file_type"])
+    if analysis is None:
+        analysis = await find_analysis(job["doc_id"])
+    if analysis is None:
+        raise HTTPException(status_code=410, detail=f"Result of job {job_id} has expired")
+    return analysis
+
+async def _resolve_document(upload: Optional[UploadFile], doc_id: Optional[str], side: str) -> LegalAnalysis:
+    """Fetch a cached analysis by doc_id, or analyze an upload through the cache"""
+    if (upload is None) == (doc_id is None):
+        raise HTTPException(status_code=400, detail=f"Provide either an upload or a doc_id for {side}")
+
+    if doc_id is not None:
+        analysis = await find_analysis(doc_id)
+        if analysis is None:
+            raise HTTPException(status_code=404, detail=f"Document {doc_id} not found")
+        return analysis
+
+    file_type = upload.filename.split(".")[-1].lower()
+    if file_type not in SUPPORTED_FILE_TYPES:
+        raise HTTPException(status_code=400, detail="Unsupported file type")
+
+    return await _analyze_upload(await receive_upload(upload, file_type))
+
+@router.post("/compare", response_model=Dict)
+async def compare_documents(
+    doc1: Optional[UploadFile] = File(None),
+    doc2: Optional[UploadFile] = File(None),
+    doc_id1: Optional[str] = Form(None),
+    doc_id2: Optional[str] = Form(None)
+):
+    """Compare two legal documents, each given as an upload or an analyzed doc_id"""
+    try:
+        # Uncached sides are analyzed concurrently and written back to the cache
+        analysis1, analysis2 = await asyncio.gather(
+            _resolve_document(doc1, doc_id1, "doc1"),
+            _resolve_document(doc2, doc_id2, "doc2")
+        )
 
         comparison = {
             "clauses": _compare_clauses(analysis1.key_clauses, analysis2.key_clauses),
@@ -72,10 +328,68 @@ async def compare_documents(
         }
 
         return comparison
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error comparing documents: {str(e)}")
         raise HTTPException(status_code=500, detail="Error processing documents")
 
+@router.get("/search", response_model=SearchResponse)
+async def search_documents(
+    q: Optional[str] = None,
+    document_type: Optional[List[str]] = Query(None),
+    clause_type: Optional[List[str]] = Query(None),
+    jurisdiction: Optional[str] = None,
+    governing_law: Optional[str] = None,
+    entity: Optional[str] = None,
+    citation: Optional[str] = None,
+    citation_source: Optional[str] = None,
+    deadline_after: Optional[str] = None,
+    deadline_before: Optional[str] = None,
+    min_amount: Optional[float] = None,
+    max_amount: Optional[float] = None,
+    limit: int = Query(SEARCH_CONFIG['default_limit'], ge=1, le=SEARCH_CONFIG['max_limit']),
+    offset: int = Query(0, ge=0)
+):
+    """Search every analyzed document by facets and by the text of its clauses.
+
+    Repeated ``document_type`` and ``clause_type`` values must all match, and
+    deadlines are ISO dates, e.g. ``?governing_law=Delhi&clause_type=indemnification&deadline_before=2025-03-01``.
+    """
+    try:
+        for value in (deadline_after, deadline_before):
+            if value is not None:
+                try:
+                    datetime.strptime(value, '%Y-%m-%d')
+                except ValueError:
+                    raise HTTPException(status_code=400, detail="Deadline filters must be dates in YYYY-MM-DD format")
+
+        facets = {
+            "document_type": document_type or [],
+            "clause_type": clause_type or [],
+            "jurisdiction": [jurisdiction] if jurisdiction else [],
+            "governing_law": [governing_law] if governing_law else [],
+            "citation": [citation] if citation else [],
+            "citation_source": [citation_source] if citation_source else [],
+        }
+        return await asyncio.to_thread(
+            search_index.search,
+            query=q,
+            facets=facets,
+            entity=entity,
+            deadline_after=deadline_after,
+            deadline_before=deadline_before,
+            min_amount=min_amount,
+            max_amount=max_amount,
+            limit=limit,
+            offset=offset
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error searching documents: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error searching documents")
+
 @router.post("/query", response_model=Dict)
 async def query_document(
     legal_query: LegalQuery
@@ -83,21 +397,41 @@ async def query_document(
     """Query a legal document"""
     try:
         doc_id = legal_query.doc_id
-        if doc_id and doc_id in analysis_cache:
-            analysis = analysis_cache[doc_id]
-        else:
+        analysis = await find_analysis(doc_id) if doc_id else None
+        if analysis is None:
             raise HTTPException(status_code=404, detail="Document not found")
 
         # Use the QA model to answer the query
-        result = legal_processor.qa_model({
-            "question": legal_query.question,
-            "context": legal_query.context if legal_query.context != "None" else analysis.summary
-        })
+        if legal_query.context != "None":
+            context = legal_query.context
+            if isinstance(context, dict):
+                context = " ".join(context.values())
+            result = (await legal_processor.answer_question(legal_query.question, [context]))[0]
+            return {
+                "answer": result["answer"],
+                "score": result["score"]
+            }
+
+        # Answer from the passages of the source text that best match the question
+        index = await get_passage_index(analysis.doc_id)
+        hits = index.search(legal_query.question) if index is not None else []
+        contexts = [index.passages[i] for i, _ in hits] or [analysis.summary]
+
+        results = await legal_processor.answer_question(legal_query.question, contexts)
+        result, context = max(zip(results, contexts), key=lambda pair: pair[0]["score"])
 
         return {
             "answer": result["answer"],
-            "score": result["score"]
+            "score": result["score"],
+            "context": context
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error querying document: {str(e)}")
-        raise HTTPException(status_code=500, detail="Error processing query")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Error processing query")
+
+@router.get("/query/stats", response_model=Dict)
+async def query_batching_stats():
+    """Queue depth and batch fill of the QA micro-batching scheduler"""
+    return legal_processor.qa_batcher.stats()
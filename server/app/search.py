@@ -0,0 +1,470 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from array import array
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from .models import LegalAnalysis, SearchHit, SearchResponse
+from .config import ANALYSIS_CACHE_VERSION, PIPELINE_VERSION, SEARCH_CONFIG
+
+TOKEN_PATTERN = re.compile(r"\w+")
+AMOUNT_PATTERN = re.compile(r"\d[\d,]*(?:\.\d+)?")
+
+ENTITY_FACETS = ("parties", "judges", "lawyers", "courts", "organizations")
+# Free-text fields are indexed word by word, so "Delhi" finds "the courts at New Delhi"
+TOKENIZED_FACETS = ("jurisdiction", "governing_law")
+# Facets whose value counts are reported with every search
+COUNTED_FACETS = ("document_type", "clause_type")
+
+def normalize(value: str) -> str:
+    """Lowercase a facet value and collapse its whitespace"""
+    return " ".join(value.lower().split())
+
+def _tokens(value: str) -> List[str]:
+    return TOKEN_PATTERN.findall(value.lower())
+
+def _amount(value: str) -> Optional[float]:
+    match = AMOUNT_PATTERN.search(value)
+    return float(match.group().replace(",", "")) if match else None
+
+def _fts_query(text: str) -> Optional[str]:
+    """Match every word of the query, quoted so FTS5 syntax in user input is inert"""
+    tokens = _tokens(text)
+    return " ".join(f'"{token}"' for token in tokens) if tokens else None
+
+class _Postings:
+    """In-memory copy of the postings, as numbers of the documents holding each value"""
+
+    def __init__(self):
+        self.last_doc = 0
+        self.last_removal = 0
+        self.live = np.zeros(1, dtype=bool)
+        self.facets: Dict[str, Dict[str, array]] = defaultdict(dict)
+        self.clauses: Dict[int, array] = defaultdict(lambda: array('I'))
+        self.amount_docs = array('I')
+        self.amounts = array('d')
+        self._arrays: Dict[Any, np.ndarray] = {}
+
+    def load(self, conn: sqlite3.Connection, after: int, last_doc: int) -> None:
+        """Add the postings of documents numbered above ``after``"""
+        for facet, value, doc in conn.execute("SELECT facet, value, doc FROM facets WHERE doc > ?", (after,)):
+            postings = self.facets[facet].get(value)
+            if postings is None:
+                postings = self.facets[facet][value] = array('I')
+            postings.append(doc)
+        for doc, amount in conn.execute("SELECT doc, amount FROM amounts WHERE doc > ?", (after,)):
+            self.amount_docs.append(doc)
+            self.amounts.append(amount)
+        for text_id, doc in conn.execute("SELECT text_id, doc FROM clause_postings WHERE doc > ?", (after,)):
+            self.clauses[text_id].append(doc)
+
+        live = np.zeros(last_doc + 1, dtype=bool)
+        live[:len(self.live)] = self.live
+        live[np.fromiter((row[0] for row in conn.execute(
+            "SELECT id FROM documents WHERE id > ?", (after,)
+        )), dtype=np.int64)] = True
+        self.live = live
+        self.last_doc = last_doc
+        self._arrays.clear()
+
+    def remove(self, conn: sqlite3.Connection, last_removal: int) -> None:
+        """Drop the documents removed since the last refresh from the live mask.
+
+        Their postings stay behind, but every search starts from the live mask.
+        """
+        for (doc,) in conn.execute("SELECT doc FROM removals WHERE seq > ?", (self.last_removal,)):
+            if doc < len(self.live):
+                self.live[doc] = False
+        self.last_removal = last_removal
+
+    def numpy(self, key: Any, values: array) -> np.ndarray:
+        """Postings as a numpy array, converted once per refresh"""
+        converted = self._arrays.get(key)
+        if converted is None:
+            converted = self._arrays[key] = np.array(values)
+        return converted
+
+    def facet(self, facet: str, value: str) -> np.ndarray:
+        return self.numpy((facet, value), self.facets[facet].get(value, array('I')))
+
+class SearchIndex:
+    """Inverted index over the fields of every analysis, in SQLite.
+
+    Facet values (document type, clause types, entities, citations, deadline
+    dates and the words of the governing law and jurisdiction) are postings
+    keyed by (facet, value, doc), with documents numbered in insertion order.
+    Clause text repeats heavily between documents, so each distinct clause is
+    indexed with FTS5 once and linked to the documents containing it. Like the
+    analysis store, the file is shared by every worker.
+
+    Each worker mirrors the postings in memory and pulls in documents added
+    or removed since its last search, so a search is a few numpy mask
+    operations rather than a walk over SQLite rows. A re-indexed document gets
+    a new number, and its old one is logged as removed.
+    """
+
+    def __init__(self, path: str, version: str = "1", generation: int = 0):
+        self.path = path
+        self.version = version
+        # Rows written under a higher generation are never replaced by this worker
+        self.generation = generation
+        self._initialized = False
+        self._postings = _Postings()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _connect(self):
+        if not self._initialized:
+            self._initialize()
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _initialize(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                # Every removed document number, so workers can clear it from their live mask
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS removals (
+                        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                        doc INTEGER NOT NULL
+                    )
+                """)
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS documents (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        doc_id TEXT NOT NULL UNIQUE,
+                        version TEXT NOT NULL,
+                        document_type TEXT,
+                        jurisdiction TEXT,
+                        governing_law TEXT,
+                        word_count INTEGER NOT NULL,
+                        created_at TEXT NOT NULL,
+                        generation INTEGER NOT NULL DEFAULT 0
+                    )
+                """)
+                columns = {row[1] for row in conn.execute("PRAGMA table_info(documents)")}
+                if "generation" not in columns:
+                    conn.execute("ALTER TABLE documents ADD COLUMN generation INTEGER NOT NULL DEFAULT 0")
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS facets (
+                        facet TEXT NOT NULL,
+                        value TEXT NOT NULL,
+                        doc INTEGER NOT NULL,
+                        PRIMARY KEY (facet, value, doc)
+                    ) WITHOUT ROWID
+                """)
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_facets_doc ON facets (doc, facet, value)")
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS amounts (
+                        doc INTEGER NOT NULL,
+                        amount REAL NOT NULL,
+                        PRIMARY KEY (doc, amount)
+                    ) WITHOUT ROWID
+                """)
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_amounts_amount ON amounts (amount, doc)")
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS clause_texts (
+                        id INTEGER PRIMARY KEY,
+                        text_hash TEXT NOT NULL UNIQUE,
+                        text TEXT NOT NULL
+                    )
+                """)
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS clause_postings (
+                        text_id INTEGER NOT NULL,
+                        doc INTEGER NOT NULL,
+                        PRIMARY KEY (text_id, doc)
+                    ) WITHOUT ROWID
+                """)
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_clause_postings_doc ON clause_postings (doc, text_id)")
+                conn.execute("""
+                    CREATE VIRTUAL TABLE IF NOT EXISTS clause_fts USING fts5(
+                        text, content='clause_texts', content_rowid='id'
+                    )
+                """)
+        finally:
+            conn.close()
+        self._initialized = True
+
+    def _facets(self, analysis: LegalAnalysis) -> Iterable[Tuple[str, str]]:
+        """Every (facet, value) pair an analysis can be found by"""
+        if analysis.document_type:
+            yield "document_type", normalize(analysis.document_type)
+        for facet in TOKENIZED_FACETS:
+            for token in _tokens(getattr(analysis, facet) or ""):
+                yield facet, token
+        for clause in analysis.key_clauses:
+            yield "clause_type", normalize(clause.clause_type)
+        for facet in ENTITY_FACETS:
+            for name in getattr(analysis.entities, facet):
+                yield facet, normalize(name)
+        for citation in analysis.citations:
+            yield "citation", normalize(citation.citation_text)
+            if citation.source:
+                yield "citation_source", normalize(citation.source)
+        for deadline in analysis.deadlines:
+            if deadline.get("date"):
+                yield "deadline", deadline["date"]
+
+    def _remove(self, conn: sqlite3.Connection, doc: int) -> None:
+        text_ids = [row[0] for row in conn.execute("SELECT text_id FROM clause_postings WHERE doc = ?", (doc,))]
+        for table in ("facets", "amounts", "clause_postings"):
+            conn.execute(f"DELETE FROM {table} WHERE doc = ?", (doc,))
+        conn.execute("DELETE FROM documents WHERE id = ?", (doc,))
+        conn.execute("INSERT INTO removals (doc) VALUES (?)", (doc,))
+
+        # Drop clause texts no other document contains; external-content FTS
+        # rows are deleted by replaying their values
+        for text_id in text_ids:
+            if conn.execute("SELECT 1 FROM clause_postings WHERE text_id = ? LIMIT 1", (text_id,)).fetchone():
+                continue
+            conn.execute(
+                "INSERT INTO clause_fts (clause_fts, rowid, text) SELECT 'delete', id, text FROM clause_texts WHERE id = ?",
+                (text_id,)
+            )
+            conn.execute("DELETE FROM clause_texts WHERE id = ?", (text_id,))
+
+    def add(self, analysis: LegalAnalysis) -> None:
+        """Index an analysis, replacing what another pipeline version indexed for it.
+
+        A worker still running an older generation leaves newer rows alone.
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT id, version, generation FROM documents WHERE doc_id = ?", (analysis.doc_id,)
+            ).fetchone()
+            if row is not None:
+                if row[1] == self.version or row[2] > self.generation:
+                    return
+                self._remove(conn, row[0])
+
+            doc = conn.execute(
+                "INSERT INTO documents (doc_id, version, generation, document_type, jurisdiction, governing_law, "
+                "word_count, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (analysis.doc_id, self.version, self.generation, analysis.document_type, analysis.jurisdiction,
+                 analysis.governing_law, analysis.word_count, analysis.created_at)
+            ).lastrowid
+            conn.executemany(
+                "INSERT OR IGNORE INTO facets VALUES (?, ?, ?)",
+                [(facet, value, doc) for facet, value in self._facets(analysis)]
+            )
+            amounts = {_amount(value["value"]) for value in analysis.monetary_values}
+            conn.executemany(
+                "INSERT INTO amounts VALUES (?, ?)",
+                [(doc, amount) for amount in amounts if amount is not None]
+            )
+
+            for text in {clause.text for clause in analysis.key_clauses}:
+                text_hash = hashlib.sha1(text.encode('utf-8')).hexdigest()
+                found = conn.execute("SELECT id FROM clause_texts WHERE text_hash = ?", (text_hash,)).fetchone()
+                if found is None:
+                    text_id = conn.execute(
+                        "INSERT INTO clause_texts (text_hash, text) VALUES (?, ?)", (text_hash, text)
+                    ).lastrowid
+                    conn.execute("INSERT INTO clause_fts (rowid, text) VALUES (?, ?)", (text_id, text))
+                else:
+                    text_id = found[0]
+                conn.execute("INSERT OR IGNORE INTO clause_postings VALUES (?, ?)", (text_id, doc))
+
+    def _refresh(self, conn: sqlite3.Connection) -> _Postings:
+        """Bring the in-memory postings up to date with the index file"""
+        last_doc, last_removal = conn.execute(
+            "SELECT (SELECT COALESCE(MAX(id), 0) FROM documents), (SELECT COALESCE(MAX(seq), 0) FROM removals)"
+        ).fetchone()
+        postings = self._postings
+        if last_doc != postings.last_doc:
+            postings.load(conn, postings.last_doc, last_doc)
+        if last_removal != postings.last_removal:
+            postings.remove(conn, last_removal)
+        return postings
+
+    def refresh(self) -> None:
+        """Load the postings into memory ahead of the first search"""
+        with self._lock, self._connect() as conn:
+            conn.execute("BEGIN")
+            self._refresh(conn)
+
+    def _mask(self, postings: _Postings, docs: np.ndarray) -> np.ndarray:
+        mask = np.zeros(postings.last_doc + 1, dtype=bool)
+        mask[docs] = True
+        return mask
+
+    def _filter(
+        self,
+        postings: _Postings,
+        hits: np.ndarray,
+        facets: Dict[str, List[str]],
+        entity: Optional[str],
+        deadline_after: Optional[str],
+        deadline_before: Optional[str],
+        min_amount: Optional[float],
+        max_amount: Optional[float]
+    ) -> None:
+        """Clear the documents failing any filter from ``hits``"""
+        for facet, values in facets.items():
+            for value in values:
+                for word in _tokens(value) if facet in TOKENIZED_FACETS else [normalize(value)]:
+                    hits &= self._mask(postings, postings.facet(facet, word))
+        if entity:
+            entity = normalize(entity)
+            hits &= self._mask(postings, np.concatenate([postings.facet(facet, entity) for facet in ENTITY_FACETS]))
+        if deadline_after or deadline_before:
+            # Deadlines after a date include it, deadlines before it do not
+            dates = [
+                date for date in postings.facets["deadline"]
+                if (not deadline_after or date >= deadline_after) and (not deadline_before or date < deadline_before)
+            ]
+            docs = [postings.facet("deadline", date) for date in dates]
+            hits &= self._mask(postings, np.concatenate(docs) if docs else np.zeros(0, dtype=np.int64))
+        if min_amount is not None or max_amount is not None:
+            amounts = postings.numpy("amounts", postings.amounts)
+            selected = np.ones(len(amounts), dtype=bool)
+            if min_amount is not None:
+                selected &= amounts >= min_amount
+            if max_amount is not None:
+                selected &= amounts <= max_amount
+            hits &= self._mask(postings, postings.numpy("amount_docs", postings.amount_docs)[selected])
+
+    def _page_by_relevance(
+        self,
+        postings: _Postings,
+        hits: np.ndarray,
+        matched: List[Tuple[int, float]],
+        limit: int,
+        offset: int
+    ) -> List[Tuple[int, float]]:
+        """Documents ordered by their best matching clause, newest first among equals"""
+        page, seen = [], set()
+        for text_id, rank in matched:
+            docs = postings.numpy(("clause", text_id), postings.clauses.get(text_id, array('I')))
+            for doc in np.sort(docs[hits[docs]])[::-1].tolist():
+                if doc in seen:
+                    continue
+                seen.add(doc)
+                if len(seen) > offset:
+                    page.append((doc, -rank))
+                if len(page) >= limit:
+                    return page
+        return page
+
+    def _facet_counts(self, postings: _Postings, hits: np.ndarray) -> Dict[str, Dict[str, int]]:
+        counts = {}
+        for facet in COUNTED_FACETS:
+            values = {
+                value: int(np.count_nonzero(hits[postings.facet(facet, value)]))
+                for value in postings.facets[facet]
+            }
+            top = sorted(values.items(), key=lambda item: -item[1])[:SEARCH_CONFIG['facet_values']]
+            counts[facet] = {value: count for value, count in top if count}
+        return counts
+
+    def search(
+        self,
+        query: Optional[str] = None,
+        facets: Optional[Dict[str, List[str]]] = None,
+        entity: Optional[str] = None,
+        deadline_after: Optional[str] = None,
+        deadline_before: Optional[str] = None,
+        min_amount: Optional[float] = None,
+        max_amount: Optional[float] = None,
+        limit: int = SEARCH_CONFIG['default_limit'],
+        offset: int = 0
+    ) -> SearchResponse:
+        """Find documents matching every filter, ranked by clause relevance when ``query`` is given"""
+        start = time.perf_counter()
+        match = _fts_query(query) if query else None
+
+        with self._lock, self._connect() as conn:
+            # One read transaction, so the refresh sees whole documents only
+            conn.execute("BEGIN")
+            postings = self._refresh(conn)
+            hits = postings.live.copy()
+            self._filter(
+                postings, hits, facets or {}, entity, deadline_after, deadline_before, min_amount, max_amount
+            )
+
+            matched = []
+            if match:
+                matched = conn.execute(
+                    "SELECT rowid, bm25(clause_fts) AS score FROM clause_fts WHERE clause_fts MATCH ? ORDER BY score",
+                    (match,)
+                ).fetchall()
+                docs = [
+                    postings.numpy(("clause", text_id), postings.clauses.get(text_id, array('I')))
+                    for text_id, _ in matched
+                ]
+                hits &= self._mask(postings, np.concatenate(docs) if docs else np.zeros(0, dtype=np.int64))
+
+            total = int(np.count_nonzero(hits))
+            if match:
+                page = self._page_by_relevance(postings, hits, matched, limit, offset)
+            else:
+                newest = np.flatnonzero(hits)[::-1][offset:offset + limit]
+                page = [(doc, None) for doc in newest.tolist()]
+            counts = self._facet_counts(postings, hits)
+
+            rows = {
+                row[0]: row[1:] for row in conn.execute(
+                    "SELECT id, doc_id, document_type, jurisdiction, governing_law, word_count, created_at "
+                    f"FROM documents WHERE id IN ({','.join('?' * len(page))})",
+                    [doc for doc, _ in page]
+                )
+            }
+            snippets: Dict[int, List[str]] = defaultdict(list)
+            if match and page:
+                ranks = {text_id: position for position, (text_id, _) in enumerate(matched)}
+                contains = conn.execute(
+                    f"SELECT doc, text_id FROM clause_postings WHERE doc IN ({','.join('?' * len(page))})",
+                    [doc for doc, _ in page]
+                ).fetchall()
+                shown = {}
+                for doc, text_id in sorted(
+                    ((doc, text_id) for doc, text_id in contains if text_id in ranks),
+                    key=lambda pair: ranks[pair[1]]
+                ):
+                    if len(shown.setdefault(doc, [])) < SEARCH_CONFIG['snippets_per_hit']:
+                        shown[doc].append(text_id)
+                text_ids = sorted({text_id for ids in shown.values() for text_id in ids})
+                texts = dict(conn.execute(
+                    "SELECT rowid, snippet(clause_fts, 0, '[', ']', '...', 16) FROM clause_fts "
+                    f"WHERE clause_fts MATCH ? AND rowid IN ({','.join('?' * len(text_ids))})",
+                    [match, *text_ids]
+                ).fetchall())
+                for doc, ids in shown.items():
+                    snippets[doc] = [texts[text_id] for text_id in ids if text_id in texts]
+
+        results = []
+        for doc, score in page:
+            doc_id, document_type, jurisdiction, governing_law, word_count, created_at = rows[doc]
+            results.append(SearchHit(
+                doc_id=doc_id,
+                document_type=document_type,
+                jurisdiction=jurisdiction,
+                governing_law=governing_law,
+                word_count=word_count,
+                created_at=created_at,
+                score=score,
+                matches=snippets.get(doc, [])
+            ))
+
+        return SearchResponse(
+            total=total,
+            results=results,
+            facets=counts,
+            took_ms=round((time.perf_counter() - start) * 1000, 2)
+        )
+
+
+search_index = SearchIndex(SEARCH_CONFIG['path'], version=PIPELINE_VERSION, generation=int(ANALYSIS_CACHE_VERSION))
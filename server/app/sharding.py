@@ -0,0 +1,106 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from .spacy_pipeline import parse_texts, split_text
+
+# Shards run in worker processes, which cannot use the models loaded by the
+# server process: each worker loads the spaCy model once through the loader
+# the model registry uses, and returns plain data that pickles cheaply.
+
+# (context start, core start, core end, context end), as offsets in the full text
+ShardBounds = Tuple[int, int, int, int]
+
+# (start, end, text, LegalEntities field or None, risk factor or None)
+ShardEntity = Tuple[int, int, str, Optional[str], Optional[str]]
+
+def plan_shards(text: str, shard_chars: int, overlap_chars: int) -> List[ShardBounds]:
+    """Cut text into sentence-aligned cores, each parsed with a margin of the text around it"""
+    bounds, start = [], 0
+    for chunk in split_text(text, shard_chars):
+        end = start + len(chunk)
+        bounds.append((max(0, start - overlap_chars), start, end, min(len(text), end + overlap_chars)))
+        start = end
+    return bounds
+
+def group_paragraphs(paragraphs: List[str], shard_chars: int) -> List[List[str]]:
+    """Group consecutive paragraphs into shards of about ``shard_chars`` characters"""
+    groups, size = [], 0
+    for paragraph in paragraphs:
+        if not groups or size + len(paragraph) > shard_chars:
+            groups.append([])
+            size = 0
+        groups[-1].append(paragraph)
+        size += len(paragraph)
+    return groups
+
+_pipelines: Dict[Callable[[], Any], Any] = {}
+_processor = None
+
+def _pipeline(loader: Callable[[], Any]) -> Any:
+    nlp = _pipelines.get(loader)
+    if nlp is None:
+        nlp = _pipelines[loader] = loader()
+    return nlp
+
+def _get_processor():
+    """Return the processor for the current process; its extractors need no models"""
+    global _processor
+    if _processor is None:
+        from .processor import LegalDocumentProcessor
+        _processor = LegalDocumentProcessor()
+    return _processor
+
+def analyze_shard(
+    loader: Callable[[], Any],
+    text: str,
+    offset: int,
+    core_start: int,
+    core_end: int
+) -> Dict[str, Any]:
+    """Parse one shard and run the doc-level extractors over the part it owns.
+
+    ``text`` is the shard with its margins and starts at ``offset`` in the full
+    text. Sentences and entities belong to the shard whose core they start in;
+    the margins only give the parser and the entity context windows the text
+    around the core. Offsets in the result refer to the full text.
+    """
+    processor = _get_processor()
+    doc = parse_texts(_pipeline(loader), [text])[0]
+
+    def owns(start: int) -> bool:
+        return core_start <= offset + start < core_end
+
+    return {
+        "language": doc.lang_,
+        "sentences": [
+            (offset + sent.start_char, *processor._classify_sentence(sent.text))
+            for sent in doc.sents if owns(sent.start_char)
+        ],
+        "entities": [
+            (
+                offset + ent.start_char,
+                offset + ent.end_char,
+                ent.text,
+                processor._entity_role(doc, ent),
+                processor._entity_risk(ent)
+            )
+            for ent in doc.ents if owns(ent.start_char)
+        ]
+    }
+
+def analyze_paragraph_shard(loader: Callable[[], Any], paragraphs: List[str]) -> List[Dict[str, Any]]:
+    """Parse a group of paragraphs and run the doc-level extractors on each"""
+    processor = _get_processor()
+    return processor._paragraph_doc_features(parse_texts(_pipeline(loader), paragraphs))
+
+def merge_entities(shards: List[Dict[str, Any]]) -> List[ShardEntity]:
+    """Entities of every shard in text order, dropping any that overlaps one already kept.
+
+    Ownership already gives each entity to one shard; an overlap is left only
+    when two shards tokenized the text at a boundary differently.
+    """
+    merged, last_end = [], -1
+    entities = sorted((entity for shard in shards for entity in shard["entities"]), key=lambda e: (e[0], -e[1]))
+    for entity in entities:
+        if entity[0] >= last_end:
+            merged.append(entity)
+            last_end = entity[1]
+    return merged
@@ -0,0 +1,90 @@
+from typing import Any, Dict, Iterable, List
+from .config import logger, SPACY_CONFIG
+
+# The extractors only read doc.ents and doc.sents, so the fast profile drops the
+# tagger, lemmatizer and dependency parser and splits sentences with senter.
+SPACY_PROFILES: Dict[str, Dict[str, Any]] = {
+    'full': {'exclude': [], 'sentences': 'parser'},
+    'fast': {'exclude': ['tagger', 'parser', 'attribute_ruler', 'lemmatizer'], 'sentences': 'senter'},
+}
+
+SENTENCE_COMPONENTS = ('parser', 'senter', 'sentencizer')
+
+def load_spacy_pipeline(name: str, profile: str = SPACY_CONFIG['profile']) -> Any:
+    """Load a spaCy model with only the components the profile needs"""
+    import spacy
+
+    if profile not in SPACY_PROFILES:
+        raise ValueError(f"Unknown spaCy profile: {profile}")
+    settings = SPACY_PROFILES[profile]
+
+    nlp = spacy.load(name, exclude=settings['exclude'])
+    if settings['sentences'] == 'senter' and 'senter' in nlp.disabled:
+        nlp.enable_pipe('senter')
+    if not any(component in nlp.pipe_names for component in SENTENCE_COMPONENTS):
+        # Models without a trained senter fall back to punctuation rules
+        nlp.add_pipe('sentencizer', first=True)
+
+    # The shared tok2vec only feeds the tagger and parser in the small models
+    if 'tok2vec' in nlp.pipe_names and not nlp.get_pipe('tok2vec').listening_components:
+        nlp.remove_pipe('tok2vec')
+
+    logger.info(f"spaCy profile '{profile}' running {', '.join(nlp.pipe_names)}")
+    return nlp
+
+def split_text(text: str, chunk_chars: int = SPACY_CONFIG['chunk_chars']) -> List[str]:
+    """Cut text into chunks of at most ``chunk_chars`` that join back to the original.
+
+    Cuts fall on the last paragraph, line or sentence break in each window where
+    possible, so no entity or sentence spans two chunks in practice.
+    """
+    if len(text) <= chunk_chars:
+        return [text]
+
+    chunks, start = [], 0
+    while len(text) - start > chunk_chars:
+        window_end = start + chunk_chars
+        cut = -1
+        # Line breaks start the next chunk, as spaCy keeps them as tokens that
+        # lead the following sentence; a trailing space stays with its token
+        for separator, offset in (("\n\n", 0), ("\n", 0), (". ", 2), (" ", 1)):
+            cut = text.rfind(separator, start + chunk_chars // 2, window_end)
+            if cut != -1:
+                cut += offset
+                break
+        if cut == -1:
+            cut = window_end
+        chunks.append(text[start:cut])
+        start = cut
+    chunks.append(text[start:])
+    return chunks
+
+def parse_texts(
+    nlp: Any,
+    texts: Iterable[str],
+    chunk_chars: int = SPACY_CONFIG['chunk_chars'],
+    batch_size: int = 16,
+    n_process: int = 1
+) -> List[Any]:
+    """Parse texts of any length, running long ones through spaCy in chunks.
+
+    Chunks of every text go through a single ``nlp.pipe`` call and are joined
+    back with ``Doc.from_docs``, so token and entity offsets refer to the full
+    text and ``nlp.max_length`` never has to be raised for one huge input.
+    """
+    from spacy.tokens import Doc
+
+    owners, chunks = [], []
+    for index, text in enumerate(texts):
+        for chunk in split_text(text, chunk_chars):
+            owners.append(index)
+            chunks.append(chunk)
+
+    parsed: Dict[int, List[Any]] = {}
+    for index, doc in zip(owners, nlp.pipe(chunks, batch_size=batch_size, n_process=n_process)):
+        parsed.setdefault(index, []).append(doc)
+
+    return [
+        docs[0] if len(docs) == 1 else Doc.from_docs(docs, ensure_whitespace=False)
+        for _, docs in sorted(parsed.items())
+    ]
@@ -0,0 +1,226 @@
+import hashlib
+import re
+import time
+from typing import Any, Dict, List
+from cachetools import LRUCache
+from .config import logger, SUMMARY_CONFIG, MODEL_CONFIGS, ACTIVE_MODELS
+
+# Map-reduce summarization: sentences are packed into chunks that fit the
+# summarizer's context window, the chunks are summarized in batches, and the
+# partial summaries are summarized again until one remains.
+
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+def count_tokens(summarizer: Any, texts: List[str]) -> List[int]:
+    """Count summarizer tokens for each text in one tokenizer call"""
+    if not texts:
+        return []
+    encoded = summarizer.tokenizer(texts, add_special_tokens=False)
+    return [len(ids) for ids in encoded["input_ids"]]
+
+def chunk_texts(summarizer: Any, texts: List[str], max_tokens: int) -> List[str]:
+    """Greedily pack consecutive texts into chunks of at most ``max_tokens``"""
+    chunks = []
+    current, current_tokens = [], 0
+    for text, tokens in zip(texts, count_tokens(summarizer, texts)):
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append(" ".join(current))
+            current, current_tokens = [], 0
+        current.append(text.strip())
+        current_tokens += tokens
+    if current:
+        chunks.append(" ".join(current))
+    return [chunk for chunk in chunks if chunk]
+
+def _paragraph_breaks_after(paragraph: str) -> bool:
+    """Content-defined chunk boundary: about one paragraph in four ends a chunk"""
+    return hashlib.sha1(paragraph.encode('utf-8')).digest()[0] % 4 == 0
+
+def chunk_paragraphs(summarizer: Any, paragraphs: List[List[str]], max_tokens: int) -> List[str]:
+    """Pack paragraphs (lists of sentences) into chunks whose boundaries depend on content.
+
+    A chunk ends where a paragraph's own hash says so or where the next
+    paragraph would not fit, so editing one paragraph only changes the chunks
+    around it and the summaries of the others can be reused.
+    """
+    chunks = []
+    current, current_tokens = [], 0
+    for sentences in paragraphs:
+        text = " ".join(sentence.strip() for sentence in sentences).strip()
+        if not text:
+            continue
+        tokens = count_tokens(summarizer, [text])[0]
+        if tokens > max_tokens:
+            # Too long for one chunk: split it on its own sentences
+            if current:
+                chunks.append(" ".join(current))
+                current, current_tokens = [], 0
+            chunks.extend(chunk_texts(summarizer, sentences, max_tokens))
+            continue
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append(" ".join(current))
+            current, current_tokens = [], 0
+        current.append(text)
+        current_tokens += tokens
+        if _paragraph_breaks_after(text):
+            chunks.append(" ".join(current))
+            current, current_tokens = [], 0
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+def _sample_chunks(chunks: List[str], max_chunks: int) -> List[str]:
+    """Pick evenly spaced chunks so every part of the document is represented"""
+    if len(chunks) <= max_chunks:
+        return chunks
+    step = len(chunks) / max_chunks
+    return [chunks[int(i * step)] for i in range(max_chunks)]
+
+# Summaries of individual chunks, so unchanged parts of an amended document
+# are not summarized again
+chunk_summary_cache = LRUCache(maxsize=SUMMARY_CONFIG['cache_size'])
+# Backend and checkpoint of the configured summarizer, which decide its output
+SUMMARIZER_ID = f"{MODEL_CONFIGS['inference_backend']}:{ACTIVE_MODELS['summarizer']}"
+
+def _run_summarizer(summarizer: Any, texts: List[str], max_length: int, min_length: int) -> List[str]:
+    # The summarizer's class keeps stand-ins such as benchmark stubs apart from the real model
+    kind = f"{type(summarizer).__module__}.{type(summarizer).__qualname__}"
+    keys = [
+        hashlib.sha1(f"{SUMMARIZER_ID}:{kind}:{max_length}:{min_length}:{text}".encode('utf-8')).hexdigest()
+        for text in texts
+    ]
+    missing = [i for i, key in enumerate(keys) if key not in chunk_summary_cache]
+    if missing:
+        results = summarizer(
+            [texts[i] for i in missing],
+            max_length=max_length,
+            min_length=min_length,
+            do_sample=False,
+            truncation=True,
+            batch_size=len(missing)
+        )
+        for i, result in zip(missing, results):
+            chunk_summary_cache[keys[i]] = result['summary_text']
+    return [chunk_summary_cache[key] for key in keys]
+
+def _map_summaries(
+    summarizer: Any,
+    chunks: List[str],
+    deadline: float,
+    config: Dict[str, Any],
+    keep_remaining: bool = False
+) -> List[str]:
+    """Summarize chunks in batches, stopping early when the budget runs out.
+
+    With ``keep_remaining`` the chunks left over are returned unchanged, which
+    is used when reducing chunks that are already summaries.
+    """
+    summaries = []
+    batch_size = config['batch_size']
+    last_batch_time = 0.0
+
+    for i in range(0, len(chunks), batch_size):
+        batch_start = time.monotonic()
+        if summaries and batch_start + last_batch_time > deadline:
+            logger.warning(f"Summary budget exhausted after {i} of {len(chunks)} chunks")
+            if keep_remaining:
+                summaries.extend(chunks[i:])
+            break
+        summaries.extend(_run_summarizer(
+            summarizer,
+            chunks[i:i + batch_size],
+            config['chunk_max_length'],
+            config['chunk_min_length']
+        ))
+        last_batch_time = time.monotonic() - batch_start
+
+    return summaries
+
+def _reduce_summaries(summarizer: Any, partials: List[str], deadline: float, config: Dict[str, Any]) -> str:
+    """Summarize partial summaries again until one remains or the budget runs out"""
+    max_tokens = config['max_chunk_tokens']
+    while len(partials) > 1 and time.monotonic() < deadline:
+        groups = chunk_texts(summarizer, partials, max_tokens)
+        if len(groups) == 1:
+            return _run_summarizer(summarizer, groups, config['max_length'], config['min_length'])[0]
+        partials = _map_summaries(summarizer, groups, deadline, config, keep_remaining=True)
+
+    return " ".join(partials)
+
+def _leading_sentences(summarizer: Any, chunk: str, max_tokens: int) -> str:
+    """Extractive fallback: the sentences a chunk opens with, up to ``max_tokens``"""
+    return chunk_texts(summarizer, SENTENCE_END.split(chunk), max_tokens)[0]
+
+def summarize_sentences(summarizer: Any, sentences: List[str], config: Dict[str, Any] = SUMMARY_CONFIG) -> str:
+    """Summarize a whole document within the configured latency budget"""
+    return summarize_chunks(summarizer, chunk_texts(summarizer, sentences, config['max_chunk_tokens']), config)
+
+def summarize_chunks(summarizer: Any, chunks: List[str], config: Dict[str, Any] = SUMMARY_CONFIG) -> str:
+    """Map-reduce summarize a document that is already split into chunks"""
+    deadline = time.monotonic() + config['latency_budget']
+
+    if not chunks:
+        return ""
+    if len(chunks) == 1:
+        return _run_summarizer(summarizer, chunks, config['max_length'], config['min_length'])[0]
+
+    # Map
+    partials = _map_summaries(summarizer, _sample_chunks(chunks, config['max_chunks']), deadline, config)
+
+    # Reduce
+    return _reduce_summaries(summarizer, partials, deadline, config)
+
+def summarize_many(summarizer: Any, documents: List[List[str]], config: Dict[str, Any] = SUMMARY_CONFIG) -> List[str]:
+    """Summarize several documents, batching summarizer calls across documents"""
+    return summarize_many_chunks(
+        summarizer, [chunk_texts(summarizer, sentences, config['max_chunk_tokens']) for sentences in documents], config
+    )
+
+def summarize_many_chunks(
+    summarizer: Any,
+    chunked: List[List[str]],
+    config: Dict[str, Any] = SUMMARY_CONFIG
+) -> List[str]:
+    """Map-reduce summarize several documents that are already split into chunks"""
+    batch_size = config['batch_size']
+    summaries = [""] * len(chunked)
+
+    # Documents that fit in one chunk are summarized directly, several per call
+    single = [i for i, chunks in enumerate(chunked) if len(chunks) == 1]
+    for start in range(0, len(single), batch_size):
+        batch = single[start:start + batch_size]
+        results = _run_summarizer(
+            summarizer, [chunked[i][0] for i in batch], config['max_length'], config['min_length']
+        )
+        for i, summary in zip(batch, results):
+            summaries[i] = summary
+
+    multi = [i for i, chunks in enumerate(chunked) if len(chunks) > 1]
+    if not multi:
+        return summaries
+
+    # Every batch of long documents gets the budget of a single document
+    deadline = time.monotonic() + config['latency_budget'] * -(-len(multi) // batch_size)
+
+    # Interleave the chunks of all documents so a budget cut trims each
+    # document's tail instead of dropping whole documents
+    sampled = {i: _sample_chunks(chunked[i], config['max_chunks']) for i in multi}
+    owners, chunks = [], []
+    for position in range(max(len(c) for c in sampled.values())):
+        for i in multi:
+            if position < len(sampled[i]):
+                owners.append(i)
+                chunks.append(sampled[i][position])
+
+    partials = {i: [] for i in multi}
+    for owner, summary in zip(owners, _map_summaries(summarizer, chunks, deadline, config)):
+        partials[owner].append(summary)
+
+    for i in multi:
+        if partials[i]:
+            summaries[i] = _reduce_summaries(summarizer, partials[i], deadline, config)
+        else:
+            # The budget ran out before any of this document's chunks were summarized
+            logger.warning("Summary budget exhausted before a document was reached; using its leading sentences")
+            summaries[i] = _leading_sentences(summarizer, sampled[i][0], config['max_length'])
+    return summaries
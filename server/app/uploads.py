@@ -0,0 +1,83 @@
+import asyncio
+import hashlib
+import io
+import mmap
+import os
+from typing import Any, BinaryIO, Optional
+from fastapi import HTTPException, UploadFile
+from .config import UPLOAD_CONFIG
+from .pdf_backends import PdfSource
+
+# Starlette has already spooled every upload before a handler runs: in memory
+# up to 1 MB, in a temporary file beyond that. Uploads are size-checked, hashed
+# and read where they were spooled instead of being copied again; spooled files
+# are read through a read-only memory map rather than loaded.
+
+class SpooledUpload:
+    """An upload's content, as bytes or a map of Starlette's spool, with its size and hash"""
+
+    def __init__(self, filename: Optional[str], file_type: str, content: PdfSource, content_hash: str):
+        self.filename = filename
+        self.file_type = file_type
+        self.size = len(content)
+        self.content_hash = content_hash
+        self._content = content
+
+    def content(self) -> PdfSource:
+        """The upload; a map stays valid after Starlette closes the spool"""
+        return self._content
+
+    def copy_to(self, destination: BinaryIO) -> None:
+        """Write the upload to another file"""
+        destination.write(self._content)
+
+    def close(self) -> None:
+        """Unmap a spooled upload, releasing its file descriptor"""
+        if isinstance(self._content, mmap.mmap):
+            try:
+                self._content.close()
+            except BufferError:
+                # A reader still holds a view of the map; it is unmapped once collected
+                pass
+
+def map_file(path: str) -> PdfSource:
+    """Map a spooled upload read-only; the map outlives the file handle"""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+def _on_disk(file: Any) -> bool:
+    # SpooledTemporaryFile does not expose whether it has rolled over to disk
+    return getattr(file, "_rolled", True)
+
+def _read_spooled(file: Any) -> PdfSource:
+    file.seek(0, io.SEEK_END)
+    if file.tell() == 0:
+        return b""
+    if _on_disk(file):
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    file.seek(0)
+    return file.read()
+
+def _too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(status_code=413, detail=f"Upload exceeds the limit of {max_bytes} bytes")
+
+async def receive_upload(
+    upload: UploadFile,
+    file_type: str,
+    max_bytes: int = UPLOAD_CONFIG['max_bytes']
+) -> SpooledUpload:
+    """Size-check, map and hash an upload where Starlette spooled it.
+
+    Small uploads Starlette kept in memory are read as bytes and hold no file
+    descriptor; a map holds one until it is closed.
+    """
+    if upload.size is not None and upload.size > max_bytes:
+        raise _too_large(max_bytes)
+
+    content = await asyncio.to_thread(_read_spooled, upload.file)
+    if len(content) > max_bytes:
+        raise _too_large(max_bytes)
+    content_hash = await asyncio.to_thread(lambda: hashlib.sha256(content).hexdigest())
+    return SpooledUpload(upload.filename, file_type, content, content_hash)
@@ -1,7 +1,117 @@
-from typing import Dict, List
+import hashlib
+import re
+from collections import defaultdict
+from typing import Any, Callable, Dict, Hashable, List, Set, Tuple
 
+import numpy as np
+
+from .config import COMPARE_CONFIG
 from .models import LegalClause, LegalEntities
 
+_WORD_PATTERN = re.compile(r"\w+")
+_MERSENNE_PRIME = (1 << 31) - 1
+_rng = np.random.default_rng(0)
+_PERM_A = _rng.integers(1, _MERSENNE_PRIME, COMPARE_CONFIG['num_perm'], dtype=np.uint64)
+_PERM_B = _rng.integers(0, _MERSENNE_PRIME, COMPARE_CONFIG['num_perm'], dtype=np.uint64)
+
+
+def _stable_hash(words: List[str]) -> int:
+    # The builtin hash() is salted per process, which would make signatures
+    # differ between workers and restarts
+    return int.from_bytes(hashlib.blake2b(" ".join(words).encode(), digest_size=8).digest(), "little")
+
+def _shingles(text: str, size: int = COMPARE_CONFIG['shingle_size']) -> Set[int]:
+    """Hashed word n-grams of a text"""
+    words = _WORD_PATTERN.findall(text.lower())
+    if len(words) <= size:
+        return {_stable_hash(words)}
+    return {_stable_hash(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+def _minhash(shingles: Set[int]) -> np.ndarray:
+    """MinHash signature of a shingle set"""
+    x = np.fromiter((h % _MERSENNE_PRIME for h in shingles), dtype=np.uint64, count=len(shingles))
+    return ((_PERM_A[:, None] * x[None, :] + _PERM_B[:, None]) % _MERSENNE_PRIME).min(axis=1)
+
+def _jaccard(a: Set[int], b: Set[int]) -> float:
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+def _align(
+    items1: List[Any],
+    items2: List[Any],
+    text_of: Callable[[Any], str],
+    group_of: Callable[[Any], Hashable] = lambda item: None
+) -> List[Tuple[int, int, float]]:
+    """Pair items of two lists with their most similar counterpart in the same group.
+
+    Candidate pairs come from MinHash LSH buckets, so only items sharing a band
+    of their signature are compared. Pairs are then accepted greedily, best
+    similarity first, each item taking part in at most one pair. Returns
+    ``(index1, index2, similarity)`` ordered by ``index1``.
+    """
+    if not items1 or not items2:
+        return []
+
+    bands = COMPARE_CONFIG['bands']
+    rows = COMPARE_CONFIG['num_perm'] // bands
+    max_bucket = COMPARE_CONFIG['max_bucket_size']
+
+    shingles = [[_shingles(text_of(item)) for item in items] for items in (items1, items2)]
+    buckets = defaultdict(lambda: ([], []))
+    for side, items in enumerate((items1, items2)):
+        for index, item in enumerate(items):
+            signature = _minhash(shingles[side][index])
+            group = group_of(item)
+            for band in range(bands):
+                key = (group, band, signature[band * rows:(band + 1) * rows].tobytes())
+                buckets[key][side].append(index)
+
+    candidates = {}
+    for first, second in buckets.values():
+        if not first or not second or len(first) * len(second) > max_bucket * max_bucket:
+            continue
+        for i in first:
+            for j in second:
+                if (i, j) not in candidates:
+                    candidates[(i, j)] = _jaccard(shingles[0][i], shingles[1][j])
+
+    threshold = COMPARE_CONFIG['similarity_threshold']
+    used1, used2, pairs = set(), set(), []
+    for (i, j), similarity in sorted(candidates.items(), key=lambda pair: -pair[1]):
+        if similarity < threshold:
+            break
+        if i in used1 or j in used2:
+            continue
+        used1.add(i)
+        used2.add(j)
+        pairs.append((i, j, similarity))
+
+    return sorted(pairs)
+
+def _dict_key(item: Dict[str, Any]) -> Tuple:
+    """Hashable key for exact matching of extracted dicts"""
+    return tuple(sorted(item.items()))
+
+def _diff_dicts(
+    items1: List[Dict[str, Any]],
+    items2: List[Dict[str, Any]],
+    text_of: Callable[[Dict[str, Any]], str],
+    group_of: Callable[[Dict[str, Any]], Hashable] = lambda item: None
+) -> Dict:
+    """Exact-match two lists of dicts by hash, then align what is left"""
+    keys1 = {_dict_key(item) for item in items1}
+    keys2 = {_dict_key(item) for item in items2}
+    unique1 = [item for item in items1 if _dict_key(item) not in keys2]
+    unique2 = [item for item in items2 if _dict_key(item) not in keys1]
+
+    return {
+        "unique_to_first": unique1,
+        "unique_to_second": unique2,
+        "modified": [
+            {"from": unique1[i], "to": unique2[j], "similarity": round(similarity, 3)}
+            for i, j, similarity in _align(unique1, unique2, text_of, group_of)
+        ]
+    }
+
 
 def _compare_entities(entities1: LegalEntities, entities2: LegalEntities) -> Dict:
     """Compare entities between two documents"""
@@ -31,55 +141,38 @@ def _compare_entities(entities1: LegalEntities, entities2: LegalEntities) -> Dic
 
 def _compare_obligations(obligations1: List[Dict[str, str]], obligations2: List[Dict[str, str]]) -> Dict:
     """Compare obligations between two documents"""
-    return {
-        "unique_to_first": [o for o in obligations1 if o not in obligations2],
-        "unique_to_second": [o for o in obligations2 if o not in obligations1],
-        "modified": [
-            {"from": o1, "to": o2}
-            for o1 in obligations1
-            for o2 in obligations2
-            if o1["text"] != o2["text"] and o1["type"] == o2["type"]
-        ]
-    }
+    return _diff_dicts(
+        obligations1, obligations2,
+        text_of=lambda o: o["text"],
+        group_of=lambda o: o["type"]
+    )
 
 def _compare_deadlines(deadlines1: List[Dict[str, str]], deadlines2: List[Dict[str, str]]) -> Dict:
     """Compare deadlines between two documents"""
-    return {
-        "unique_to_first": [d for d in deadlines1 if d not in deadlines2],
-        "unique_to_second": [d for d in deadlines2 if d not in deadlines1],
-        "modified": [
-            {"from": d1, "to": d2}
-            for d1 in deadlines1
-            for d2 in deadlines2
-            if d1["text"] != d2["text"] and d1["date"] != d2["date"]
-        ]
-    }
+    return _diff_dicts(deadlines1, deadlines2, text_of=lambda d: d["text"])
 
 def _compare_monetary_values(values1: List[Dict[str, str]], values2: List[Dict[str, str]]) -> Dict:
     """Compare monetary values between two documents"""
-    return {
-        "unique_to_first": [v for v in values1 if v not in values2],
-        "unique_to_second": [v for v in values2 if v not in values1],
-        "modified": [
-            {"from": v1, "to": v2}
-            for v1 in values1
-            for v2 in values2
-            if v1["value"] != v2["value"]
-        ]
-    }
+    # Amounts are paired by the text around them, so a changed amount in the
+    # same sentence shows up as a modification
+    return _diff_dicts(values1, values2, text_of=lambda v: v["context"])
+
 def _compare_clauses(clauses1: List[LegalClause], clauses2: List[LegalClause]) -> Dict:
     """Compare clauses between two documents"""
+    texts1 = {c.text for c in clauses1}
+    texts2 = {c.text for c in clauses2}
+    unique1 = [c for c in clauses1 if c.text not in texts2]
+    unique2 = [c for c in clauses2 if c.text not in texts1]
+
     return {
-        "unique_to_first": [c.dict() for c in clauses1 if not any(
-            c.text == c2.text for c2 in clauses2
-        )],
-        "unique_to_second": [c.dict() for c in clauses2 if not any(
-            c.text == c1.text for c1 in clauses1
-        )],
+        "unique_to_first": [c.dict() for c in unique1],
+        "unique_to_second": [c.dict() for c in unique2],
         "modified": [
-            {"from": c1.dict(), "to": c2.dict()}
-            for c1 in clauses1
-            for c2 in clauses2
-            if c1.clause_type == c2.clause_type and c1.text != c2.text
+            {"from": unique1[i].dict(), "to": unique2[j].dict(), "similarity": round(similarity, 3)}
+            for i, j, similarity in _align(
+                unique1, unique2,
+                text_of=lambda c: c.text,
+                group_of=lambda c: c.clause_type
+            )
         ]
-    }
\ No newline at end of file
+    }
@@ -0,0 +1,145 @@
+import random
+import zlib
+from typing import List, Optional
+
+# Synthetic contracts and court filings built from clause templates. Every
+# template exercises at least one extractor, so document size scales the work
+# of each stage roughly linearly.
+
+PARTIES = ["Acme Corp", "Globex Ltd", "Initech Pvt Ltd", "Umbrella Industries", "Stark Holdings"]
+PEOPLE = ["John Smith", "Priya Sharma", "Rahul Verma", "Anita Desai", "Michael Brown"]
+JUDGES = ["Justice Rao", "Justice Iyer", "Judge Thompson"]
+COURTS = ["Supreme Court", "Delhi High Court", "Bombay High Court"]
+PLACES = ["Delhi", "Mumbai", "Chennai", "Kolkata", "India"]
+REPORTERS = ["AIR {year} SC {page}", "({year}) {vol} SCC {page}", "ILR {year} Del {page}"]
+
+CONTRACT_CLAUSES = [
+    '"{term}" means the {adjective} services provided by {party} under this Agreement.',
+    "{party} shall pay {person} the sum of ${amount} within {days} days of the invoice date.",
+    "Either party may terminate this agreement by giving {days} days written notice to the other party.",
+    "{party} shall indemnify and hold harmless {other} against all losses arising from a breach.",
+    "Each party must keep all confidential information of the other party secret for {years} years.",
+    "This agreement shall be governed by the laws of {place}.",
+    "Any dispute is subject to the exclusive jurisdiction of the courts of {place}.",
+    "Neither party is liable for delay caused by force majeure, including acts of God and war.",
+    "If any provision is held invalid, the provision shall be severable from this agreement.",
+    "{party} agrees to deliver the report no later than {date}.",
+    "Payment of Rs. {amount} is due by {date} and late payment incurs interest of {rate} percent.",
+    "{person} is required to maintain insurance of ${amount} for the term of this agreement.",
+    "The deadline for acceptance of the deliverables is {date}.",
+    "{party} has a duty to notify {other} of any breach and is responsible for remediation costs.",
+]
+
+FILING_CLAUSES = [
+    "The petitioner {person} filed this petition before the {court} on {date}.",
+    "Counsel for the respondent, {lawyer}, argued that {party} breached the agreement.",
+    "Reliance is placed on {citation}, where the court held that consideration must be lawful.",
+    "{judge} observed that the order of the lower court must be set aside.",
+    "The respondent shall file a reply within {days} days of service of this order.",
+    "The claim for Rs. {amount} towards damages is pending before the tribunal in {place}.",
+    "In view of {citation} the motion is allowed and costs of ${amount} are awarded.",
+    "The matter is subject to the jurisdiction of the {court}.",
+    '"{term}" refers to the property situated at {place} as described in the schedule.',
+    "The parties must appear before the registrar no later than {date}.",
+]
+
+ADJECTIVES = ["consulting", "maintenance", "software", "advisory", "logistics"]
+TERMS = ["Services", "Deliverables", "Confidential Information", "Effective Date", "Premises"]
+
+def _fill(template: str, rng: random.Random) -> str:
+    party, other = rng.sample(PARTIES, 2)
+    year = rng.randint(1950, 2024)
+    return template.format(
+        party=party,
+        other=other,
+        person=rng.choice(PEOPLE),
+        lawyer=rng.choice(PEOPLE) + " Esq",
+        judge=rng.choice(JUDGES),
+        court=rng.choice(COURTS),
+        place=rng.choice(PLACES),
+        term=rng.choice(TERMS),
+        adjective=rng.choice(ADJECTIVES),
+        amount=f"{rng.randint(1, 999)},{rng.randint(0, 999):03d}.00",
+        days=rng.choice([7, 15, 30, 45, 60, 90]),
+        years=rng.randint(1, 10),
+        rate=rng.randint(1, 24),
+        date=f"{rng.randint(2020, 2030)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        citation=rng.choice(REPORTERS).format(year=year, vol=rng.randint(1, 20), page=rng.randint(1, 2000)),
+    )
+
+def generate_paragraphs(kind: str, words: int, seed: int = 0) -> List[str]:
+    """Generate paragraphs of a synthetic 'contract' or 'court_filing' of about ``words`` words"""
+    rng = random.Random(seed)
+    templates = CONTRACT_CLAUSES if kind == "contract" else FILING_CLAUSES
+    title = "SERVICES AGREEMENT" if kind == "contract" else "PETITION BEFORE THE COURT"
+    paragraphs = [title]
+    count = 1
+    while count < words:
+        sentences = [_fill(rng.choice(templates), rng) for _ in range(rng.randint(2, 5))]
+        paragraph = f"{len(paragraphs)}. " + " ".join(sentences)
+        paragraphs.append(paragraph)
+        count += len(paragraph.split())
+    return paragraphs
+
+def generate_document(kind: str, words: int, seed: int = 0) -> str:
+    """Generate the text of a synthetic legal document"""
+    return "\n\n".join(generate_paragraphs(kind, words, seed))
+
+def revise(paragraphs: List[str], rate: float = 0.1, seed: int = 0) -> List[str]:
+    """Produce a later draft: edit, drop and insert a fraction of the paragraphs"""
+    rng = random.Random(seed)
+    revised = []
+    for paragraph in paragraphs:
+        roll = rng.random()
+        if roll < rate / 3:
+            continue
+        if roll < 2 * rate / 3:
+            paragraph = paragraph.replace("shall", "must", 1).replace("30", "45", 1)
+        elif roll < rate:
+            revised.append(_fill(rng.choice(CONTRACT_CLAUSES), rng))
+        revised.append(paragraph)
+    return revised
+
+def _escape(line: str) -> str:
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def make_pdf(text: str, lines_per_page: int = 50, line_chars: int = 90) -> bytes:
+    """Render text into a minimal PDF with one Helvetica text stream per page"""
+    lines: List[str] = []
+    for paragraph in text.split("\n"):
+        words, current = paragraph.split(), ""
+        for word in words:
+            if current and len(current) + len(word) + 1 > line_chars:
+                lines.append(current)
+                current = word
+            else:
+                current = f"{current} {word}" if current else word
+        lines.append(current)
+    pages = [lines[i:i + lines_per_page] for i in range(0, len(lines), lines_per_page)] or [[]]
+
+    objects: List[Optional[bytes]] = [None, None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_ids = []
+    for page_lines in pages:
+        stream = "BT /F1 10 Tf 12 TL 40 800 Td " + " ".join(f"({_escape(line)}) Tj T*" for line in page_lines) + " ET"
+        data = zlib.compress(stream.encode("latin-1", "replace"))
+        objects.append(b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(data) + data + b"\nendstream")
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % len(objects)
+        )
+        page_ids.append(len(objects))
+    objects[0] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % i for i in page_ids), len(page_ids)
+    )
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
@@ -0,0 +1,69 @@
+"""Measure how much memory a server and its workers really use.
+
+Run from the ``server`` directory against a running server::
+
+    python -m benchmarks.memory --pid <gunicorn master pid>
+
+RSS counts shared pages once per process, so it overstates the cost of
+extra workers. PSS splits every shared page between the processes mapping
+it, and its total over the process tree is the real footprint; USS is what
+each process would free on exit. With preloaded models, USS per worker should
+stay far below the size of the models.
+"""
+import argparse
+import json
+import os
+from typing import Dict, List
+
+def _children(pid: int) -> List[int]:
+    children = []
+    task_dir = f"/proc/{pid}/task"
+    for task in os.listdir(task_dir):
+        try:
+            with open(f"{task_dir}/{task}/children") as f:
+                children.extend(int(child) for child in f.read().split())
+        except FileNotFoundError:
+            continue
+    return children
+
+def process_tree(pid: int) -> List[int]:
+    """A process and all of its descendants"""
+    tree, stack = [], [pid]
+    while stack:
+        current = stack.pop()
+        tree.append(current)
+        stack.extend(_children(current))
+    return tree
+
+def memory_of(pid: int) -> Dict[str, float]:
+    """RSS, PSS and USS of one process in MiB, from /proc/<pid>/smaps_rollup"""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 3 and parts[1].isdigit():
+                fields[parts[0].rstrip(":")] = int(parts[1])
+    uss = fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)
+    return {
+        "rss_mb": round(fields.get("Rss", 0) / 1024, 1),
+        "pss_mb": round(fields.get("Pss", 0) / 1024, 1),
+        "uss_mb": round(uss / 1024, 1),
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Report RSS, PSS and USS of a server process tree")
+    parser.add_argument("--pid", type=int, required=True, help="master process id")
+    args = parser.parse_args()
+
+    processes = {}
+    for pid in process_tree(args.pid):
+        try:
+            processes[pid] = memory_of(pid)
+        except (FileNotFoundError, PermissionError):
+            continue
+
+    total = {key: round(sum(p[key] for p in processes.values()), 1) for key in ("rss_mb", "pss_mb", "uss_mb")}
+    print(json.dumps({"processes": processes, "total": total}, indent=2))
+
+if __name__ == "__main__":
+    main()
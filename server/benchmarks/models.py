@@ -0,0 +1,261 @@
+"""Compare inference backends and distilled models on accuracy and latency.
+
+Run from the ``server`` directory::
+
+    python -m benchmarks.models --backends pytorch quantized onnx --distilled both --output models.json
+
+QA accuracy is exact match and token F1 on synthetic contract questions with
+known answers, or on a SQuAD-format file given with ``--squad``. Summaries
+have no references, so each variant is scored by ROUGE-L against the fp32
+full-size summarizer. Latency is measured per call and as batched throughput,
+the way the service calls the models.
+"""
+import argparse
+import json
+import platform
+import random
+import re
+import statistics
+import string
+import sys
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.inference import build_pipeline, resolve_model_name
+from app.summarization import summarize_sentences
+from .corpus import PARTIES, PEOPLE, PLACES, generate_document, generate_paragraphs
+
+QA_TEMPLATES = [
+    ("{party} shall pay {person} the sum of ${amount} within {days} days of the invoice date.",
+     [("How much must {party} pay {person}?", "${amount}"),
+      ("Within how many days must {party} pay?", "{days} days")]),
+    ("This agreement shall be governed by the laws of {place}.",
+     [("Which laws govern this agreement?", "{place}")]),
+    ("{party} agrees to deliver the report no later than {date}.",
+     [("When must {party} deliver the report?", "{date}")]),
+    ("Either party may terminate this agreement by giving {days} days written notice.",
+     [("How much notice is needed to terminate the agreement?", "{days} days")]),
+]
+
+def synthetic_qa(samples: int, seed: int = 0) -> List[Dict[str, str]]:
+    """Questions whose answers are planted in generated contract text"""
+    rng = random.Random(seed)
+    examples = []
+    while len(examples) < samples:
+        template, questions = rng.choice(QA_TEMPLATES)
+        values = {
+            "party": rng.choice(PARTIES),
+            "person": rng.choice(PEOPLE),
+            "place": rng.choice(PLACES),
+            "amount": f"{rng.randint(1, 999)},{rng.randint(0, 999):03d}",
+            "days": str(rng.choice([7, 15, 30, 45, 60, 90])),
+            "date": f"{rng.randint(2020, 2030)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        }
+        filler = generate_paragraphs("contract", 150, seed=rng.randint(0, 10 ** 6))[1:]
+        position = rng.randint(0, len(filler))
+        context = " ".join(filler[:position] + [template.format(**values)] + filler[position:])
+        question, answer = rng.choice(questions)
+        examples.append({
+            "question": question.format(**values),
+            "context": context,
+            "answer": answer.format(**values),
+        })
+    return examples
+
+def load_squad(path: str, samples: int) -> List[Dict[str, str]]:
+    """First ``samples`` answerable questions of a SQuAD v1/v2 JSON file"""
+    with open(path) as f:
+        data = json.load(f)["data"]
+    examples = []
+    for article in data:
+        for paragraph in article["paragraphs"]:
+            for qa in paragraph["qas"]:
+                if qa.get("answers"):
+                    examples.append({
+                        "question": qa["question"],
+                        "context": paragraph["context"],
+                        "answer": qa["answers"][0]["text"],
+                    })
+                    if len(examples) >= samples:
+                        return examples
+    return examples
+
+def _normalize(text: str) -> List[str]:
+    text = text.lower()
+    text = "".join(ch for ch in text if ch not in set(string.punctuation))
+    text = re.sub(r"\b(a|an|the)\b", " ", text)
+    return text.split()
+
+def exact_match(prediction: str, answer: str) -> float:
+    return float(_normalize(prediction) == _normalize(answer))
+
+def token_f1(prediction: str, answer: str) -> float:
+    predicted, expected = _normalize(prediction), _normalize(answer)
+    common = sum((Counter(predicted) & Counter(expected)).values())
+    if not common:
+        return 0.0
+    precision, recall = common / len(predicted), common / len(expected)
+    return 2 * precision * recall / (precision + recall)
+
+def rouge_l(candidate: str, reference: str) -> float:
+    """ROUGE-L F1 from the longest common subsequence of tokens"""
+    a, b = _normalize(candidate), _normalize(reference)
+    if not a or not b:
+        return 0.0
+    previous = [0] * (len(b) + 1)
+    for token in a:
+        current = [0]
+        for j, other in enumerate(b):
+            current.append(previous[j] + 1 if token == other else max(previous[j + 1], current[j]))
+        previous = current
+    lcs = previous[-1]
+    if not lcs:
+        return 0.0
+    precision, recall = lcs / len(a), lcs / len(b)
+    return 2 * precision * recall / (precision + recall)
+
+def _latency(runs: List[float]) -> Dict[str, float]:
+    runs = sorted(runs)
+    return {
+        "p50_ms": round(statistics.median(runs) * 1000, 2),
+        "p95_ms": round(runs[min(len(runs) - 1, int(len(runs) * 0.95))] * 1000, 2),
+    }
+
+def evaluate_qa(qa_model: Any, examples: List[Dict[str, str]], batch_size: int) -> Dict[str, Any]:
+    """Accuracy and latency of a QA pipeline"""
+    runs, predictions = [], []
+    for example in examples:
+        start = time.perf_counter()
+        result = qa_model(question=example["question"], context=example["context"])
+        runs.append(time.perf_counter() - start)
+        predictions.append(result["answer"])
+
+    # Batched throughput, as the micro-batcher calls the model
+    start = time.perf_counter()
+    for offset in range(0, len(examples), batch_size):
+        batch = examples[offset:offset + batch_size]
+        qa_model(
+            question=[example["question"] for example in batch],
+            context=[example["context"] for example in batch],
+            batch_size=len(batch)
+        )
+    elapsed = time.perf_counter() - start
+
+    return {
+        "exact_match": round(statistics.fmean(exact_match(p, e["answer"]) for p, e in zip(predictions, examples)), 4),
+        "f1": round(statistics.fmean(token_f1(p, e["answer"]) for p, e in zip(predictions, examples)), 4),
+        **_latency(runs),
+        "batched_items_per_second": round(len(examples) / elapsed, 2),
+    }
+
+def evaluate_summarizer(
+    summarizer: Any,
+    documents: List[List[str]],
+    references: Optional[List[str]]
+) -> Tuple[Dict[str, Any], List[str]]:
+    """Latency of the map-reduce summarizer, and ROUGE-L against reference summaries"""
+    runs, summaries = [], []
+    for sentences in documents:
+        start = time.perf_counter()
+        summaries.append(summarize_sentences(summarizer, sentences))
+        runs.append(time.perf_counter() - start)
+
+    report = {**_latency(runs), "documents_per_second": round(len(documents) / sum(runs), 3)}
+    if references is not None:
+        report["rouge_l_vs_baseline"] = round(
+            statistics.fmean(rouge_l(s, r) for s, r in zip(summaries, references)), 4
+        )
+    return report, summaries
+
+def _rss_mb() -> Optional[float]:
+    try:
+        import resource
+        # ru_maxrss is in KiB on Linux
+        return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    except ImportError:
+        return None
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare QA and summarizer inference backends")
+    parser.add_argument("--backends", nargs="+", default=["pytorch", "quantized", "onnx"])
+    parser.add_argument("--distilled", choices=["no", "yes", "both"], default="both")
+    parser.add_argument("--samples", type=int, default=50, help="QA questions to evaluate")
+    parser.add_argument("--documents", type=int, default=5, help="documents to summarize")
+    parser.add_argument("--document-words", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--squad", help="SQuAD-format JSON to use instead of synthetic questions")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="model-report.json")
+    args = parser.parse_args()
+
+    examples = load_squad(args.squad, args.samples) if args.squad else synthetic_qa(args.samples, args.seed)
+    documents = [
+        [sentence + "." for sentence in generate_document("contract", args.document_words, seed).split(". ")]
+        for seed in range(args.documents)
+    ]
+    distilled_options = {"no": [False], "yes": [True], "both": [False, True]}[args.distilled]
+
+    # The fp32 full-size summarizer's output is the reference for the others
+    variants = [("pytorch", False)] + [
+        (backend, distilled)
+        for distilled in distilled_options
+        for backend in args.backends
+        if (backend, distilled) != ("pytorch", False)
+    ]
+
+    results, references = [], None
+    for backend, distilled in variants:
+        entry: Dict[str, Any] = {"backend": backend, "distilled": distilled}
+        print(f"Evaluating {backend} ({'distilled' if distilled else 'full'})", file=sys.stderr)
+        try:
+            qa_name = resolve_model_name("qa_model", distilled)
+            summarizer_name = resolve_model_name("summarizer", distilled)
+
+            start = time.perf_counter()
+            qa_model = build_pipeline("question-answering", qa_name, backend)
+            summarizer = build_pipeline("summarization", summarizer_name, backend)
+            entry["load_seconds"] = round(time.perf_counter() - start, 2)
+            entry["models"] = {"qa_model": qa_name, "summarizer": summarizer_name}
+
+            entry["qa"] = evaluate_qa(qa_model, examples, args.batch_size)
+            entry["summarizer"], summaries = evaluate_summarizer(summarizer, documents, references)
+            if references is None:
+                references = summaries
+            entry["max_rss_mb"] = _rss_mb()
+            del qa_model, summarizer
+        except Exception as e:
+            # Missing optional dependencies (torch, optimum) skip the variant
+            entry["error"] = str(e)
+            if references is None:
+                print("Baseline failed; summaries will not be scored", file=sys.stderr)
+        results.append(entry)
+
+    baseline = results[0] if "error" not in results[0] else None
+    if baseline is not None:
+        for entry in results[1:]:
+            if "error" in entry:
+                continue
+            entry["qa_speedup"] = round(
+                entry["qa"]["batched_items_per_second"] / baseline["qa"]["batched_items_per_second"], 2
+            )
+            entry["summarizer_speedup"] = round(
+                entry["summarizer"]["documents_per_second"] / baseline["summarizer"]["documents_per_second"], 2
+            )
+
+    report = {
+        "generated_at": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "qa_examples": "squad" if args.squad else "synthetic",
+        "samples": len(examples),
+        "documents": len(documents),
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {len(results)} variants to {args.output}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""Benchmark the analysis pipeline stage by stage.
+
+Run from the ``server`` directory::
+
+    python -m benchmarks.run --stub-models --sizes 1000 10000 50000 --output report.json
+    python -m benchmarks.run --stub-models --baseline previous.json
+
+``--stub-models`` swaps the transformers models and the trained spaCy model
+for instant stand-ins (see ``benchmarks.stubs``), which keeps the extraction,
+regex and diff hot paths measurable in CI. The JSON report can be diffed
+between releases with ``--baseline``.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+# Keep benchmark analyses out of the real cache
+os.environ.setdefault('ANALYSIS_STORE_PATH', os.path.join(tempfile.mkdtemp(prefix="lexalyze-bench-"), "analyses.db"))
+
+from app.cache import analysis_store
+from app.compact import CompactAnalysis
+from app.incremental import paragraph_cache
+from app.page_cache import page_cache
+from app.processor import LegalDocumentProcessor
+from app.summarization import chunk_summary_cache
+from app.extractors import LegalTextExtractor, extract_text_features
+from app.pdf_backends import count_pdf_pages, read_pdf_pages
+from app.retrieval import PassageIndex, build_passages
+from app.utils import (
+    _compare_clauses, _compare_entities, _compare_obligations,
+    _compare_deadlines, _compare_monetary_values
+)
+from .corpus import generate_paragraphs, make_pdf, revise
+from .stubs import stub_registry
+
+def _summary(runs: List[float]) -> Dict[str, float]:
+    return {
+        "runs": len(runs),
+        "min_ms": round(min(runs) * 1000, 3),
+        "median_ms": round(statistics.median(runs) * 1000, 3),
+        "mean_ms": round(statistics.fmean(runs) * 1000, 3),
+    }
+
+def time_call(fn: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    """Time a blocking call ``repeat`` times"""
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - start)
+    return _summary(runs)
+
+async def time_async(fn: Callable[[], Awaitable[Any]], repeat: int) -> Dict[str, float]:
+    """Time a coroutine function ``repeat`` times"""
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await fn()
+        runs.append(time.perf_counter() - start)
+    return _summary(runs)
+
+def forget_paragraphs() -> None:
+    """Drop cached page, paragraph and summary results so the next analysis runs cold"""
+    page_cache.clear()
+    paragraph_cache.clear()
+    chunk_summary_cache.clear()
+    analysis_store.clear_pages()
+    analysis_store.clear_paragraphs()
+
+async def cold(fn: Callable[[], Awaitable[Any]]) -> Any:
+    forget_paragraphs()
+    return await fn()
+
+async def benchmark_document(
+    processor: LegalDocumentProcessor,
+    kind: str,
+    words: int,
+    repeat: int,
+    seed: int
+) -> List[Dict[str, Any]]:
+    """Time every pipeline stage and the compare helpers on one synthetic document"""
+    paragraphs = generate_paragraphs(kind, words, seed)
+    text = "\n\n".join(paragraphs)
+    revised_text = "\n\n".join(revise(paragraphs, seed=seed))
+    pdf = make_pdf(text)
+    extractor = LegalTextExtractor()
+    stages: Dict[str, Dict[str, float]] = {}
+
+    # Text extraction
+    stages["pdf_extraction"] = time_call(lambda: read_pdf_pages(pdf, list(range(count_pdf_pages(pdf)))), repeat)
+    stages["pdf_extraction_parallel"] = await time_async(
+        lambda: cold(lambda: processor.extract_text_from_pdf(pdf)), repeat
+    )
+    stages["pdf_extraction_cached_pages"] = await time_async(lambda: processor.extract_text_from_pdf(pdf), repeat)
+
+    # Text-level extractors
+    text_extractors = {
+        "document_type": extractor._determine_document_type,
+        "citations": extractor.extract_citations,
+        "definitions": extractor._extract_definitions,
+        "deadlines": extractor.extract_deadlines,
+        "monetary_values": extractor.extract_monetary_values,
+        "governing_law": extractor._extract_governing_law,
+        "jurisdiction": extractor._extract_jurisdiction,
+    }
+    for name, fn in text_extractors.items():
+        stages[f"extract.{name}"] = time_call(lambda fn=fn: fn(text), repeat)
+    stages["text_features"] = time_call(lambda: extract_text_features(text), repeat)
+
+    # spaCy and the extractors that read the parse
+    stages["spacy"] = time_call(lambda: processor._parse(text), repeat)
+    doc = processor._parse(text)
+    sentences = processor._classify_sentences(doc)
+    doc_extractors = {
+        "entities": lambda: processor.extract_legal_entities(doc),
+        "classify_sentences": lambda: processor._classify_sentences(doc),
+        "clauses": lambda: processor.extract_clauses(doc, sentences),
+        "obligations": lambda: processor.extract_obligations(doc, sentences),
+        "risk_factors": lambda: processor._extract_risk_factors(doc),
+    }
+    for name, fn in doc_extractors.items():
+        stages[f"extract.{name}"] = time_call(fn, repeat)
+
+    stages["summarizer"] = time_call(lambda: (chunk_summary_cache.clear(), processor._summarize(doc)), repeat)
+    stages["passage_index"] = time_call(
+        lambda: PassageIndex(build_passages([sent.text for sent in doc.sents])), repeat
+    )
+
+    # End to end
+    stages["analyze_document.txt"] = await time_async(
+        lambda: cold(lambda: processor.analyze_document(text.encode(), "txt")), repeat
+    )
+    stages["analyze_document.pdf"] = await time_async(
+        lambda: cold(lambda: processor.analyze_document(pdf, "pdf")), repeat
+    )
+
+    # Diff of two drafts; the revision reuses the paragraphs of the first draft
+    before = await cold(lambda: processor.analyze_document(text.encode(), "txt"))
+    stages["analyze_document.revision"] = await time_async(
+        lambda: processor.analyze_document(revised_text.encode(), "txt"), 1
+    )
+    after = await processor.analyze_document(revised_text.encode(), "txt")
+    compare_helpers = {
+        "clauses": lambda: _compare_clauses(before.key_clauses, after.key_clauses),
+        "entities": lambda: _compare_entities(before.entities, after.entities),
+        "obligations": lambda: _compare_obligations(before.obligations, after.obligations),
+        "deadlines": lambda: _compare_deadlines(before.deadlines, after.deadlines),
+        "monetary_values": lambda: _compare_monetary_values(before.monetary_values, after.monetary_values),
+    }
+    for name, fn in compare_helpers.items():
+        stages[f"compare.{name}"] = time_call(fn, repeat)
+
+    # In-process cache representation
+    compact = CompactAnalysis.from_analysis(after)
+    stages["compact.encode"] = time_call(lambda: CompactAnalysis.from_analysis(after), repeat)
+    stages["compact.materialize"] = time_call(compact.to_analysis, repeat)
+
+    return [
+        {"kind": kind, "words": words, "stage": stage, **timing}
+        for stage, timing in stages.items()
+    ]
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    processor = LegalDocumentProcessor(models=stub_registry() if args.stub_models else None)
+    # Load models up front so the first timed stage does not pay for it
+    processor.models.load_all()
+
+    results = []
+    try:
+        for kind in args.kinds:
+            for words in args.sizes:
+                print(f"Benchmarking {kind} of {words} words", file=sys.stderr)
+                results.extend(await benchmark_document(processor, kind, words, args.repeat, args.seed))
+    finally:
+        processor.executor.shutdown()
+
+    return {
+        "generated_at": datetime.now().isoformat(),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "stub_models": args.stub_models,
+        "repeat": args.repeat,
+        "seed": args.seed,
+        "results": results,
+    }
+
+def compare_reports(baseline: Dict[str, Any], report: Dict[str, Any], threshold: float) -> List[str]:
+    """Describe stages whose median time changed by more than ``threshold``"""
+    def key(result: Dict[str, Any]):
+        return result["kind"], result["words"], result["stage"]
+
+    previous = {key(result): result for result in baseline["results"]}
+    lines = []
+    for result in report["results"]:
+        old = previous.get(key(result))
+        if old is None or not old["median_ms"]:
+            continue
+        ratio = result["median_ms"] / old["median_ms"]
+        if abs(ratio - 1) >= threshold:
+            kind, words, stage = key(result)
+            label = "slower" if ratio > 1 else "faster"
+            lines.append(
+                f"{kind:<12} {words:>7} {stage:<28} {old['median_ms']:>10.2f} -> "
+                f"{result['median_ms']:>10.2f} ms  ({ratio:.2f}x, {label})"
+            )
+    return lines
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the lexalyze analysis pipeline")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000], help="document sizes in words")
+    parser.add_argument("--kinds", nargs="+", default=["contract", "court_filing"], choices=["contract", "court_filing"])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--stub-models", action="store_true", help="use stand-ins instead of downloaded models")
+    parser.add_argument("--output", default="benchmark-report.json")
+    parser.add_argument("--baseline", help="earlier report to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1, help="relative change worth reporting")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {len(report['results'])} timings to {args.output}", file=sys.stderr)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            changes = compare_reports(json.load(f), report, args.threshold)
+        print("\n".join(changes) if changes else "No stage changed beyond the threshold")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+from typing import Any, Dict, List, Union
+from app.model_registry import ModelRegistry
+from .corpus import PARTIES, PEOPLE, JUDGES, COURTS, PLACES
+
+# Stand-ins for the downloaded models, so the regex, extraction and diff paths
+# can be benchmarked without network access or GPU. spaCy itself is still
+# used: a blank English pipeline with rule-based sentences and entities.
+
+class WhitespaceTokenizer:
+    model_max_length = 1024
+
+    def __call__(self, texts: Union[str, List[str]], add_special_tokens: bool = False, **kwargs) -> Dict[str, Any]:
+        if isinstance(texts, str):
+            return {"input_ids": texts.split()}
+        return {"input_ids": [text.split() for text in texts]}
+
+class StubSummarizer:
+    """Returns the leading words of each input, like an extractive summarizer"""
+
+    tokenizer = WhitespaceTokenizer()
+
+    def __call__(self, texts: Union[str, List[str]], max_length: int = 150, **kwargs) -> List[Dict[str, str]]:
+        texts = [texts] if isinstance(texts, str) else texts
+        return [{"summary_text": " ".join(text.split()[:max_length])} for text in texts]
+
+class StubQuestionAnswerer:
+    """Answers with the first sentence of each context"""
+
+    def __call__(self, question: Union[str, List[str]], context: Union[str, List[str]], **kwargs) -> Any:
+        contexts = [context] if isinstance(context, str) else context
+        results = [
+            {"answer": text.split(".")[0], "score": 0.5, "start": 0, "end": len(text.split(".")[0])}
+            for text in contexts
+        ]
+        return results[0] if isinstance(context, str) else results
+
+def load_stub_spacy() -> Any:
+    import spacy
+
+    nlp = spacy.blank("en")
+    nlp.add_pipe("sentencizer")
+    ruler = nlp.add_pipe("entity_ruler")
+    ruler.add_patterns(
+        [{"label": "ORG", "pattern": name} for name in PARTIES + COURTS]
+        + [{"label": "PERSON", "pattern": name} for name in PEOPLE + JUDGES]
+        + [{"label": "GPE", "pattern": name} for name in PLACES]
+        + [{"label": "MONEY", "pattern": [{"TEXT": "$"}, {"LIKE_NUM": True}]}]
+    )
+    return nlp
+
+def stub_registry() -> ModelRegistry:
+    """A model registry whose models load instantly"""
+    return ModelRegistry({
+        'spacy_model': load_stub_spacy,
+        'qa_model': StubQuestionAnswerer,
+        'summarizer': StubSummarizer
+    })
@@ -0,0 +1,45 @@
+# Gunicorn settings for serving several workers that share one copy of the models.
+#
+#   gunicorn -c gunicorn.conf.py app.main:app
+#
+# With preload_app the app is imported in the master, the models are loaded
+# there once and the workers are forked afterwards, so the model weights live
+# in copy-on-write pages shared by every worker. uvicorn's own --workers flag
+# starts fresh interpreters instead and loads one copy of each model per worker.
+import gc
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '7860')}"
+workers = int(os.getenv('WEB_CONCURRENCY', '2'))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = os.getenv('PRELOAD_MODELS', 'true').lower() == 'true'
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '300'))
+graceful_timeout = 30
+
+# Forked workers must not inherit a tokenizer thread pool from the master
+os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+def when_ready(server):
+    """Load every model in the master before any worker is forked"""
+    if not preload_app:
+        return
+    from app.model_registry import model_registry
+
+    model_registry.load_all()
+    server.log.info(f"Preloaded models: {model_registry.status()}")
+
+    # Move everything allocated so far out of the collector's reach; otherwise
+    # each worker's first collection touches every object header and copies
+    # the pages the models live on
+    gc.collect()
+    gc.freeze()
+
+def post_fork(server, worker):
+    """Give each worker its own share of the CPU for model inference"""
+    threads = os.getenv('MODEL_THREADS_PER_WORKER')
+    if threads:
+        try:
+            import torch
+            torch.set_num_threads(int(threads))
+        except ImportError:
+            pass
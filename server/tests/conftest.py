@@ -0,0 +1,43 @@
+import os
+import tempfile
+
+import pytest
+
+# The app reads its settings when imported; keep every store the tests touch
+# out of the shared cache directory
+_store_dir = tempfile.mkdtemp(prefix="lexalyze-tests-")
+for name, filename in (
+    ('ANALYSIS_STORE_PATH', 'analyses.db'),
+    ('SEARCH_INDEX_PATH', 'search.db'),
+    ('JOBS_DB_PATH', 'jobs.db'),
+    ('JOBS_UPLOAD_DIR', 'jobs'),
+):
+    os.environ.setdefault(name, os.path.join(_store_dir, filename))
+
+@pytest.fixture
+def make_analysis():
+    """Build a minimal LegalAnalysis"""
+    from app.models import LegalAnalysis, LegalEntities
+
+    def make(doc_id: str = "doc-1", **fields) -> LegalAnalysis:
+        return LegalAnalysis(**{
+            "doc_id": doc_id,
+            "document_type": "contract",
+            "entities": LegalEntities(parties=["Acme Ltd"], judges=[], lawyers=[], courts=[], organizations=[]),
+            "key_clauses": [],
+            "citations": [],
+            "legal_definitions": {},
+            "obligations": [],
+            "deadlines": [],
+            "jurisdiction": None,
+            "governing_law": None,
+            "risk_factors": ["Late delivery"],
+            "monetary_values": [],
+            "summary": "The original summary.",
+            "metadata": {"file_type": "txt"},
+            "processing_time": 0.1,
+            "word_count": 100,
+            "created_at": "2024-01-01T00:00:00",
+            **fields
+        })
+    return make
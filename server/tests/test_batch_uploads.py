@@ -0,0 +1,54 @@
+import asyncio
+import hashlib
+import json
+import os
+import resource
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.cache import cache_analysis
+from app.config import BATCH_CONFIG
+from app.main import app
+
+# Starlette keeps uploads of up to 1 MB in memory and spools larger ones to disk
+SMALL = b"The Buyer shall pay the Seller within 30 days."
+LARGE = SMALL * (1200 * 1024 // len(SMALL))
+LARGE_COUNT = 40
+
+def _open_fds() -> int:
+    return len(os.listdir("/proc/self/fd"))
+
+@pytest.fixture
+def fd_limit():
+    """Lower the soft RLIMIT_NOFILE for the duration of a test"""
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+
+    def lower(limit: int) -> None:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (limit, hard))
+
+    yield lower
+    resource.setrlimit(resource.RLIMIT_NOFILE, (soft, hard))
+
+@pytest.mark.skipif(not os.path.isdir("/proc/self/fd"), reason="counts descriptors through /proc")
+def test_max_size_batch_fits_a_low_descriptor_limit(fd_limit, make_analysis):
+    # Every upload is already analyzed, so the batch only reads and looks them up
+    for content in (SMALL, LARGE):
+        asyncio.run(cache_analysis(hashlib.sha256(content).hexdigest(), "txt", make_analysis(f"doc-{len(content)}")))
+
+    count = BATCH_CONFIG['max_documents']
+    files = [
+        ("files", (f"{i}.txt", LARGE if i < LARGE_COUNT else SMALL, "text/plain"))
+        for i in range(count)
+    ]
+    client = TestClient(app)
+
+    # Spooled uploads need a descriptor each while the form is parsed; small
+    # ones, which are most of the batch, must need none
+    fd_limit(_open_fds() + LARGE_COUNT + 64)
+    response = client.post("/api/analyze/batch", files=files)
+
+    assert response.status_code == 200
+    events = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(event["index"] for event in events) == list(range(count))
+    assert all(event["event"] == "analysis" for event in events)
@@ -0,0 +1,49 @@
+import json
+import os
+import subprocess
+import sys
+
+from benchmarks.run import compare_reports
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+REPORT_FIELDS = {"generated_at", "git_commit", "python", "platform", "stub_models", "repeat", "seed", "results"}
+RESULT_FIELDS = {"kind", "words", "stage", "runs", "min_ms", "median_ms", "mean_ms"}
+
+def test_stub_model_run_writes_a_report(tmp_path):
+    output = tmp_path / "report.json"
+    subprocess.run(
+        [sys.executable, "-m", "benchmarks.run", "--stub-models", "--sizes", "1000",
+         "--repeat", "1", "--output", str(output)],
+        cwd=SERVER_DIR, check=True, capture_output=True, timeout=600
+    )
+    report = json.loads(output.read_text())
+
+    assert set(report) == REPORT_FIELDS
+    assert report["stub_models"] is True
+    assert report["repeat"] == 1
+
+    results = report["results"]
+    assert {(result["kind"], result["words"]) for result in results} == {("contract", 1000), ("court_filing", 1000)}
+    for result in results:
+        assert set(result) == RESULT_FIELDS
+        assert result["runs"] >= 1
+        assert 0 <= result["min_ms"] <= result["median_ms"]
+
+    stages = {result["stage"] for result in results}
+    assert {"pdf_extraction", "text_features", "spacy", "summarizer", "analyze_document.txt",
+            "analyze_document.pdf", "analyze_document.revision", "compact.materialize"} <= stages
+
+    # A report compared with itself has nothing to flag
+    assert compare_reports(report, report, threshold=0.1) == []
+
+def test_compare_reports_flags_changed_stages():
+    def report(median_ms):
+        return {"results": [
+            {"kind": "contract", "words": 1000, "stage": "spacy", "median_ms": median_ms},
+            {"kind": "contract", "words": 1000, "stage": "summarizer", "median_ms": 5.0},
+        ]}
+
+    changes = compare_reports(report(10.0), report(20.0), threshold=0.1)
+    assert len(changes) == 1
+    assert "spacy" in changes[0] and "slower" in changes[0]
@@ -0,0 +1,43 @@
+import asyncio
+
+from app import cache
+from app.cache import get_or_analyze
+
+def test_joined_analysis_reports_progress_to_every_caller(make_analysis):
+    calls = []
+    parsed = asyncio.Event()
+    finish = asyncio.Event()
+
+    async def analyze(content, file_type, progress=None):
+        calls.append(content)
+        await progress("parse", "running")
+        await progress("parse", "done")
+        parsed.set()
+        await finish.wait()
+        await progress("summarize", "running")
+        await progress("summarize", "done")
+        return make_analysis("doc-shared")
+
+    def recorder(events):
+        async def progress(stage, status):
+            events.append((stage, status))
+        return progress
+
+    async def run():
+        first, second = [], []
+        owner = asyncio.ensure_future(get_or_analyze(b"x", "txt", analyze, "hash-shared", progress=recorder(first)))
+        await parsed.wait()
+        joiner = asyncio.ensure_future(get_or_analyze(b"x", "txt", analyze, "hash-shared", progress=recorder(second)))
+        # The second caller looks the upload up in the store before it joins
+        while len(cache._in_flight[("hash-shared", "txt")].listeners) < 2:
+            await asyncio.sleep(0.01)
+        finish.set()
+        results = await asyncio.gather(owner, joiner)
+        return results, first, second
+
+    (owned, joined), first, second = asyncio.run(run())
+    assert calls == [b"x"]
+    assert owned.doc_id == joined.doc_id == "doc-shared"
+    assert first == [("parse", "running"), ("parse", "done"), ("summarize", "running"), ("summarize", "done")]
+    # The stages that ran before the second caller joined are reported with their latest status
+    assert second == [("parse", "done"), ("summarize", "running"), ("summarize", "done")]
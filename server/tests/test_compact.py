@@ -0,0 +1,22 @@
+from app.compact import CompactAnalysis
+
+def test_metadata_is_not_shared_with_the_caller(make_analysis):
+    analysis = make_analysis()
+    compact = CompactAnalysis.from_analysis(analysis)
+
+    analysis.metadata["profile"] = "added after caching"
+    first = compact.to_analysis()
+    first.metadata["enriched_by_gemini"] = "true"
+
+    assert compact.to_analysis().metadata == {"file_type": "txt"}
+
+def test_fallback_records_are_not_shared_with_the_caller(make_analysis):
+    # A deadline without the usual keys does not fit the columns and is kept as it is
+    analysis = make_analysis(deadlines=[{"text": "within 30 days"}])
+    compact = CompactAnalysis.from_analysis(analysis)
+    assert "deadlines" in compact.fallback
+
+    analysis.deadlines[0]["text"] = "edited"
+    compact.to_analysis().deadlines.append({"text": "appended"})
+
+    assert compact.to_analysis().deadlines == [{"text": "within 30 days"}]
@@ -0,0 +1,229 @@
+import random
+import re
+from typing import Any, Dict, List, Optional
+
+import pytest
+
+from app.config import PATTERNS
+from app.extractors import (
+    LegalTextExtractor, extract_document_fields, extract_page_features,
+    extract_paragraph_features, extract_text_features, text_scanner
+)
+from benchmarks.corpus import generate_document, generate_paragraphs
+
+# The extractors read every rule from one TextScan of the text. These tests
+# hold them to the per-rule re.search/re.finditer calls they replaced, copied
+# below with the patterns exactly as they were written.
+
+LEGACY_DEFINITIONS = [
+    r'(?i)"([^"]+)"\s+means\s+([^\.]+)',
+    r'(?i)"([^"]+)"\s+shall\s+mean\s+([^\.]+)',
+    r'(?i)term\s+"([^"]+)"\s+is\s+defined\s+as\s+([^\.]+)',
+    r'(?i)"([^"]+)"\s+refers\s+to\s+([^\.]+)'
+]
+
+LEGACY_DEADLINES = [
+    r"(?i)within\s+(\d+)\s+(day|month|year)s?",
+    r"(?i)no\s+later\s+than\s+([^\.]+)",
+    r"(?i)deadline\s+[^\.]+",
+    r"(?i)due\s+(?:date|by)\s+([^\.]+)"
+]
+
+LEGACY_GOVERNING_LAW = [
+    r"(?i)governed\s+by\s+the\s+laws\s+of\s+([^\.]+)",
+    r"(?i)subject\s+to\s+the\s+jurisdiction\s+of\s+([^\.]+)",
+    r"(?i)Indian\s+law",
+    r"(?i)laws\s+of\s+India"
+]
+
+LEGACY_JURISDICTION = [
+    r"(?i)courts\s+of\s+([^\.]+)",
+    r"(?i)jurisdiction\s+of\s+([^\.]+)",
+    r"(?i)subject\s+to\s+the\s+exclusive\s+jurisdiction\s+of\s+([^\.]+)"
+]
+
+LEGACY_DOCUMENT_TYPES = {
+    "contract": ["agreement", "contract", "terms and conditions"],
+    "court_filing": ["motion", "petition", "complaint", "brief"],
+    "legislation": ["act", "statute", "bill", "regulation"],
+    "opinion": ["opinion", "decision", "order", "judgment"],
+}
+
+def legacy_document_type(text: str) -> str:
+    text_lower = text.lower()
+    for doc_type, keywords in LEGACY_DOCUMENT_TYPES.items():
+        if any(keyword in text_lower for keyword in keywords):
+            return doc_type
+    return "other"
+
+def legacy_citations(text: str) -> List[Dict[str, Any]]:
+    extractor = LegalTextExtractor()
+    citations = []
+    for match in re.finditer(PATTERNS['citation'], text):
+        citation_text = match.group()
+        year_match = re.search(r'\d{4}', citation_text)
+        citations.append({
+            "citation_text": citation_text,
+            "source": extractor._determine_citation_source(citation_text),
+            "year": int(year_match.group()) if year_match else None,
+            "page": None
+        })
+    return citations
+
+def legacy_definitions(text: str) -> Dict[str, str]:
+    definitions = {}
+    for pattern in LEGACY_DEFINITIONS:
+        for match in re.finditer(pattern, text):
+            term, definition = match.groups()
+            definitions[term.strip()] = definition.strip()
+    return definitions
+
+def legacy_deadlines(text: str) -> List[Dict[str, Optional[str]]]:
+    deadlines = []
+    for pattern in LEGACY_DEADLINES:
+        for match in re.finditer(pattern, text):
+            deadline_text = match.group()
+            date_match = re.search(PATTERNS['date'], deadline_text)
+            deadlines.append({
+                "text": deadline_text,
+                "date": date_match.group() if date_match else None,
+                "context": text[max(0, match.start()-50):min(len(text), match.end()+50)]
+            })
+    return deadlines
+
+def legacy_monetary_values(text: str) -> List[Dict[str, str]]:
+    return [
+        {
+            "value": match.group(),
+            "context": text[max(0, match.start()-50):min(len(text), match.end()+50)]
+        }
+        for match in re.finditer(PATTERNS['monetary'], text)
+    ]
+
+def legacy_first_capture(text: str, patterns: List[str]) -> Optional[str]:
+    for pattern in patterns:
+        match = re.search(pattern, text)
+        if match:
+            # The legacy code read group(1) of every rule and raised IndexError
+            # on the two governing-law rules without one; their whole match is
+            # the governing law now
+            return match.group(1) if match.re.groups else match.group()
+    return None
+
+def legacy_text_features(text: str) -> Dict[str, Any]:
+    return {
+        "document_type": legacy_document_type(text),
+        "citations": legacy_citations(text),
+        "legal_definitions": legacy_definitions(text),
+        "deadlines": legacy_deadlines(text),
+        "jurisdiction": legacy_first_capture(text, LEGACY_JURISDICTION),
+        "governing_law": legacy_first_capture(text, LEGACY_GOVERNING_LAW),
+        "monetary_values": legacy_monetary_values(text),
+    }
+
+def text_features(text: str) -> Dict[str, Any]:
+    features = extract_text_features(text)
+    return {**features, "citations": [citation.model_dump() for citation in features["citations"]]}
+
+# U+0130 (İ), U+0131 (ı) and U+017F (ſ) match differently under re.IGNORECASE
+# than after str.lower(), so texts holding them take the re.IGNORECASE path.
+# The Kelvin sign (U+212A) lowers to "k" and needs no such fallback.
+CASES = {
+    "definitions": 'The term "Services" is defined as the consulting work. "Fees" means the amounts '
+                   'in Schedule B. "Effective Date" SHALL MEAN the signing date. "Premises" refers to Unit 4.',
+    "nested_quotes": '"A" "B" means the first thing. "C "D" means something". "" means nothing. '
+                     '"Unclosed means nothing',
+    "many_quotes": '"x" ' * 200 + 'means the last term',
+    "quote_runs": '"' * 50 + ' means ' + '"term" means a word. "' * 20,
+    "deadlines": "Payment is due by March 5, 2024. Deliver WITHIN 30 Days and no later than 2024-01-31. "
+                 "The deadline for notice is 1/2/2024. Due date: soon.",
+    "monetary": "The Buyer pays $ 1,000.00 and 12 dollars, then $5 and $10,000,000.25 more.",
+    "citations": "See AIR 2019 SC 1234, (2015) 3 SCC 45, ILR 2001 Del 99 and SMITH v. JONES, [2019] Some Report 12.",
+    "governing_law_capture": "This Agreement shall be GOVERNED BY THE LAWS OF England and Wales. Nothing else.",
+    "governing_law_indian_law": "Disputes are settled under Indian law, and nothing in this deed says otherwise.",
+    "governing_law_laws_of_india": "Both parties submit to the LAWS OF INDIA without exception.",
+    "governing_law_order": "Under Indian law and the laws of India, this is governed by the laws of Delhi.",
+    "jurisdiction": "Subject to the exclusive jurisdiction of the Courts of Mumbai. The courts of Delhi may hear appeals.",
+    "dotted_capital_i": "Disputes fall under İndian law and the laws of İndia; due by İ 2024-01-01.",
+    "dotless_i": "Governed by the laws of ındia. Delivery is due by the ıst of May.",
+    "long_s": "ſubject to the juriſdiction of the Courts of Chennai. \"Term\" meanſ the period.",
+    "mixed_unsafe": "İ ı ſ: within 5 days, no later than 2024-02-02. \"X\" means y. Indian law applies.",
+    "kelvin_sign": "Due by the \u212aelvin deadline within 3 years. \"\u212a\" refers to a unit.",
+    "no_matches": "A plain sentence with nothing to extract.",
+    "empty": "",
+}
+
+def _token_soup(seed: int, count: int) -> List[str]:
+    """Random runs of the rules' keywords, punctuation and case-unsafe characters"""
+    vocab = [
+        'within', 'WITHIN', 'Within', 'no', 'later', 'than', 'No Later Than', 'deadline', 'DEADLINE',
+        'due', 'Due', 'by', 'date', 'governed', 'the', 'laws', 'of', 'India', 'Indian', 'law',
+        'subject', 'to', 'exclusive', 'jurisdiction', 'Jurisdiction', 'courts', 'Courts', '"Term"',
+        '"', 'means', 'MEANS', 'shall', 'mean', 'refers', 'term', 'is', 'defined', 'as', '.', '\n',
+        '30', '5', 'days', 'months', 'year', '$', '$ 1,000.00', '12 dollars', 'AIR', 'SC', 'SCC',
+        'HC', 'ILR', 'v.', 'Smith', 'JONES', '[2019]', '2020-01-05', '1/2/2020', 'January 5, 2020',
+        'İ', 'ı', 'ſ', '\u212a', 'ſubject', 'İndian', 'dUe', 'tHe',
+        'agreement', 'act', 'order', 'x'
+    ]
+    rng = random.Random(seed)
+    return [
+        "".join(rng.choice(vocab) + rng.choice([' ', ' ', '', '  ', '\t', '.']) for _ in range(rng.randint(1, 60)))
+        for _ in range(count)
+    ]
+
+GENERATED = [
+    generate_document(kind, words, seed)
+    for kind in ("contract", "court_filing")
+    for words in (200, 2000)
+    for seed in range(3)
+]
+
+@pytest.mark.parametrize("text", list(CASES.values()), ids=list(CASES))
+def test_text_features_match_legacy_rules(text):
+    assert text_features(text) == legacy_text_features(text)
+
+@pytest.mark.parametrize("text", GENERATED)
+def test_generated_documents_match_legacy_rules(text):
+    assert text_features(text) == legacy_text_features(text)
+
+def test_random_keyword_runs_match_legacy_rules():
+    for text in _token_soup(seed=1, count=2000):
+        assert text_features(text) == legacy_text_features(text), text
+
+def test_case_unsafe_characters_take_the_ignorecase_path():
+    for name in ("dotted_capital_i", "dotless_i", "long_s", "mixed_unsafe"):
+        assert not text_scanner.scan(CASES[name])._folded
+    assert text_scanner.scan(CASES["deadlines"])._folded
+
+@pytest.mark.parametrize("name, expected", [
+    ("governing_law_capture", "England and Wales"),
+    ("governing_law_indian_law", "Indian law"),
+    ("governing_law_laws_of_india", "LAWS OF INDIA"),
+    ("governing_law_order", "Delhi"),
+    ("dotted_capital_i", "İndian law"),
+])
+def test_governing_law(name, expected):
+    assert extract_text_features(CASES[name])["governing_law"] == expected
+
+def test_quoted_terms_are_matched_without_backtracking_into_them():
+    definitions = extract_text_features(CASES["nested_quotes"])["legal_definitions"]
+    assert definitions == {"B": "the first thing", "D": "something\""}
+    assert extract_text_features(CASES["many_quotes"])["legal_definitions"] == {"x": "the last term"}
+
+def test_document_page_and_paragraph_entry_points_match_legacy_rules():
+    texts = list(CASES.values()) + _token_soup(seed=2, count=200)
+    for text in texts:
+        legacy = legacy_text_features(text)
+        assert extract_document_fields(text) == {
+            key: legacy[key] for key in ("document_type", "jurisdiction", "governing_law")
+        }
+        assert extract_page_features(text) == {
+            key: legacy[key] for key in ("deadlines", "monetary_values")
+        }
+
+    paragraphs = generate_paragraphs("contract", 2000, seed=5) + texts
+    for features, text in zip(extract_paragraph_features(paragraphs), paragraphs):
+        legacy = legacy_text_features(text)
+        assert features == {
+            key: legacy[key] for key in ("citations", "legal_definitions", "deadlines", "monetary_values")
+        }
@@ -0,0 +1,176 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from app import cache, gemini_enrichment
+from app.gemini_enrichment import GeminiClient, enrich_legal_analysis, schedule_enrichment
+
+ENRICHMENT = {
+    "enhanced_summary": "An enriched summary.",
+    "additional_risk_factors": ["Unlimited liability"],
+    "suggested_investigations": ["Check the indemnity cap"],
+    "key_insights": ["Payment terms favour the seller"]
+}
+
+def _reply(text: str) -> httpx.Response:
+    return httpx.Response(200, json={"candidates": [{"content": {"parts": [{"text": text}]}}]})
+
+class StubGemini:
+    """generateContent stand-in that records its calls and how many ran at once"""
+
+    def __init__(self, text: str = json.dumps(ENRICHMENT), status_code: int = 200, delay: float = 0):
+        self.text = text
+        self.status_code = status_code
+        self.delay = delay
+        self.prompts = []
+        self.active = 0
+        self.max_active = 0
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.prompts.append(json.loads(request.content)["contents"][0]["parts"][0]["text"])
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.active -= 1
+        if self.status_code != 200:
+            return httpx.Response(self.status_code, json={"error": {"message": "unavailable"}})
+        return _reply(self.text)
+
+def _client(stub: StubGemini, **kwargs) -> GeminiClient:
+    return GeminiClient("test-key", transport=httpx.MockTransport(stub), **kwargs)
+
+@pytest.fixture
+def use_client(monkeypatch):
+    def install(client: GeminiClient) -> GeminiClient:
+        monkeypatch.setattr(gemini_enrichment, "gemini_client", client)
+        return client
+    return install
+
+def test_generate_caches_responses_by_prompt():
+    stub = StubGemini(text="answer")
+
+    async def run():
+        client = _client(stub)
+        try:
+            return [await client.generate(prompt) for prompt in ("a", "a", "b")]
+        finally:
+            await client.aclose()
+
+    assert asyncio.run(run()) == ["answer"] * 3
+    assert stub.prompts == ["a", "b"]
+
+def test_generate_shares_one_call_between_identical_prompts_in_flight():
+    stub = StubGemini(text="answer", delay=0.05)
+
+    async def run():
+        client = _client(stub)
+        try:
+            texts = await asyncio.gather(*(client.generate("same") for _ in range(5)))
+            return texts, client._in_flight, client._responses
+        finally:
+            await client.aclose()
+
+    texts, in_flight, responses = asyncio.run(run())
+    assert texts == ["answer"] * 5
+    assert stub.prompts == ["same"]
+    assert not in_flight
+    assert list(responses.values()) == ["answer"]
+
+def test_generate_caps_concurrent_requests():
+    stub = StubGemini(text="answer", delay=0.02)
+
+    async def run():
+        client = _client(stub, max_concurrency=2)
+        try:
+            await asyncio.gather(*(client.generate(f"prompt {i}") for i in range(6)))
+        finally:
+            await client.aclose()
+
+    asyncio.run(run())
+    assert len(stub.prompts) == 6
+    assert stub.max_active == 2
+
+def test_failed_request_is_not_cached():
+    stub = StubGemini(status_code=503)
+
+    async def run():
+        client = _client(stub)
+        try:
+            for _ in range(2):
+                with pytest.raises(httpx.HTTPStatusError):
+                    await client.generate("prompt")
+            return client._responses
+        finally:
+            await client.aclose()
+
+    assert not asyncio.run(run())
+    assert len(stub.prompts) == 2
+
+def test_enrichment_merges_the_response_into_a_copy(use_client, make_analysis):
+    client = use_client(_client(StubGemini()))
+    analysis = make_analysis()
+
+    async def run():
+        try:
+            return await enrich_legal_analysis(analysis)
+        finally:
+            await client.aclose()
+
+    enriched = asyncio.run(run())
+    assert enriched is not analysis
+    assert enriched.summary == "An enriched summary."
+    assert enriched.risk_factors == ["Late delivery", "Unlimited liability"]
+    assert enriched.metadata["enriched_by_gemini"] == "true"
+    assert json.loads(enriched.metadata["gemini_enrichments"]) == {
+        "suggested_investigations": ["Check the indemnity cap"],
+        "key_insights": ["Payment terms favour the seller"]
+    }
+    assert analysis.summary == "The original summary."
+    assert analysis.risk_factors == ["Late delivery"]
+
+@pytest.mark.parametrize("stub", [
+    StubGemini(status_code=500),
+    StubGemini(text="not json at all"),
+], ids=["non-2xx", "malformed-json"])
+def test_enrichment_falls_back_to_the_original_analysis(use_client, make_analysis, stub):
+    client = use_client(_client(stub))
+    analysis = make_analysis()
+
+    async def run():
+        try:
+            return await enrich_legal_analysis(analysis)
+        finally:
+            await client.aclose()
+
+    assert asyncio.run(run()) is analysis
+
+def test_scheduled_enrichment_replaces_the_cached_analysis(use_client, make_analysis):
+    client = use_client(_client(StubGemini(), enrich_analyses=True))
+    analysis = make_analysis("doc-scheduled")
+
+    async def run():
+        try:
+            await cache.cache_analysis("hash-scheduled", "txt", analysis)
+            schedule_enrichment("hash-scheduled", "txt", analysis)
+            # A second request for the same upload does not enrich it again
+            schedule_enrichment("hash-scheduled", "txt", analysis)
+            tasks = list(gemini_enrichment._enrichment_tasks.values())
+            assert len(tasks) == 1
+            await asyncio.gather(*tasks)
+
+            # Read the shared store, not this process's copy
+            cache.document_cache.clear()
+            cache.analysis_cache.clear()
+            return await cache.get_cached_analysis("hash-scheduled", "txt")
+        finally:
+            await client.aclose()
+
+    stored = asyncio.run(run())
+    assert stored.doc_id == "doc-scheduled"
+    assert stored.summary == "An enriched summary."
+    assert stored.metadata["enriched_by_gemini"] == "true"
+    assert not gemini_enrichment._enrichment_tasks
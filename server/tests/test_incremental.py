@@ -0,0 +1,13 @@
+from app.incremental import paragraph_hash, split_paragraphs
+
+PARAGRAPH = "12. Governing Law\nThis Agreement is governed by the laws of India."
+
+def test_paragraph_hash_ignores_spacing_within_lines():
+    assert paragraph_hash(PARAGRAPH) == paragraph_hash("12.  Governing\tLaw \nThis Agreement is  governed by the laws of India.")
+
+def test_paragraph_hash_changes_when_a_line_break_moves():
+    # Joining the heading onto the clause changes which line it is read from
+    joined = "12. Governing Law This Agreement\nis governed by the laws of India."
+    assert split_paragraphs(joined) == [joined]
+    assert paragraph_hash(PARAGRAPH) != paragraph_hash(joined)
+    assert paragraph_hash(PARAGRAPH) != paragraph_hash(PARAGRAPH.replace("\n", " "))
@@ -0,0 +1,39 @@
+from app.executor import AnalysisExecutor
+from app.model_registry import ModelRegistry
+from app.processor import LegalDocumentProcessor
+from benchmarks.stubs import StubQuestionAnswerer, StubSummarizer, load_stub_spacy
+
+def _registry(**loaders) -> ModelRegistry:
+    return ModelRegistry({
+        'spacy_model': load_stub_spacy,
+        'qa_model': StubQuestionAnswerer,
+        'summarizer': StubSummarizer,
+        **loaders
+    })
+
+def test_loader_is_the_registered_entry():
+    assert _registry().loader('spacy_model') is load_stub_spacy
+
+def test_no_loader_for_models_a_worker_cannot_build():
+    nlp = load_stub_spacy()
+    assert _registry(spacy_model=lambda: nlp).loader('spacy_model') is None
+
+    registry = _registry()
+    registry.override('spacy_model', nlp)
+    assert registry.get('spacy_model') is nlp
+    assert registry.loader('spacy_model') is None
+
+def test_override_with_a_loader_replaces_the_entry():
+    registry = _registry()
+    registry.override('spacy_model', load_stub_spacy(), loader=load_stub_spacy)
+    assert registry.loader('spacy_model') is load_stub_spacy
+
+def test_overridden_spacy_model_is_not_sharded():
+    # The executor never starts a pool here; sharding only checks its size
+    executor = AnalysisExecutor(process_workers=4)
+    registry = _registry()
+    processor = LegalDocumentProcessor(executor=executor, models=registry)
+    assert processor._should_shard(10_000_000)
+
+    registry.override('spacy_model', load_stub_spacy())
+    assert not processor._should_shard(10_000_000)
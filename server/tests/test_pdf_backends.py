@@ -0,0 +1,40 @@
+import io
+
+import PyPDF2
+import pytest
+
+from app.pdf_backends import page_fingerprints
+from benchmarks.corpus import generate_document, make_pdf
+
+def _compressed(*pages: PyPDF2.PageObject) -> bytes:
+    writer = PyPDF2.PdfWriter()
+    for page in pages:
+        writer.add_page(page)
+    for page in writer.pages:
+        page.compress_content_streams()
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+def _pages(text: str):
+    return PyPDF2.PdfReader(io.BytesIO(make_pdf(text, lines_per_page=20))).pages
+
+@pytest.fixture
+def documents():
+    first = _pages(generate_document("contract", 600, seed=1))
+    other = _pages(generate_document("court_filing", 600, seed=2))
+    return _compressed(first[0], first[1], first[2]), _compressed(first[0], other[1], first[2])
+
+def test_fingerprints_hash_encoded_streams_without_decoding(monkeypatch, documents):
+    def decode(stream):
+        raise AssertionError("page_fingerprints decoded a stream")
+
+    monkeypatch.setattr(PyPDF2.filters, "decode_stream_data", decode)
+    assert len(page_fingerprints(documents[0])) == 3
+
+def test_identical_pages_fingerprint_alike_across_files(documents):
+    original, amended = (page_fingerprints(document) for document in documents)
+    assert len(set(original)) == 3
+    assert amended[0] == original[0]
+    assert amended[1] != original[1]
+    assert amended[2] == original[2]
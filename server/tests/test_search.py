@@ -0,0 +1,35 @@
+from app.search import SearchIndex
+
+def _worker(path, version: str, generation: int) -> SearchIndex:
+    return SearchIndex(str(path), version=f"{generation}:{version}", generation=generation)
+
+def test_reindexed_documents_are_tombstoned_without_a_reload(tmp_path, make_analysis):
+    path = tmp_path / "search.db"
+    old, new = _worker(path, "a", 1), _worker(path, "a", 2)
+    old.add(make_analysis("doc-1", document_type="contract"))
+    old.add(make_analysis("doc-2", document_type="contract"))
+    assert old.search(facets={"document_type": ["contract"]}).total == 2
+    postings = old._postings
+
+    # Another worker re-indexes one document under a newer pipeline version
+    new.add(make_analysis("doc-1", document_type="opinion"))
+
+    contracts = old.search(facets={"document_type": ["contract"]})
+    assert [hit.doc_id for hit in contracts.results] == ["doc-2"]
+    assert [hit.doc_id for hit in old.search(facets={"document_type": ["opinion"]}).results] == ["doc-1"]
+    assert old.search().total == 2
+    assert old._postings is postings
+
+def test_older_generation_does_not_replace_newer_rows(tmp_path, make_analysis):
+    path = tmp_path / "search.db"
+    old, new = _worker(path, "a", 1), _worker(path, "a", 2)
+    new.add(make_analysis("doc-1", document_type="opinion"))
+    old.add(make_analysis("doc-1", document_type="contract"))
+
+    assert [hit.doc_id for hit in new.search(facets={"document_type": ["opinion"]}).results] == ["doc-1"]
+    assert new.search(facets={"document_type": ["contract"]}).total == 0
+
+    # Differently configured workers of the same generation still replace each other's rows
+    other = _worker(path, "b", 2)
+    other.add(make_analysis("doc-1", document_type="contract"))
+    assert [hit.doc_id for hit in new.search(facets={"document_type": ["contract"]}).results] == ["doc-1"]
@@ -0,0 +1,36 @@
+from app.config import SUMMARY_CONFIG
+from app.summarization import summarize_many_chunks
+from benchmarks.stubs import StubSummarizer
+
+class CountingSummarizer(StubSummarizer):
+    def __init__(self):
+        self.texts = []
+
+    def __call__(self, texts, **kwargs):
+        self.texts.extend(texts)
+        return super().__call__(texts, **kwargs)
+
+def _chunks(document: int, count: int):
+    return [f"Document {document} chunk {i} opens here. It then goes on for a while." for i in range(count)]
+
+def test_documents_past_the_budget_get_their_leading_sentences():
+    config = {**SUMMARY_CONFIG, 'batch_size': 1, 'latency_budget': 0}
+    summarizer = CountingSummarizer()
+    summaries = summarize_many_chunks(summarizer, [_chunks(1, 3), _chunks(2, 3)], config)
+
+    # Only the first batch runs within a budget of zero
+    assert summarizer.texts == [_chunks(1, 3)[0]]
+    assert summaries[0]
+    assert summaries[1] == "Document 2 chunk 0 opens here. It then goes on for a while."
+
+def test_leading_sentences_fit_the_summary_length():
+    config = {**SUMMARY_CONFIG, 'batch_size': 1, 'latency_budget': 0, 'max_length': 8}
+    summaries = summarize_many_chunks(CountingSummarizer(), [_chunks(3, 2), _chunks(4, 2)], config)
+    assert summaries[1] == "Document 4 chunk 0 opens here."
+
+def test_summaries_are_cached_across_summarizer_instances():
+    chunked = [["A single chunk about the payment terms."]]
+    first, second = CountingSummarizer(), CountingSummarizer()
+    assert summarize_many_chunks(first, chunked) == summarize_many_chunks(second, chunked)
+    assert first.texts == chunked[0]
+    assert second.texts == []